@@ -1,18 +1,19 @@
-from flask import Flask, render_template, send_from_directory, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, send_from_directory, request, redirect, url_for, session, jsonify, Response
 from werkzeug.utils import secure_filename
 import os
 import json
 import glob
+import time
 import socket
 import re
 from datetime import datetime
+from json_store import JsonStore, atomic_write_json
+from chat_feed import ChatFeed
+import tool_catalog
 
 app = Flask(__name__)
 app.secret_key = 'change-this-secret'
 
-# Global client service queue (in production, use Redis or database)
-CLIENT_SERVICE_QUEUE = {}
-
 # Import and register the account blueprint
 from account_routes import account_bp
 app.register_blueprint(account_bp)
@@ -28,11 +29,9 @@ try:
     init_database()
     
     # Initialize enhanced database
-    from enhanced_database_init import init_enhanced_database, create_sample_data_tables, create_form_builder_configs
+    from enhanced_database_init import init_enhanced_database
     print("Initializing enhanced database...")
     if init_enhanced_database():
-        create_sample_data_tables()
-        create_form_builder_configs()
         print("Enhanced database initialized successfully!")
 except Exception as e:
     print(f"Database initialization error: {e}")
@@ -44,6 +43,7 @@ CATEGORIES_PATH = os.path.join(app.root_path, 'categories.json')
 ADMIN_PASSWORD = os.environ.get('TRUCKSOFT_ADMIN_PASSWORD', 'secret')
 UPLOAD_FOLDER = os.path.join(app.root_path, 'uploads')
 CHATS_PATH = os.path.join(app.root_path, 'chat.json')
+CHAT_LOG_PATH = os.path.join(app.root_path, 'chat_log.jsonl')
 ADMINS_PATH = os.path.join(app.root_path, 'admins.json')
 EXTERNAL_TOOLS_CONFIG_PATH = os.path.join(app.root_path, 'external_tools_config.json')
 ALLOWED_ATTACH_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'svg', 'txt', 'doc', 'docx', 'zip', 'rar', '7z'}
@@ -57,15 +57,25 @@ def cleanup_chat_on_startup():
         # Load existing chats to get image filenames before clearing
         chat_images = []
         if os.path.exists(CHATS_PATH):
+            # Legacy chat.json written before the append-only chat log
             with open(CHATS_PATH, 'r', encoding='utf-8') as f:
                 chats = json.load(f)
                 for chat in chats:
                     if chat.get('image'):
                         chat_images.append(chat['image'])
-        
-        # Clear the chat.json file
-        with open(CHATS_PATH, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=2, ensure_ascii=False)
+            atomic_write_json(CHATS_PATH, [])
+        if os.path.exists(CHAT_LOG_PATH):
+            with open(CHAT_LOG_PATH, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        chat = json.loads(line)
+                    except ValueError:
+                        continue
+                    if chat.get('image'):
+                        chat_images.append(chat['image'])
+
+        # Clear the chat log
+        open(CHAT_LOG_PATH, 'w', encoding='utf-8').close()
         
         # Remove chat image files from uploads folder
         for image_name in chat_images:
@@ -101,106 +111,105 @@ def cleanup_chat_on_startup():
 # Clean up chat data on startup
 cleanup_chat_on_startup()
 
-
-def load_posts():
-    if not os.path.exists(POSTS_PATH):
-        return []
-    with open(POSTS_PATH, 'r', encoding='utf-8') as f:
-        posts = json.load(f)
-        for p in posts:
-            p.setdefault('embedded', [])
-            p.setdefault('tags', [])  # Ensure tags field always exists
-        return posts
+# Move the legacy posts.json forum into SQLite (runs once)
+try:
+    from forum_db_utils import import_posts_from_json, rebuild_forum_search_index
+    imported_count, import_message = import_posts_from_json(POSTS_PATH)
+    if imported_count:
+        print(import_message)
+    indexed_count = rebuild_forum_search_index()
+    if indexed_count:
+        print(f"Indexed {indexed_count} posts for search")
+except Exception as e:
+    print(f"Forum import error: {e}")
 
 
-def save_posts(posts):
-    with open(POSTS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(posts, f, indent=2, ensure_ascii=False)
+CATEGORIES_STORE = JsonStore(CATEGORIES_PATH, default=lambda: ['General'])
 
 
-def load_categories():
-    if not os.path.exists(CATEGORIES_PATH):
-        return ['General']
-    with open(CATEGORIES_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def load_categories(mutable=False):
+    return CATEGORIES_STORE.load(mutable)
 
 
 def save_categories(categories):
-    with open(CATEGORIES_PATH, 'w', encoding='utf-8') as f:
-        json.dump(categories, f, indent=2, ensure_ascii=False)
+    CATEGORIES_STORE.save(categories)
 
 
 RESOURCES_PATH = os.path.join(app.root_path, "resources.json")
 
 
-def load_resources():
-    if not os.path.exists(RESOURCES_PATH):
-        return []
-    with open(RESOURCES_PATH, "r", encoding='utf-8') as f:
-        resources = json.load(f)
-        # Ensure backwards compatibility - add category field if missing
-        for resource in resources:
-            resource.setdefault('category', 'General')
-        return resources
+def _normalize_resources(resources):
+    # Ensure backwards compatibility - add category field if missing
+    for resource in resources:
+        resource.setdefault('category', 'General')
+    return resources
 
 
-def save_resources(resources):
-    with open(RESOURCES_PATH, "w", encoding='utf-8') as f:
-        json.dump(resources, f, indent=2, ensure_ascii=False)
+RESOURCES_STORE = JsonStore(RESOURCES_PATH, default=list, normalize=_normalize_resources)
+ADMINS_STORE = JsonStore(ADMINS_PATH, default=list)
+
 
+def load_resources(mutable=False):
+    return RESOURCES_STORE.load(mutable)
 
-def load_chats():
-    if not os.path.exists(CHATS_PATH):
-        return []
-    with open(CHATS_PATH, "r", encoding='utf-8') as f:
-        return json.load(f)
+
+def save_resources(resources):
+    RESOURCES_STORE.save(resources)
 
 
-def save_chats(chats):
-    with open(CHATS_PATH, "w", encoding='utf-8') as f:
-        json.dump(chats, f, indent=2, ensure_ascii=False)
+# Recent chat messages (bounded ring buffer) fanned out to /chat-stream and
+# /chat-data clients; the full history is appended to chat_log.jsonl.
+# Ids start from the startup time so cursors from a previous run are stale.
+CHAT_FEED = ChatFeed(log_path=CHAT_LOG_PATH, first_id=int(time.time()) * 1000)
+CHAT_FEED.restore()
+CHAT_STREAM_HEARTBEAT = 15
 
 
-def load_admins():
-    if not os.path.exists(ADMINS_PATH):
-        return []
-    with open(ADMINS_PATH, "r", encoding='utf-8') as f:
-        return json.load(f)
+def load_admins(mutable=False):
+    return ADMINS_STORE.load(mutable)
 
 
 def save_admins(admins):
-    with open(ADMINS_PATH, "w", encoding='utf-8') as f:
-        json.dump(admins, f, indent=2, ensure_ascii=False)
+    ADMINS_STORE.save(admins)
 
 
-def load_external_tools_config():
-    """Load external tools configuration."""
-    if not os.path.exists(EXTERNAL_TOOLS_CONFIG_PATH):
-        # Return default config if file doesn't exist
-        return {
-            "server_tools": [],
-            "settings": {
-                "allow_custom_tools": True,
-                "allow_user_tools": True,
-                "require_admin_approval": False,
-                "log_tool_usage": True,
-                "max_user_tools": 10
-            }
+def _default_external_tools_config():
+    # Return default config if file doesn't exist
+    return {
+        "server_tools": [],
+        "settings": {
+            "allow_custom_tools": True,
+            "allow_user_tools": True,
+            "require_admin_approval": False,
+            "log_tool_usage": True,
+            "max_user_tools": 10
         }
-    
+    }
+
+
+def _normalize_external_tools_config(config):
+    # Handle legacy format
+    if "tools" in config and "server_tools" not in config:
+        config["server_tools"] = config.pop("tools", [])
+
+    # Ensure server_tools exists
+    if "server_tools" not in config:
+        config["server_tools"] = []
+
+    return config
+
+
+EXTERNAL_TOOLS_STORE = JsonStore(
+    EXTERNAL_TOOLS_CONFIG_PATH,
+    default=_default_external_tools_config,
+    normalize=_normalize_external_tools_config
+)
+
+
+def load_external_tools_config(mutable=False):
+    """Load external tools configuration."""
     try:
-        with open(EXTERNAL_TOOLS_CONFIG_PATH, "r", encoding='utf-8') as f:
-            config = json.load(f)
-            
-            # Handle legacy format
-            if "tools" in config and "server_tools" not in config:
-                config["server_tools"] = config.pop("tools", [])
-            
-            # Ensure server_tools exists
-            if "server_tools" not in config:
-                config["server_tools"] = []
-                
-            return config
+        return EXTERNAL_TOOLS_STORE.load(mutable)
     except Exception as e:
         print(f"Error loading external tools config: {e}")
         return {"server_tools": [], "settings": {}}
@@ -209,14 +218,35 @@ def load_external_tools_config():
 def save_external_tools_config(config):
     """Save external tools configuration."""
     try:
-        with open(EXTERNAL_TOOLS_CONFIG_PATH, "w", encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        EXTERNAL_TOOLS_STORE.save(config)
+        tool_catalog.invalidate()
         return True
     except Exception as e:
         print(f"Error saving external tools config: {e}")
         return False
 
 
+@app.route('/admin/storage-stats')
+def storage_stats():
+    """Cache, write-coalescing and connection pool counters for the data stores."""
+    if not session.get('logged_in') or not session.get('secret_admin'):
+        return jsonify({'error': 'unauthorized'}), 401
+    stores = [CATEGORIES_STORE, RESOURCES_STORE, ADMINS_STORE, EXTERNAL_TOOLS_STORE]
+    from db_utils import DB_POOL, RELATED_ROW_CACHE, PERMISSION_CACHE
+    from enhanced_db_utils import ENHANCED_DB_POOL, template_cache_stats
+    from client_queue import queue_stats
+    return jsonify({
+        'stores': [store.stats() for store in stores],
+        'chat': CHAT_FEED.stats(),
+        'db_pools': [DB_POOL.stats(), ENHANCED_DB_POOL.stats()],
+        'template_cache': template_cache_stats(),
+        'related_row_cache': RELATED_ROW_CACHE.stats(),
+        'client_service_queue': queue_stats(),
+        'permission_cache': PERMISSION_CACHE.stats(),
+        'session_claims': dict(SESSION_CLAIM_STATS),
+        'tool_catalog': tool_catalog.CATALOG_CACHE.stats()
+    })
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_ATTACH_EXTENSIONS
@@ -273,16 +303,17 @@ def index():
 
 @app.route('/howto')
 def forum():
-    original_posts = load_posts()
+    from forum_db_utils import get_posting_lists, get_forum_posts_by_ids, search_forum_posts
     categories = load_categories()
     resources = load_resources()
     
     # Get pagination and sorting parameters
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 10))
-    sort_by = request.args.get('sort_by', 'newest')  # newest, oldest, title
-    category_filter = request.args.get('category', 'all')
     search_query = request.args.get('search', '').strip().lower()
+    # newest, oldest, title, relevance (best match when searching)
+    sort_by = request.args.get('sort_by', 'relevance' if search_query else 'newest')
+    category_filter = request.args.get('category', 'all')
     tag_filters = request.args.get('tags', '').strip()
     
     # Organize resources by category
@@ -301,75 +332,42 @@ def forum():
         # If viewing all posts, show only General category resources
         category_resources = resources_by_category.get('General', [])
     
-    # Add default values and create posts with original indices
-    posts_with_indices = []
-    for original_idx, p in enumerate(original_posts):
-        p.setdefault('category', 'General')
-        p.setdefault('created', datetime.utcnow().strftime('%Y-%m-%d %H:%M'))
-        p.setdefault('tags', [])  # Ensure tags field exists
-        posts_with_indices.append({'original_idx': original_idx, 'post': p})
-    
-    tags = sorted({t for item in posts_with_indices for t in item['post'].get('tags', [])})
+    posting_lists = get_posting_lists()
+    tags = posting_lists.tags
     
     # Add "All Posts" as the first category
-    all_categories = ['All Posts'] + categories
-    
-    # Sort posts based on sort_by parameter
-    if sort_by == 'oldest':
-        posts_with_indices.sort(key=lambda x: x['post'].get('created', ''))
-    elif sort_by == 'title':
-        posts_with_indices.sort(key=lambda x: x['post'].get('title', '').lower())
-    else:  # newest (default)
-        posts_with_indices.sort(key=lambda x: x['post'].get('created', ''), reverse=True)
-    
-    # Filter posts by category if not "all"
-    if category_filter != 'all' and category_filter in categories:
-        filtered_posts = [item for item in posts_with_indices if item['post'].get('category', 'General') == category_filter]
-    else:
-        filtered_posts = posts_with_indices
+    all_categories = ['All Posts'] + list(categories)
+    active_category = category_filter if category_filter != 'all' and category_filter in categories else None
+    tag_list = [tag.strip() for tag in tag_filters.split(',') if tag.strip()]
     
-    # Apply search filter if provided
+    # Look up matching posts in the search index (ranked, best match first)
+    ranked_ids = None
+    search_snippets = {}
     if search_query:
-        search_filtered = []
-        for item in filtered_posts:
-            post = item['post']
-            # Search in title and content
-            title_match = search_query in post.get('title', '').lower()
-            content_match = search_query in post.get('content', '').lower()
-            if title_match or content_match:
-                search_filtered.append(item)
-        filtered_posts = search_filtered
-    
-    # Apply tag filters if provided
-    if tag_filters:
-        tag_list = [tag.strip() for tag in tag_filters.split(',') if tag.strip()]
-        if tag_list:
-            tag_filtered = []
-            for item in filtered_posts:
-                post_tags = item['post'].get('tags', [])
-                # Check if all selected tags are in the post's tags
-                if all(tag in post_tags for tag in tag_list):
-                    tag_filtered.append(item)
-            filtered_posts = tag_filtered
+        hits = search_forum_posts(search_query)
+        ranked_ids = [hit['id'] for hit in hits]
+        search_snippets = {hit['id']: hit['snippet'] for hit in hits}
     
-    # Calculate pagination
-    total_posts = len(filtered_posts)
+    # Category, tag and search filters are resolved on the precomputed posting lists
+    matching_ids = posting_lists.select(sort_by, category=active_category, tags=tag_list, ranked_ids=ranked_ids)
+    
+    # Calculate pagination and only load the posts on this page
+    total_posts = len(matching_ids)
     total_pages = (total_posts + per_page - 1) // per_page
     start_idx = (page - 1) * per_page
     end_idx = start_idx + per_page
-    paginated_posts = filtered_posts[start_idx:end_idx]
+    page_items = [
+        {'index': p['id'], 'post': p, 'snippet': search_snippets.get(p['id'])}
+        for p in get_forum_posts_by_ids(matching_ids[start_idx:end_idx])
+    ]
     
-    # Build posts by category structure
+    # The "All Posts" tab and the selected category tab share the current page;
+    # other category tabs load their own page when clicked
     posts_by_cat = {c: [] for c in all_categories}
-    
-    # Add all posts to "All Posts" category (paginated)
-    for item in paginated_posts:
-        posts_by_cat['All Posts'].append({'index': item['original_idx'], 'post': item['post']})
-    
-    # Add posts to their specific categories (not paginated for category tabs)
-    for item in posts_with_indices:
-        cat = item['post'].get('category', 'General')
-        posts_by_cat.setdefault(cat, []).append({'index': item['original_idx'], 'post': item['post']})
+    posts_by_cat['All Posts'] = page_items
+    if active_category:
+        posts_by_cat[active_category] = page_items
+    category_counts = {c: posting_lists.category_count(c) for c in categories}
     
     # Pagination info
     pagination = {
@@ -388,6 +386,7 @@ def forum():
         categories=all_categories,
         tags=tags,
         posts_by_cat=posts_by_cat,
+        category_counts=category_counts,
         pagination=pagination,
         sort_by=sort_by,
         category_filter=category_filter,
@@ -517,7 +516,6 @@ def register():
 def chat():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    chats = load_chats()
     if request.method == 'POST':
         text = request.form.get('text', '').strip()
         image_file = request.files.get('image')
@@ -532,22 +530,77 @@ def chat():
                 image_name = name
         if text or image_name:
             name = (f"{session.get('first','')} {session.get('last','')}").strip() or session.get('username', 'Admin')
-            chats.append({
+            CHAT_FEED.publish({
                 'name': name,
                 'text': text,
                 'image': image_name,
                 'created': datetime.utcnow().strftime('%Y-%m-%d %H:%M')
             })
-            save_chats(chats)
             return redirect(url_for('chat'))
-    return render_template('chat.html', messages=chats)
+    return render_template('chat.html', messages=CHAT_FEED.recent())
 
 
 @app.route('/chat-data')
 def chat_data():
     if not session.get('logged_in'):
         return jsonify({'error': 'unauthorized'}), 401
-    return jsonify({'messages': load_chats()})
+
+    # ?since=<message id> returns only newer messages. Without a cursor, or with
+    # one from a previous run / older than the buffer, the recent history is
+    # resent and the client is told to reset.
+    since = request.args.get('since', type=int)
+    if since is None or CHAT_FEED.is_stale(since):
+        return jsonify({'messages': CHAT_FEED.recent(), 'last_id': CHAT_FEED.last_id, 'reset': True})
+    return jsonify({'messages': CHAT_FEED.since(since), 'last_id': CHAT_FEED.last_id, 'reset': False})
+
+
+def _sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route('/chat-stream')
+def chat_stream():
+    """Server-Sent Events stream of new chat messages.
+
+    Browsers resume with the Last-Event-ID header after a reconnect, so only
+    messages they have not seen are sent. /chat-data remains as a fallback.
+    """
+    if not session.get('logged_in'):
+        return jsonify({'error': 'unauthorized'}), 401
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    def generate(last_id):
+        yield "retry: 3000\n\n"
+        if CHAT_FEED.is_stale(last_id):
+            # The server restarted or the client fell out of the buffer; start over
+            last_id = 0
+            yield _sse_event('reset', {})
+        for message in CHAT_FEED.since(last_id):
+            yield _sse_event('message', message, message['id'])
+            last_id = message['id']
+        yield _sse_event('ready', {'last_id': last_id})
+        while True:
+            messages = CHAT_FEED.wait_for(last_id, timeout=CHAT_STREAM_HEARTBEAT)
+            if not messages:
+                yield ": keep-alive\n\n"
+                continue
+            for message in messages:
+                yield _sse_event('message', message, message['id'])
+            last_id = messages[-1]['id']
+
+    return Response(generate(last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 
 @app.route('/manage-admins', methods=['GET', 'POST'])
@@ -618,7 +671,7 @@ def manage_admins():
 def manage_categories():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    categories = load_categories()
+    categories = load_categories(mutable=True)
     error = None
     if request.method == 'POST':
         action = request.form.get('action', 'add')
@@ -633,14 +686,11 @@ def manage_categories():
             old = request.form.get('old', '')
             new = request.form.get('new', '').strip()
             if old in categories and new and new not in categories:
-                posts = load_posts()
-                for p in posts:
-                    if p.get('category') == old:
-                        p['category'] = new
-                save_posts(posts)
+                from forum_db_utils import rename_forum_category
+                rename_forum_category(old, new)
                 
                 # Also update resources with the old category
-                resources = load_resources()
+                resources = load_resources(mutable=True)
                 for r in resources:
                     if r.get('category') == old:
                         r['category'] = new
@@ -653,14 +703,11 @@ def manage_categories():
         elif action == 'delete':
             name = request.form.get('name', '')
             if name in categories and name != 'General':
-                posts = load_posts()
-                for p in posts:
-                    if p.get('category') == name:
-                        p['category'] = 'General'
-                save_posts(posts)
+                from forum_db_utils import rename_forum_category
+                rename_forum_category(name, 'General')
                 
                 # Also move resources from deleted category to General
-                resources = load_resources()
+                resources = load_resources(mutable=True)
                 for r in resources:
                     if r.get('category') == name:
                         r['category'] = 'General'
@@ -677,7 +724,7 @@ def manage_categories():
 def manage_resources():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    resources = load_resources()
+    resources = load_resources(mutable=True)
     error = None
     if request.method == 'POST':
         action = request.form.get('action', 'add')
@@ -762,7 +809,7 @@ def new_post():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     if request.method == 'POST':
-        posts = load_posts()
+        from forum_db_utils import create_forum_post
         attachments = save_uploaded_files(request.files.getlist('attachments'))
         embedded = [f for f in request.form.get('embedded_images', '').split(',') if f]
         tags = [t.strip() for t in request.form.get('tags', '').split(',') if t.strip()]
@@ -770,18 +817,15 @@ def new_post():
         # Clean the content to remove unwanted characters
         content = clean_content(request.form['content'])
         
-        posts.insert(0, {
-            'title': request.form['title'].strip(),
-            'content': content,
-            'author': 'Admin',
-            'created': datetime.utcnow().strftime('%Y-%m-%d %H:%M'),
-            'attachments': attachments,
-            'embedded': embedded,
-            'locked': False,
-            'category': request.form['category'],
-            'tags': tags
-        })
-        save_posts(posts)
+        create_forum_post(
+            title=request.form['title'].strip(),
+            content=content,
+            category=request.form['category'],
+            tags=tags,
+            attachments=attachments,
+            embedded=embedded,
+            author='Admin'
+        )
         return redirect(url_for('forum'))
     categories = load_categories()
     return render_template('newpost.html', post=None, categories=categories)
@@ -958,23 +1002,22 @@ function initTagManager(postIndex) {
     return response
 
 
-@app.route('/post-tags/<int:index>', methods=['GET', 'POST', 'DELETE'])
-def manage_post_tags(index):
+@app.route('/post-tags/<int:post_id>', methods=['GET', 'POST', 'DELETE'])
+def manage_post_tags(post_id):
     """API endpoint for managing tags on a specific post"""
     if not session.get('logged_in'):
         return jsonify({'error': 'Not authenticated'}), 401
     
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
+    from forum_db_utils import get_forum_post_tags, add_forum_post_tag, set_forum_post_tags, remove_forum_post_tag
+    title, current_tags = get_forum_post_tags(post_id)
+    if title is None:
         return jsonify({'error': 'Post not found'}), 404
     
-    post = posts[index]
-    
     if request.method == 'GET':
         # Return current tags
         return jsonify({
-            'tags': post.get('tags', []),
-            'post_title': post.get('title', 'Untitled')
+            'tags': current_tags,
+            'post_title': title or 'Untitled'
         })
     
     elif request.method == 'POST':
@@ -984,19 +1027,17 @@ def manage_post_tags(index):
         if 'tag' in data:
             # Add a single tag
             new_tag = data['tag'].strip()
-            if new_tag and new_tag not in post.get('tags', []):
-                post.setdefault('tags', []).append(new_tag)
-                save_posts(posts)
-                return jsonify({'success': True, 'tags': post['tags']})
+            tags = add_forum_post_tag(post_id, new_tag) if new_tag else None
+            if tags is not None:
+                return jsonify({'success': True, 'tags': tags})
             else:
                 return jsonify({'error': 'Tag already exists or is empty'}), 400
         
         elif 'tags' in data:
             # Set all tags (replace existing)
             new_tags = [tag.strip() for tag in data['tags'] if tag.strip()]
-            post['tags'] = new_tags
-            save_posts(posts)
-            return jsonify({'success': True, 'tags': post['tags']})
+            tags = set_forum_post_tags(post_id, new_tags)
+            return jsonify({'success': True, 'tags': tags if tags is not None else new_tags})
         
         else:
             return jsonify({'error': 'No tag data provided'}), 400
@@ -1006,10 +1047,9 @@ def manage_post_tags(index):
         data = request.get_json() or {}
         tag_to_remove = data.get('tag', '').strip()
         
-        if tag_to_remove and tag_to_remove in post.get('tags', []):
-            post['tags'].remove(tag_to_remove)
-            save_posts(posts)
-            return jsonify({'success': True, 'tags': post['tags']})
+        tags = remove_forum_post_tag(post_id, tag_to_remove) if tag_to_remove else None
+        if tags is not None:
+            return jsonify({'success': True, 'tags': tags})
         else:
             return jsonify({'error': 'Tag not found'}), 404
     
@@ -1017,19 +1057,19 @@ def manage_post_tags(index):
     return jsonify({'error': 'Invalid request method'}), 405
 
 
-@app.route('/debug-tags/<int:index>')
-def debug_tags(index):
+@app.route('/debug-tags/<int:post_id>')
+def debug_tags(post_id):
     """Debug route to inspect tag data for a specific post"""
     if not session.get('logged_in') or not session.get('secret_admin'):
         return {'error': 'unauthorized'}, 401
     
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
+    from forum_db_utils import get_forum_post
+    post = get_forum_post(post_id)
+    if not post:
         return {'error': 'Post not found'}, 404
     
-    post = posts[index]
     return {
-        'index': index,
+        'index': post_id,
         'title': post.get('title', 'No title'),
         'tags': post.get('tags', []),
         'tags_type': str(type(post.get('tags', []))),
@@ -1078,7 +1118,7 @@ def cleanup_resources():
     if not session.get('logged_in') or not session.get('secret_admin'):
         return redirect(url_for('login'))
     
-    resources = load_resources()
+    resources = load_resources(mutable=True)
     updated_count = 0
     
     for resource in resources:
@@ -1102,38 +1142,22 @@ def cleanup_posts():
     if not session.get('logged_in') or not session.get('secret_admin'):
         return redirect(url_for('login'))
     
-    posts = load_posts()
+    from forum_db_utils import get_all_forum_posts, update_forum_post_content
     cleaned_count = 0
-    tag_fixes = 0
-    comment_fixes = 0
     
-    for post in posts:
-        if 'content' in post:
-            original_content = post['content']
-            cleaned_content = clean_content(original_content)
+    for post in get_all_forum_posts():
+        original_content = post['content']
+        cleaned_content = clean_content(original_content)
+        title = post['title'].strip()
+        if original_content != cleaned_content or title != post['title']:
+            update_forum_post_content(post['id'], title, cleaned_content)
             if original_content != cleaned_content:
-                post['content'] = cleaned_content
                 cleaned_count += 1
-        
-        if 'title' in post:
-            post['title'] = post['title'].strip()
-        
-        # Ensure tags field exists and is a list
-        if 'tags' not in post:
-            post['tags'] = []
-            tag_fixes += 1
-        elif not isinstance(post['tags'], list):
-            post['tags'] = []
-            tag_fixes += 1
-        
-        # Ensure comments have IDs
-        comments = post.get('comments', [])
-        for comment in comments:
-            if 'id' not in comment:
-                comment['id'] = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
-                comment_fixes += 1
     
-    save_posts(posts)
+    # Tags and comment IDs are enforced by the forum tables, so there is
+    # nothing left to repair for them.
+    tag_fixes = 0
+    comment_fixes = 0
     
     return {
         'success': True, 
@@ -1144,20 +1168,20 @@ def cleanup_posts():
     }
 
 
-@app.route('/edit/<int:index>', methods=['GET', 'POST'])
-def edit_post(index):
+@app.route('/edit/<int:post_id>', methods=['GET', 'POST'])
+def edit_post(post_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
+    from forum_db_utils import get_forum_post, update_forum_post
+    post = get_forum_post(post_id)
+    if not post:
         return redirect(url_for('forum'))
-    post = posts[index]
     if request.method == 'POST':
         if post.get('locked'):
             return redirect(url_for('forum'))
         
         # Debug: Log form data
-        print(f"DEBUG: Editing post {index}")
+        print(f"DEBUG: Editing post {post_id}")
         print(f"DEBUG: Form keys: {list(request.form.keys())}")
         print(f"DEBUG: Title: '{request.form.get('title', '')}'")
         print(f"DEBUG: Content length: {len(request.form.get('content', ''))}")
@@ -1167,12 +1191,8 @@ def edit_post(index):
         # Clean the content to remove unwanted characters
         content = clean_content(request.form.get('content', ''))
         
-        # Update post fields
-        post['title'] = request.form.get('title', '').strip()
-        post['content'] = content
-        post['category'] = request.form.get('category', 'General')
-        
         # Handle tags - check if this is coming from the new tag manager or old input
+        new_tags = None
         if request.form.get('tag_management_mode') == 'api':
             # Tags are managed via API, don't override them here
             print("DEBUG: Using API tag management - skipping tag form processing")
@@ -1180,112 +1200,91 @@ def edit_post(index):
             # Traditional tag input handling (backwards compatibility)
             tags_input = request.form.get('tags', '').strip()
             print(f"DEBUG: Traditional tags input: '{tags_input}'")
-            if tags_input:
-                # Split by comma and clean each tag
-                new_tags = [t.strip() for t in tags_input.split(',') if t.strip()]
-                post['tags'] = new_tags
-                print(f"DEBUG: Set tags to: {new_tags}")
-            else:
-                # Explicitly clear tags when field is empty
-                post['tags'] = []
-                print("DEBUG: Cleared tags (empty input)")
+            # Split by comma and clean each tag (empty input clears the tags)
+            new_tags = [t.strip() for t in tags_input.split(',') if t.strip()]
+            print(f"DEBUG: Set tags to: {new_tags}")
         
         # Handle attachments and embedded images
         attachments = save_uploaded_files(request.files.getlist('attachments'))
         embedded = [f for f in request.form.get('embedded_images', '').split(',') if f]
-        post.setdefault('attachments', []).extend(attachments)
-        post.setdefault('embedded', []).extend(embedded)
         
-        print(f"DEBUG: Saving post with title: '{post['title']}', content length: {len(post['content'])}")
-        save_posts(posts)
-        print("DEBUG: Posts saved successfully")
+        title = request.form.get('title', '').strip()
+        print(f"DEBUG: Saving post with title: '{title}', content length: {len(content)}")
+        update_forum_post(
+            post_id,
+            title=title,
+            content=content,
+            category=request.form.get('category', 'General'),
+            tags=new_tags,
+            new_attachments=attachments,
+            new_embedded=embedded
+        )
+        print("DEBUG: Post saved successfully")
         return redirect(url_for('forum'))
     categories = load_categories()
-    return render_template('newpost.html', post=post, index=index, categories=categories)
+    return render_template('newpost.html', post=post, index=post_id, categories=categories)
 
 
-@app.route('/delete/<int:index>', methods=['POST'])
-def delete_post(index):
+@app.route('/delete/<int:post_id>', methods=['POST'])
+def delete_post(post_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
-        return redirect(url_for('forum'))
-    if posts[index].get('locked'):
+    from forum_db_utils import get_forum_post, delete_forum_post
+    post = get_forum_post(post_id)
+    if not post or post.get('locked'):
         return redirect(url_for('forum'))
-    posts.pop(index)
-    save_posts(posts)
+    delete_forum_post(post_id)
     return redirect(url_for('forum'))
 
 
-@app.route('/lock/<int:index>', methods=['POST'])
-def lock_post(index):
+@app.route('/lock/<int:post_id>', methods=['POST'])
+def lock_post(post_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
-        return redirect(url_for('forum'))
-    posts[index]['locked'] = not posts[index].get('locked')
-    save_posts(posts)
+    from forum_db_utils import toggle_forum_post_lock
+    toggle_forum_post_lock(post_id)
     return redirect(url_for('forum'))
 
 
-@app.route('/post/<int:index>', methods=['GET', 'POST'])
-def view_post(index):
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
-        return redirect(url_for('forum'))
-    post = posts[index]
+@app.route('/post/<int:post_id>', methods=['GET', 'POST'])
+def view_post(post_id):
+    from forum_db_utils import get_forum_post, add_forum_comment
     if request.method == 'POST':
         name = request.form.get('name', 'Anonymous').strip() or 'Anonymous'
         text = request.form.get('comment', '').strip()
-        if text:
-            comment_id = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')  # Unique ID
-            post.setdefault('comments', []).append({
-                'id': comment_id,
-                'name': name,
-                'text': text,
-                'created': datetime.utcnow().isoformat()
-            })
-            save_posts(posts)
-            return redirect(url_for('view_post', index=index))
+        if text and add_forum_comment(post_id, name, text):
+            return redirect(url_for('view_post', post_id=post_id))
+    post = get_forum_post(post_id, include_comments=True)
+    if not post:
+        return redirect(url_for('forum'))
     comments = post.get('comments', [])
-    return render_template('post.html', post=post, index=index, comments=comments)
+    return render_template('post.html', post=post, index=post_id, comments=comments)
 
 
-@app.route('/delete-comment/<int:post_index>/<comment_id>', methods=['POST'])
-def delete_comment(post_index, comment_id):
+@app.route('/delete-comment/<int:post_id>/<comment_id>', methods=['POST'])
+def delete_comment(post_id, comment_id):
     if not session.get('logged_in'):
         return redirect(url_for('login'))
     
-    posts = load_posts()
-    if post_index < 0 or post_index >= len(posts):
-        return redirect(url_for('forum'))
+    from forum_db_utils import delete_forum_comment
+    delete_forum_comment(post_id, comment_id)
     
-    post = posts[post_index]
-    comments = post.get('comments', [])
-    
-    # Remove comment with matching ID
-    post['comments'] = [c for c in comments if c.get('id') != comment_id]
-    save_posts(posts)
-    
-    return redirect(url_for('view_post', index=post_index))
+    return redirect(url_for('view_post', post_id=post_id))
 
 
-@app.route('/post-annotations/<int:index>', methods=['GET', 'POST', 'DELETE'])
-def manage_post_annotations(index):
+@app.route('/post-annotations/<int:post_id>', methods=['GET', 'POST', 'DELETE'])
+def manage_post_annotations(post_id):
     """API endpoint for managing annotations on a specific post"""
-    posts = load_posts()
-    if index < 0 or index >= len(posts):
+    from forum_db_utils import get_forum_post_tags, get_forum_annotations, add_forum_annotation, delete_forum_annotation
+    title, _ = get_forum_post_tags(post_id)
+    if title is None:
         return jsonify({'error': 'Post not found'}), 404
     
-    post = posts[index]
-    
     if request.method == 'GET':
         # Return current annotations
         return jsonify({
-            'annotations': post.get('annotations', []),
-            'post_title': post.get('title', 'Untitled')
+            'annotations': get_forum_annotations(post_id),
+            'post_title': title or 'Untitled'
         })
     
     elif request.method == 'POST':
@@ -1293,19 +1292,9 @@ def manage_post_annotations(index):
         data = request.get_json() or {}
         
         if 'annotation' in data:
-            annotation_id = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
-            new_annotation = {
-                'id': annotation_id,
-                'type': data['annotation'].get('type', 'highlight'),  # highlight, drawing, note
-                'data': data['annotation'].get('data', ''),
-                'position': data['annotation'].get('position', {}),
-                'color': data['annotation'].get('color', '#ffff00'),
-                'author': session.get('username', 'Anonymous'),
-                'created': datetime.utcnow().isoformat()
-            }
-            
-            post.setdefault('annotations', []).append(new_annotation)
-            save_posts(posts)
+            new_annotation = add_forum_annotation(post_id, data['annotation'], session.get('username', 'Anonymous'))
+            if not new_annotation:
+                return jsonify({'error': 'Failed to save annotation'}), 500
             return jsonify({'success': True, 'annotation': new_annotation})
         
         else:
@@ -1320,10 +1309,8 @@ def manage_post_annotations(index):
         annotation_id = data.get('annotation_id', '')
         
         if annotation_id:
-            annotations = post.get('annotations', [])
-            post['annotations'] = [a for a in annotations if a.get('id') != annotation_id]
-            save_posts(posts)
-            return jsonify({'success': True, 'annotations': post['annotations']})
+            delete_forum_annotation(post_id, annotation_id)
+            return jsonify({'success': True, 'annotations': get_forum_annotations(post_id)})
         else:
             return jsonify({'error': 'Annotation ID not found'}), 404
     
@@ -1336,27 +1323,61 @@ def resources(filename):
     return send_from_directory(app.root_path, filename)
 
 
+# Seconds an external-features capability claim in the session is trusted
+# (0 turns the claim off and every check goes to db_utils.PERMISSION_CACHE)
+SESSION_CLAIM_TTL = 30
+SESSION_CLAIM_STATS = {'hits': 0, 'misses': 0}
+
+
+def has_external_features():
+    """Whether the logged-in user may use external tools and the client service.
+
+    Secret admins always may. Otherwise a fresh capability claim stored in the
+    session answers without touching the database; it is ignored once it is
+    older than SESSION_CLAIM_TTL or after any permission change in this
+    process. Misses go through the per-user cache in db_utils. Database
+    errors propagate.
+    """
+    if session.get('secret_admin'):
+        return True
+    from db_utils import PERMISSION_CACHE, user_has_external_features
+    username = session.get('username')
+    generation = PERMISSION_CACHE.generation()
+    claim = session.get('external_claim')
+    if (SESSION_CLAIM_TTL and claim and claim.get('user') == username
+            and claim.get('gen') == generation and claim.get('exp', 0) > time.time()):
+        SESSION_CLAIM_STATS['hits'] += 1
+        return claim['value']
+    SESSION_CLAIM_STATS['misses'] += 1
+    value = user_has_external_features(username)
+    if SESSION_CLAIM_TTL:
+        session['external_claim'] = {'user': username, 'value': value, 'gen': generation,
+                                     'exp': time.time() + SESSION_CLAIM_TTL}
+    return value
+
+
 @app.route('/check-external-features')
 def check_external_features():
     """Check if current user has external features enabled."""
     if not session.get('logged_in'):
         return jsonify({'has_external_features': False})
     
-    # Secret admins (using master password) always have external features access
-    if session.get('secret_admin'):
-        return jsonify({'has_external_features': True})
-    
     username = session.get('username')
     try:
-        from db_utils import get_user_by_username
-        user = get_user_by_username(username)
-        has_external = user and user.get('external_features', 0) == 1
-        return jsonify({'has_external_features': has_external})
+        return jsonify({'has_external_features': has_external_features()})
     except Exception as e:
         print(f"Error checking external features for {username}: {e}")
         return jsonify({'has_external_features': False})
 
 
+def user_tool_catalog(username, config=None):
+    """Return the cached tool_catalog.ToolCatalog of server and user tools for username."""
+    from db_utils import get_user_external_tools_version, load_user_external_tools
+    if config is None:
+        config = load_external_tools_config()
+    return tool_catalog.get_tool_catalog(username, config, get_user_external_tools_version,
+                                         load_user_external_tools)
+
 
 @app.route('/api/external-tools')
 def get_external_tools():
@@ -1365,54 +1386,29 @@ def get_external_tools():
         return jsonify({'hasAccess': False, 'error': 'Not authenticated'}), 401
     
     username = session.get('username')
-    has_external = False
-    
-    # Secret admins (using master password) always have external features access
-    if session.get('secret_admin'):
-        has_external = True
-    else:
-        try:
-            from db_utils import get_user_by_username
-            user = get_user_by_username(username)
-            has_external = user and user.get('external_features', 0) == 1
-        except Exception as e:
-            print(f"Error getting external tools for {username}: {e}")
-            return jsonify({'hasAccess': False, 'error': str(e)}), 500
+    try:
+        has_external = has_external_features()
+    except Exception as e:
+        print(f"Error getting external tools for {username}: {e}")
+        return jsonify({'hasAccess': False, 'error': str(e)}), 500
     
     if not has_external:
         return jsonify({'hasAccess': False, 'tools': []})
     
-    # Load tools from configuration file and user tools
-    config = load_external_tools_config()
+    # Merged server + user tools, rebuilt only when either side changes
+    catalog = user_tool_catalog(username)
     
-    # Get server tools (excluding hidden ones for UI display)
-    server_tools = [
-        tool for tool in config.get('server_tools', []) 
-        if tool.get('enabled', False) and not tool.get('hidden', False)
-    ]
-    
-    # Get user tools if enabled
-    user_tools = []
-    if config.get('settings', {}).get('allow_user_tools', True):
-        try:
-            from db_utils import get_user_external_tools
-            user_tools = [
-                tool for tool in get_user_external_tools(username)
-                if tool.get('is_enabled', 1) == 1
-            ]
-        except Exception as e:
-            print(f"Error loading user tools for {username}: {e}")
-    
-    # Combine all tools
-    all_tools = server_tools + user_tools
-    
-    return jsonify({
+    response = jsonify({
         'hasAccess': True,
-        'tools': all_tools,
+        'tools': catalog.tools,
         'username': username,
-        'server_tools_count': len(server_tools),
-        'user_tools_count': len(user_tools)
+        'server_tools_count': len(catalog.server_tools),
+        'user_tools_count': len(catalog.user_tools)
     })
+    # Clients revalidate with If-None-Match and get a 304 while nothing changed
+    response.set_etag(catalog.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/api/external-tools/run', methods=['POST'])
@@ -1422,19 +1418,11 @@ def run_external_tool():
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
     username = session.get('username')
-    has_external = False
-    
-    # Secret admins (using master password) always have external features access
-    if session.get('secret_admin'):
-        has_external = True
-    else:
-        try:
-            from db_utils import get_user_by_username
-            user = get_user_by_username(username)
-            has_external = user and user.get('external_features', 0) == 1
-        except Exception as e:
-            print(f"Error checking external features for {username}: {e}")
-            return jsonify({'success': False, 'error': 'Database error'}), 500
+    try:
+        has_external = has_external_features()
+    except Exception as e:
+        print(f"Error checking external features for {username}: {e}")
+        return jsonify({'success': False, 'error': 'Database error'}), 500
     
     if not has_external:
         return jsonify({'success': False, 'error': 'External tools not enabled'}), 403
@@ -1446,30 +1434,9 @@ def run_external_tool():
         if not tool_id:
             return jsonify({'success': False, 'error': 'Tool ID required'}), 400
         
-        # Load tool configuration from server tools first
+        # Server tools (including hidden ones) take precedence over user tools
         config = load_external_tools_config()
-        tool_config = None
-        tool_source = None
-        
-        # Check server tools (including hidden ones)
-        for tool in config.get('server_tools', []):
-            if tool.get('id') == tool_id and tool.get('enabled', False):
-                tool_config = tool
-                tool_source = 'server'
-                break
-        
-        # If not found in server tools, check user tools
-        if not tool_config:
-            try:
-                from db_utils import get_user_external_tools
-                user_tools = get_user_external_tools(username)
-                for tool in user_tools:
-                    if tool.get('tool_id') == tool_id and tool.get('is_enabled', 1) == 1:
-                        tool_config = tool
-                        tool_source = 'user'
-                        break
-            except Exception as e:
-                print(f"Error loading user tools for execution: {e}")
+        tool_source, tool_config = user_tool_catalog(username, config).get(tool_id)
         
         if not tool_config:
             return jsonify({'success': False, 'error': 'Tool not found or disabled'}), 400
@@ -1514,31 +1481,23 @@ def run_external_tool():
             })
         
         elif tool_type == 'client_service':
-            # Queue command for client service execution
-            global CLIENT_SERVICE_QUEUE
-            
-            if username not in CLIENT_SERVICE_QUEUE:
-                CLIENT_SERVICE_QUEUE[username] = []
+            # Queue command for client service execution (durable, see client_queue.py)
+            from client_queue import enqueue
             
-            
-            # Create command for client service
-            command = {
-                'id': datetime.utcnow().strftime('%Y%m%d%H%M%S%f'),
-                'type': 'command',
-                'created': datetime.utcnow().isoformat(),
-                'status': 'pending'
-            }
             # Create generic tool command
             tool_executable = executable_path or tool_id
-            command["command"] = f"cmd|tool|{tool_id}|{tool_executable}|launch"
-            
-            CLIENT_SERVICE_QUEUE[username].append(command)
+            command_id, queue_message = enqueue(username, {
+                'type': 'command',
+                'command': f"cmd|tool|{tool_id}|{tool_executable}|launch"
+            })
+            if command_id is None:
+                return jsonify({'success': False, 'error': queue_message}), 500
             
             return jsonify({
                 'success': True,
                 'action': 'client_service',
                 'tool_id': tool_id,
-                'command_id': command['id'],
+                'command_id': command_id,
                 'message': f'Tool {tool_config.get("name", tool_id)} queued for client service execution'
             })
         elif tool_type == 'executable' or tool_type == 'script':
@@ -1567,30 +1526,32 @@ def client_service_queue():
         return jsonify({'success': False, 'error': 'Not authenticated'}), 401
     
     username = session.get('username')
-    has_external = False
-    
-    # Secret admins (using master password) always have external features access
-    if session.get('secret_admin'):
-        has_external = True
-    else:
-        try:
-            from db_utils import get_user_by_username
-            user = get_user_by_username(username)
-            has_external = user and user.get('external_features', 0) == 1
-        except Exception as e:
-            print(f"Error checking external features for {username}: {e}")
-            return jsonify({'success': False, 'error': 'Database error'}), 500
+    try:
+        has_external = has_external_features()
+    except Exception as e:
+        print(f"Error checking external features for {username}: {e}")
+        return jsonify({'success': False, 'error': 'Database error'}), 500
     
     if not has_external:
         return jsonify({'success': False, 'error': 'External tools not enabled'}), 403
     
     try:
-        # Simple in-memory queue (in production, use Redis or database)
-        global CLIENT_SERVICE_QUEUE
+        import client_queue
         
         if request.method == 'GET':
-            # Return pending tasks for this user
-            user_queue = CLIENT_SERVICE_QUEUE.get(username, [])
+            # Claim this user's deliverable commands; they stay hidden from other
+            # pollers until acknowledged or their visibility timeout runs out.
+            # With ?wait=<seconds> (long poll, at most client_queue.LONG_POLL_MAX)
+            # the request blocks until a command is queued or the wait expires.
+            try:
+                wait = float(request.args.get('wait', 0))
+                limit = int(request.args.get('limit', client_queue.CLAIM_LIMIT))
+            except ValueError:
+                return jsonify({'success': False, 'error': 'wait and limit must be numbers'}), 400
+            if wait > 0:
+                user_queue = client_queue.wait_and_claim(username, wait, limit)
+            else:
+                user_queue = client_queue.claim(username, limit)
             return jsonify({
                 'success': True,
                 'queue': user_queue,
@@ -1598,8 +1559,8 @@ def client_service_queue():
             })
             
         elif request.method == 'POST':
-            # Add task to queue or mark task as completed
-            data = request.get_json()
+            # Add a task, claim up to N commands, or acknowledge one or many
+            data = request.get_json(silent=True) or {}
             action = data.get('action', 'add')
             
             if action == 'add':
@@ -1608,23 +1569,15 @@ def client_service_queue():
                     return jsonify({'success': False, 'error': 'Tool ID required'}), 400
                 
                 # Add task to user's queue
-                if username not in CLIENT_SERVICE_QUEUE:
-                    CLIENT_SERVICE_QUEUE[username] = []
-                
-                task = {
-                    'id': datetime.utcnow().strftime('%Y%m%d%H%M%S%f'),
-                    'tool_id': tool_id,
-                    'created': datetime.utcnow().isoformat(),
-                    'status': 'pending'
-                }
-                
-                CLIENT_SERVICE_QUEUE[username].append(task)
+                task_id, queue_message = client_queue.enqueue(username, {'tool_id': tool_id})
+                if task_id is None:
+                    return jsonify({'success': False, 'error': queue_message}), 500
                 
                 print(f"Added task to queue for {username}: {tool_id}")
                 
                 return jsonify({
                     'success': True,
-                    'task_id': task['id'],
+                    'task_id': task_id,
                     'message': 'Task added to queue'
                 })
                 
@@ -1633,17 +1586,43 @@ def client_service_queue():
                 if not task_id:
                     return jsonify({'success': False, 'error': 'Task ID required'}), 400
                 
-                # Remove completed task from queue
-                user_queue = CLIENT_SERVICE_QUEUE.get(username, [])
-                CLIENT_SERVICE_QUEUE[username] = [
-                    task for task in user_queue if task.get('id') != task_id
-                ]
+                # Acknowledge the claimed task so it is not delivered again
+                client_queue.ack(username, [task_id])
                 
                 return jsonify({
                     'success': True,
                     'message': 'Task marked as completed'
                 })
             
+            elif action == 'claim':
+                # {"action": "claim", "limit": N}: atomically claim up to N commands
+                try:
+                    limit = int(data.get('limit', client_queue.CLAIM_LIMIT))
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'error': 'limit must be a number'}), 400
+                user_queue = client_queue.claim(username, limit)
+                return jsonify({
+                    'success': True,
+                    'queue': user_queue,
+                    'count': len(user_queue)
+                })
+            
+            elif action == 'ack':
+                # {"action": "ack", "results": [{"id", "success", "result"}, ...]}
+                items = data.get('results')
+                if not isinstance(items, list) or not all(isinstance(item, dict) and item.get('id') for item in items):
+                    return jsonify({'success': False, 'error': 'results must be a list of objects with an id'}), 400
+                
+                acked = client_queue.ack_many(username, [
+                    (item['id'], 'done' if item.get('success', True) else 'failed', item.get('result'))
+                    for item in items
+                ])
+                return jsonify({
+                    'success': True,
+                    'acked': sum(acked),
+                    'results': [{'id': item['id'], 'acked': ok} for item, ok in zip(items, acked)]
+                })
+            
             else:
                 return jsonify({'success': False, 'error': 'Invalid action'}), 400
         
@@ -1661,7 +1640,7 @@ def manage_external_tools():
     if not session.get('logged_in') or not session.get('secret_admin'):
         return redirect(url_for('login'))
     
-    config = load_external_tools_config()
+    config = load_external_tools_config(mutable=request.method == 'POST')
     error = None
     success = None
     
@@ -1756,19 +1735,11 @@ def client_tools(filename):
         return jsonify({'error': 'Not authenticated'}), 401
     
     username = session.get('username')
-    has_external = False
-    
-    # Check external features access
-    if session.get('secret_admin'):
-        has_external = True
-    else:
-        try:
-            from db_utils import get_user_by_username
-            user = get_user_by_username(username)
-            has_external = user and user.get('external_features', 0) == 1
-        except Exception as e:
-            print(f"Error checking external features for {username}: {e}")
-            return jsonify({'error': 'Database error'}), 500
+    try:
+        has_external = has_external_features()
+    except Exception as e:
+        print(f"Error checking external features for {username}: {e}")
+        return jsonify({'error': 'Database error'}), 500
     
     if not has_external:
         return jsonify({'error': 'External features not enabled'}), 403
@@ -1949,9 +1920,8 @@ def manage_table_data(table_name):
     
     # Get table metadata
     try:
-        from db_utils import get_custom_tables
-        tables = get_custom_tables()
-        table_info = next((t for t in tables if t['table_name'] == table_name), None)
+        from db_utils import get_custom_table
+        table_info = get_custom_table(table_name)
         if not table_info:
             return redirect(url_for('manage_data_tables'))
     except Exception as e:
@@ -2011,8 +1981,13 @@ def manage_table_data(table_name):
         page = int(request.args.get('page', 1))
         per_page = 20
         offset = (page - 1) * per_page
+        # "Next" links carry a keyset cursor so deep pages don't scan with OFFSET;
+        # page numbers still work for direct jumps
+        page_cursor = request.args.get('cursor') or None
         
-        result, err = get_custom_table_data(table_name, limit=per_page, offset=offset)
+        result, err = get_custom_table_data(table_name, limit=per_page, offset=offset, cursor=page_cursor)
+        if err and page_cursor:
+            result, err = get_custom_table_data(table_name, limit=per_page, offset=offset)
         if err:
             error = err
             table_data = {'data': [], 'total': 0}
@@ -2033,7 +2008,8 @@ def manage_table_data(table_name):
             'has_prev': page > 1,
             'has_next': page < total_pages,
             'prev_num': page - 1 if page > 1 else None,
-            'next_num': page + 1 if page < total_pages else None
+            'next_num': page + 1 if page < total_pages else None,
+            'next_cursor': table_data.get('next_cursor')
         }
     else:
         pagination = {
@@ -2044,7 +2020,8 @@ def manage_table_data(table_name):
             'has_prev': False,
             'has_next': False,
             'prev_num': None,
-            'next_num': None
+            'next_num': None,
+            'next_cursor': None
         }
     
     return render_template('admin_table_data.html',
@@ -2130,23 +2107,40 @@ def delete_case_template(template_id):
 # Cases CRUD
 # ---------------------------------------------------------------------------
 
+# Cases shown per page on /cases
+CASES_PER_PAGE = 50
+
+
 @app.route('/cases')
 def cases():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    search = request.args.get('search', '').lower()
+    search = request.args.get('search', '').strip()
     template_filter = request.args.get('template', 'all')
-    from db_utils import get_all_cases, get_case_templates
-    cases = get_all_cases()
+    status_filter = request.args.get('status', 'all')
+    from db_utils import search_cases, get_case_templates, get_case_statuses
+    # Filtering, search (cases_fts) and keyset paging all happen in SQL
+    cases, next_cursor = search_cases(
+        search,
+        template_id=None if template_filter == 'all' else template_filter,
+        status=None if status_filter == 'all' else status_filter,
+        limit=CASES_PER_PAGE,
+        cursor=request.args.get('cursor'),
+    )
     templates = get_case_templates()
-    filtered = []
-    for c in cases:
-        if template_filter != 'all' and str(c['template_id']) != template_filter:
-            continue
-        if search and search not in json.dumps(c['case_data']).lower():
-            continue
-        filtered.append(c)
-    return render_template('cases.html', cases=filtered, templates=templates, search=search, template_filter=template_filter)
+    args = request.args.to_dict()
+    next_url = url_for('cases', **dict(args, cursor=next_cursor)) if next_cursor else None
+    first_url = url_for('cases', **{k: v for k, v in args.items() if k != 'cursor'}) if 'cursor' in args else None
+    # Keyset pages have no numbers; the links go to the newest and the next page
+    pagination = {
+        'has_prev': first_url is not None,
+        'has_next': next_url is not None,
+        'prev_num': first_url,
+        'next_num': next_url
+    }
+    return render_template('cases.html', cases=cases, templates=templates, search=search,
+                           template_filter=template_filter, status_filter=status_filter,
+                           statuses=get_case_statuses(), pagination=pagination)
 
 
 @app.route('/cases/new', methods=['GET', 'POST'])
@@ -2197,6 +2191,39 @@ def delete_case(case_id):
     return redirect(url_for('cases'))
 
 
+@app.route('/admin/data-tables/<table_name>/import', methods=['POST'])
+def import_table_data(table_name):
+    """Bulk import CSV/NDJSON rows into a custom table.
+
+    Accepts a multipart 'file' upload or the raw request body. Query/form
+    parameters: format (csv|ndjson, default from the file name), upsert
+    (1 to update rows whose unique key exists) and key (the unique column).
+    """
+    if not session.get('logged_in') or not session.get('secret_admin'):
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    from bulk_import import IMPORT_FORMATS, detect_format, open_text_stream, import_custom_table
+
+    upload = request.files.get('file')
+    filename = upload.filename if upload else request.args.get('filename', '')
+    fmt = request.values.get('format') or detect_format(filename, request.content_type)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"Unsupported format '{fmt}'"}), 400
+
+    stream = open_text_stream(upload.stream if upload else request.stream, filename)
+    report, message = import_custom_table(
+        table_name,
+        stream,
+        fmt,
+        upsert=request.values.get('upsert') in ('1', 'true', 'on'),
+        key_column=request.values.get('key') or None,
+        created_by=session.get('username', 'admin')
+    )
+    if report is None:
+        return jsonify({'success': False, 'message': message}), 400
+    return jsonify({'success': True, 'message': message, 'report': report})
+
+
 @app.route('/api/data-tables')
 def api_get_data_tables():
     """API endpoint to get list of custom data tables for other integrations."""
@@ -2215,6 +2242,7 @@ def api_get_data_tables():
                 'display_name': table['display_name'],
                 'description': table['description'],
                 'row_count': table['row_count'],
+                'data_version': table['data_version'],
                 'columns': table['columns']
             })
         
@@ -2252,6 +2280,61 @@ def api_get_table_data(table_name):
         return jsonify({'error': 'Failed to load table data'}), 500
 
 
+@app.route('/api/data-tables/<table_name>/export')
+def api_export_table_data(table_name):
+    """Stream every row of a custom table as CSV or NDJSON."""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    from bulk_export import open_custom_table_export, export_response
+    export, message = open_custom_table_export(table_name)
+    if export is None:
+        return jsonify({'error': message}), 404
+    response, message = export_response(export, table_name, request.args)
+    if response is None:
+        return jsonify({'error': message}), 400
+    return response
+
+
+@app.route('/api/cases/export')
+def api_export_cases():
+    """Stream every case as CSV or NDJSON."""
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    from bulk_export import open_cases_export, export_response
+    export, _ = open_cases_export()
+    response, message = export_response(export, 'cases', request.args)
+    if response is None:
+        return jsonify({'error': message}), 400
+    return response
+
+
+# Upper bound on lookups accepted by one related-batch request
+RELATED_BATCH_MAX = 200
+
+
+@app.route('/api/data-tables/related-batch', methods=['POST'])
+def api_get_related_batch():
+    """Resolve many related-row lookups in one request.
+
+    Body: {"lookups": [{"table", "column", "value", "return": [...]}, ...]};
+    the response's rows line up with the lookups (null where nothing matched).
+    """
+    if not session.get('logged_in'):
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    data = request.get_json(silent=True) or {}
+    lookups = data.get('lookups')
+    if not isinstance(lookups, list) or not all(isinstance(lookup, dict) for lookup in lookups):
+        return jsonify({'error': 'lookups must be a list of objects'}), 400
+    if len(lookups) > RELATED_BATCH_MAX:
+        return jsonify({'error': f'At most {RELATED_BATCH_MAX} lookups per request'}), 400
+
+    from db_utils import get_custom_table_related_batch
+    return jsonify({'success': True, 'rows': get_custom_table_related_batch(lookups)})
+
+
 @app.route('/api/data-tables/<table_name>/related')
 def api_get_related_data(table_name):
     """Return a single row from a table matching a column value."""
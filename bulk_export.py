@@ -0,0 +1,234 @@
+"""
+Streaming CSV/NDJSON export for custom tables, data tables and cases.
+Rows are read in keyset-ordered chunks (id > last id), so memory stays
+constant however large the table is and no pooled connection is held while
+a slow client drains the response. Output is produced by generators and can
+be gzip-compressed on the fly.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from flask import Response
+
+import db_utils
+import enhanced_db_utils
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+# Rows read per query; each chunk is fully converted before the connection is released
+EXPORT_CHUNK_SIZE = 2000
+# Output is buffered and yielded in pieces of roughly this many bytes
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _loads(value):
+    """Parse a stored JSON column, leaving non-JSON text as it is."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def iter_keyset(connect, sql, params=(), convert=dict, chunk_size=None):
+    """Yield convert(row) for every row of sql, chunk by chunk.
+
+    sql must select an id column and end with "id > ? ORDER BY id LIMIT ?";
+    the last id seen and chunk_size are appended to params for each chunk.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    last_id = 0
+    while True:
+        with connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (*params, last_id, chunk_size))
+            chunk = []
+            for row in cursor:
+                last_id = row['id']
+                chunk.append(convert(row))
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+
+
+def open_custom_table_export(table_name):
+    """Return ((columns, rows), message) for custom_<table_name>, or (None, error)."""
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT table_name FROM custom_tables_metadata WHERE table_name = ?", (table_name,))
+            if not cursor.fetchone():
+                return None, "Table not found"
+            cursor.execute(f"PRAGMA table_info(custom_{table_name})")
+            columns = [row['name'] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error opening export for {table_name}: {e}")
+        return None, f"Error exporting table: {str(e)}"
+
+    rows = iter_keyset(
+        db_utils.get_db_connection,
+        f"SELECT * FROM custom_{table_name} WHERE id > ? ORDER BY id LIMIT ?"
+    )
+    return (columns, rows), "Export ready"
+
+
+def open_data_table_export(table_id):
+    """Return ((columns, rows), message) for the active records of a data table."""
+    try:
+        with enhanced_db_utils.get_enhanced_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM data_tables WHERE id = ?", (table_id,))
+            if not cursor.fetchone():
+                return None, "Data table not found"
+            cursor.execute("SELECT column_name FROM data_table_columns WHERE table_id = ? ORDER BY id", (table_id,))
+            names = [row['column_name'] for row in cursor.fetchall()]
+    except Exception as e:
+        return None, f"Error exporting data table: {str(e)}"
+
+    def convert(row):
+        record = _loads(row['record_data'])
+        record = dict(record) if isinstance(record, dict) else {}
+        record.update(id=row['id'], created_at=row['created_at'],
+                      updated_at=row['updated_at'], created_by=row['created_by'])
+        return record
+
+    rows = iter_keyset(
+        enhanced_db_utils.get_enhanced_db_connection,
+        '''
+            SELECT id, record_data, created_at, updated_at, created_by
+            FROM data_table_records
+            WHERE table_id = ? AND is_active = 1 AND id > ? ORDER BY id LIMIT ?
+        ''',
+        (table_id,),
+        convert
+    )
+    columns = ['id'] + [name for name in names if name != 'id'] + ['created_at', 'updated_at', 'created_by']
+    return (columns, rows), "Export ready"
+
+
+def open_cases_export():
+    """Return ((columns, rows), message) for every legacy case."""
+    columns = ['id', 'template_id', 'template_name', 'status', 'case_data',
+               'created_at', 'updated_at', 'created_by']
+
+    def convert(row):
+        case = dict(row)
+        case['case_data'] = _loads(case['case_data'])
+        return case
+
+    rows = iter_keyset(
+        db_utils.get_db_connection,
+        '''
+            SELECT c.id, c.template_id, t.name AS template_name, c.status, c.case_data,
+                   c.created_at, c.updated_at, c.created_by
+            FROM cases c
+            LEFT JOIN case_templates t ON c.template_id = t.id
+            WHERE c.id > ? ORDER BY c.id LIMIT ?
+        ''',
+        convert=convert
+    )
+    return (columns, rows), "Export ready"
+
+
+def open_enhanced_cases_export(status=None, template_id=None):
+    """Return ((columns, rows), message) for enhanced cases, optionally filtered."""
+    columns = ['id', 'case_number', 'template_id', 'template_name', 'title', 'description',
+               'status', 'priority', 'assigned_to', 'case_data', 'metadata', 'tags', 'due_date',
+               'created_at', 'updated_at', 'created_by', 'last_modified_by']
+    query = '''
+        SELECT ec.*, ect.name AS template_name
+        FROM enhanced_cases ec
+        LEFT JOIN enhanced_case_templates ect ON ec.template_id = ect.id
+        WHERE 1=1
+    '''
+    params = []
+    if status:
+        query += ' AND ec.status = ?'
+        params.append(status)
+    if template_id:
+        query += ' AND ec.template_id = ?'
+        params.append(template_id)
+    query += ' AND ec.id > ? ORDER BY ec.id LIMIT ?'
+
+    def convert(row):
+        case = dict(row)
+        for key in ('case_data', 'metadata', 'tags'):
+            case[key] = _loads(case[key])
+        return case
+
+    rows = iter_keyset(enhanced_db_utils.get_enhanced_db_connection, query, params, convert)
+    return (columns, rows), "Export ready"
+
+
+def _csv_cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_export_text(columns, rows, fmt):
+    """Yield the export as text pieces of about EXPORT_FLUSH_BYTES each."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        write = lambda row: writer.writerow([_csv_cell(row.get(column)) for column in columns])
+    elif fmt == 'ndjson':
+        write = lambda row: buffer.write(json.dumps(row, default=str) + '\n')
+    else:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+
+    for row in rows:
+        write(row)
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_export_bytes(columns, rows, fmt, compress=False):
+    """Yield the encoded (and optionally gzip-compressed) export."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    for text in iter_export_text(columns, rows, fmt):
+        data = text.encode('utf-8')
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def export_mimetype(fmt, compress=False):
+    return 'application/gzip' if compress else EXPORT_MIMETYPES[fmt]
+
+
+def export_filename(name, fmt, compress=False):
+    return f"{name}.{fmt}" + ('.gz' if compress else '')
+
+
+def export_response(export, name, args):
+    """Return (response, message) streaming an open export per the request args.
+
+    args are the query arguments: ?format= (csv or ndjson) and ?gzip=1.
+    response is None for an unsupported format, so each caller can answer
+    400 in its own error shape.
+    """
+    fmt = args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return None, f"Unsupported format '{fmt}'"
+    compress = args.get('gzip') in ('1', 'true')
+    columns, rows = export
+    response = Response(
+        iter_export_bytes(columns, rows, fmt, compress),
+        mimetype=export_mimetype(fmt, compress),
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(name, fmt, compress)}"'}
+    )
+    return response, "Export started"
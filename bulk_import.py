@@ -0,0 +1,529 @@
+"""
+Bulk CSV/NDJSON import for custom tables and enhanced data tables.
+Input is read as a stream, each row is validated against the table's column
+schema, and valid rows are written with executemany in large transactions.
+Rows that fail validation or hit a constraint are reported with their line
+number instead of aborting the import.
+
+Command line usage:
+    python bulk_import.py custom <table_name> <file> [--upsert] [--key COLUMN]
+    python bulk_import.py data-table <table_id|table_name> <file> [--upsert] [--key COLUMN]
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import sys
+from datetime import date, datetime
+
+import db_utils
+import enhanced_db_utils
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+# Rows per executemany call; each batch is committed as one transaction
+DEFAULT_BATCH_SIZE = 10000
+# Per-row errors kept in the report (the count is always exact)
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+FALSE_VALUES = ('0', 'false', 'f', 'no', 'n', 'off')
+
+
+class ImportReport:
+    """Counters and per-row errors for one import run."""
+
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.ignored_columns = set()
+
+    def add_error(self, line, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': str(error)})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'ignored_columns': sorted(self.ignored_columns),
+        }
+
+
+def detect_format(filename='', content_type=''):
+    """Guess the import format from a file name or content type (defaults to csv)."""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    if name.endswith(('.ndjson', '.jsonl', '.json')) or 'json' in (content_type or ''):
+        return 'ndjson'
+    return 'csv'
+
+
+def open_text_stream(binary_stream, filename=''):
+    """Wrap a binary upload stream as text, transparently gunzipping .gz input."""
+    if (filename or '').lower().endswith('.gz'):
+        binary_stream = gzip.GzipFile(fileobj=binary_stream, mode='rb')
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def iter_import_rows(text_stream, fmt):
+    """Yield (line_number, row_dict, error) for each input row.
+
+    Exactly one of row_dict and error is set. Parsing is lazy, so arbitrarily
+    large inputs are never held in memory.
+    """
+    if fmt == 'csv':
+        yield from _iter_csv_reader(csv.DictReader(text_stream))
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(row, dict):
+                yield line_number, row, None
+            else:
+                yield line_number, None, "Each line must be a JSON object"
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'")
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and value.strip() == '')
+
+
+def _to_boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+def _to_integer(value):
+    if isinstance(value, bool):
+        raise ValueError(f"'{value}' is not an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"'{value}' is not an integer")
+        return int(value)
+    return int(str(value).strip())
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError(f"'{value}' is not a number")
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _to_date(value):
+    text = str(value).strip()
+    date.fromisoformat(text)
+    return text
+
+
+def _to_datetime(value):
+    text = str(value).strip()
+    datetime.fromisoformat(text)
+    return text
+
+
+# Coercions by custom table column type (see create_custom_table)
+CUSTOM_COLUMN_COERCIONS = {
+    'string': str,
+    'text': str,
+    'integer': _to_integer,
+    'decimal': lambda value: float(_to_number(value)),
+    'boolean': lambda value: int(_to_boolean(value)),
+    'date': _to_date,
+    'datetime': _to_datetime,
+}
+
+# Coercions by data table column data_type
+DATA_TABLE_COERCIONS = {
+    'text': str,
+    'number': _to_number,
+    'boolean': _to_boolean,
+    'date': _to_date,
+}
+
+
+def validate_row(row, columns, report):
+    """Coerce row values for columns, a list of (name, coerce, required).
+
+    Returns ({name: value} for the columns present in the row, [problems]).
+    Keys that are not schema columns are ignored and listed in the report.
+    """
+    values = {}
+    problems = []
+    for name, coerce, required in columns:
+        value = row.get(name)
+        if _is_blank(value):
+            if required:
+                problems.append(f"'{name}' is required")
+            elif name in row:
+                values[name] = None
+            continue
+        try:
+            values[name] = coerce(value)
+        except (TypeError, ValueError):
+            problems.append(f"Invalid value for '{name}': {value!r}")
+
+    known = {name for name, _, _ in columns}
+    for key in row:
+        if key not in known:
+            report.ignored_columns.add(str(key))
+    return values, problems
+
+
+def _write_batch(conn, cursor, sql, batch, report):
+    """executemany one batch; on a constraint error, redo it row by row to find the bad rows."""
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    cursor.execute("SAVEPOINT bulk_batch")
+    try:
+        cursor.executemany(sql, [params for _, params in batch])
+        written = len(batch)
+    except sqlite3.IntegrityError:
+        cursor.execute("ROLLBACK TO bulk_batch")
+        written = 0
+        for line, params in batch:
+            try:
+                cursor.execute(sql, params)
+                written += 1
+            except sqlite3.IntegrityError as e:
+                report.add_error(line, e)
+    cursor.execute("RELEASE bulk_batch")
+    conn.commit()
+    return written
+
+
+def import_custom_table_rows(table_name, rows, upsert=False, key_column=None,
+                             created_by="admin", batch_size=DEFAULT_BATCH_SIZE, fieldnames=None):
+    """Bulk insert (or upsert) rows into custom_<table_name>.
+
+    rows yields (line_number, row_dict, error) tuples as produced by
+    iter_import_rows(). Only schema columns are written; with fieldnames
+    (a CSV header) the statement is limited to the columns it contains, so a
+    partial file in upsert mode updates just those columns. Required columns
+    must be present in either mode. Upserts match on key_column, which
+    defaults to the table's first unique column.
+    Returns (report_dict, message); report_dict is None if the import could
+    not start.
+    """
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            schema = db_utils.get_custom_table_schema(table_name)
+            if schema is None:
+                return None, "Table not found"
+
+            if fieldnames is not None:
+                missing = [col['name'] for col in schema
+                           if col.get('required') and col['name'] not in fieldnames]
+                if missing:
+                    return None, f"Missing required column(s): {', '.join(missing)}"
+                schema = [col for col in schema if col['name'] in fieldnames]
+            if not schema:
+                return None, "No columns in the input match the table"
+
+            columns = [
+                (col['name'], CUSTOM_COLUMN_COERCIONS.get(col['type'], str), bool(col.get('required')))
+                for col in schema
+            ]
+            names = [name for name, _, _ in columns]
+            insert_columns = names + ['created_at', 'updated_at', 'created_by']
+            sql = f"""
+                INSERT INTO custom_{table_name} ({', '.join(insert_columns)})
+                VALUES ({', '.join('?' for _ in insert_columns)})
+            """
+
+            if upsert:
+                unique = [col['name'] for col in schema if col.get('unique')]
+                key_column = key_column or (unique[0] if unique else None)
+                if key_column not in unique:
+                    return None, "Upsert needs a unique column present in the input"
+                updates = [f"{name} = excluded.{name}" for name in names if name != key_column]
+                updates.append("updated_at = excluded.updated_at")
+                sql += f" ON CONFLICT({key_column}) DO UPDATE SET {', '.join(updates)}"
+
+            report = ImportReport()
+            written = 0
+            batch = []
+            current_time = datetime.now().isoformat()
+            for line, row, error in rows:
+                report.processed += 1
+                if error:
+                    report.add_error(line, error)
+                    continue
+                values, problems = validate_row(row, columns, report)
+                if problems:
+                    report.add_error(line, '; '.join(problems))
+                    continue
+                params = [values.get(name) for name in names]
+                params.extend([current_time, current_time, created_by])
+                batch.append((line, params))
+                if len(batch) >= batch_size:
+                    written += _write_batch(conn, cursor, sql, batch, report)
+                    batch = []
+            if batch:
+                written += _write_batch(conn, cursor, sql, batch, report)
+
+            db_utils.RELATED_ROW_CACHE.invalidate(table_name)
+            if upsert:
+                # Updates keep the row's created_at, so the rows stamped with this
+                # import's time are the inserted ones (a created_at index range)
+                cursor.execute(f"SELECT COUNT(*) FROM custom_{table_name} WHERE created_at = ?",
+                               (current_time,))
+                report.inserted = cursor.fetchone()[0]
+                report.updated = written - report.inserted
+            else:
+                report.inserted = written
+            return report.as_dict(), f"Imported {written} row(s), {report.failed} failed"
+
+    except Exception as e:
+        print(f"Error importing rows into {table_name}: {e}")
+        return None, f"Import failed: {str(e)}"
+
+
+def import_data_table_rows(table_id, rows, upsert=False, key_column=None,
+                           created_by="admin", batch_size=DEFAULT_BATCH_SIZE):
+    """Bulk add (or upsert) records into an enhanced data table.
+
+    rows yields (line_number, row_dict, error) tuples. Upserts match active
+    records on key_column (default: the table's first key field) and merge the
+    new values into the existing record_data with json_patch.
+    Returns (report_dict, message).
+    """
+    try:
+        with enhanced_db_utils.get_enhanced_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT column_name, data_type, is_key_field, validation_rules
+                FROM data_table_columns WHERE table_id = ? ORDER BY id
+            ''', (table_id,))
+            schema = [dict(row) for row in cursor.fetchall()]
+            if not schema:
+                return None, "Data table not found"
+
+            columns = []
+            for col in schema:
+                try:
+                    rules = json.loads(col['validation_rules'] or '{}')
+                except (TypeError, ValueError):
+                    rules = {}
+                required = bool(rules.get('required')) if isinstance(rules, dict) else False
+                columns.append((col['column_name'], DATA_TABLE_COERCIONS.get(col['data_type'], str), required))
+
+            key_path = None
+            existing = {}
+            if upsert:
+                key_fields = [col['column_name'] for col in schema if col['is_key_field']]
+                key_column = key_column or (key_fields[0] if key_fields else None)
+                if key_column not in [name for name, _, _ in columns]:
+                    return None, "Upsert needs a key column"
+                key_path = '$.' + json.dumps(key_column)
+                cursor.execute('''
+                    SELECT id, json_extract(record_data, ?) FROM data_table_records
+                    WHERE table_id = ? AND is_active = 1 ORDER BY id
+                ''', (key_path, table_id))
+                existing = {key: record_id for record_id, key in cursor.fetchall() if key is not None}
+
+            insert_sql = '''
+                INSERT INTO data_table_records (table_id, record_data, created_at, created_by)
+                VALUES (?, ?, ?, ?)
+            '''
+            update_sql = '''
+                UPDATE data_table_records SET record_data = json_patch(record_data, ?), updated_at = ?
+                WHERE id = ?
+            '''
+
+            report = ImportReport()
+            current_time = datetime.now().isoformat()
+            inserts = {}
+            updates = []
+
+            def flush():
+                if inserts:
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM data_table_records")
+                    last_id = cursor.fetchone()[0]
+                    report.inserted += _write_batch(conn, cursor, insert_sql, [
+                        (line, (table_id, json.dumps(values), current_time, created_by))
+                        for line, values in inserts.values()
+                    ], report)
+                    if upsert:
+                        cursor.execute('''
+                            SELECT id, json_extract(record_data, ?) FROM data_table_records
+                            WHERE table_id = ? AND id > ?
+                        ''', (key_path, table_id, last_id))
+                        existing.update((key, record_id) for record_id, key in cursor.fetchall())
+                    inserts.clear()
+                if updates:
+                    report.updated += _write_batch(conn, cursor, update_sql, updates, report)
+                    del updates[:]
+
+            for line, row, error in rows:
+                report.processed += 1
+                if error:
+                    report.add_error(line, error)
+                    continue
+                values, problems = validate_row(row, columns, report)
+                if problems:
+                    report.add_error(line, '; '.join(problems))
+                    continue
+
+                if not upsert:
+                    inserts[len(inserts)] = (line, values)
+                else:
+                    key = values.get(key_column)
+                    if key is None:
+                        report.add_error(line, f"'{key_column}' is required for upsert")
+                        continue
+                    if key in existing:
+                        updates.append((line, (json.dumps(values), current_time, existing[key])))
+                    elif key in inserts:
+                        # Same new key twice in one batch: the later row wins
+                        inserts[key][1].update(values)
+                    else:
+                        inserts[key] = (line, values)
+
+                if len(inserts) + len(updates) >= batch_size:
+                    flush()
+            flush()
+
+            written = report.inserted + report.updated
+            return report.as_dict(), f"Imported {written} record(s), {report.failed} failed"
+
+    except Exception as e:
+        print(f"Error importing records into data table {table_id}: {e}")
+        return None, f"Import failed: {str(e)}"
+    finally:
+        # Batches are committed as they go, so even a failed import may have written rows
+        enhanced_db_utils.invalidate_form_bundles(table_id)
+
+
+def import_custom_table(table_name, text_stream, fmt='csv', **options):
+    """Parse text_stream as fmt and bulk import it into a custom table."""
+    if fmt not in IMPORT_FORMATS:
+        return None, f"Unsupported import format '{fmt}'"
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        try:
+            fieldnames = reader.fieldnames
+        except csv.Error as e:
+            return None, f"Invalid CSV header: {e}"
+        if not fieldnames:
+            return None, "CSV input has no header row"
+        rows = _iter_csv_reader(reader)
+        return import_custom_table_rows(table_name, rows, fieldnames=fieldnames, **options)
+    return import_custom_table_rows(table_name, iter_import_rows(text_stream, fmt), **options)
+
+
+def import_data_table(table_id, text_stream, fmt='csv', **options):
+    """Parse text_stream as fmt and bulk import it into an enhanced data table."""
+    if fmt not in IMPORT_FORMATS:
+        return None, f"Unsupported import format '{fmt}'"
+    return import_data_table_rows(table_id, iter_import_rows(text_stream, fmt), **options)
+
+
+def _iter_csv_reader(reader):
+    # Same as iter_import_rows() for a DictReader whose header was already read
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, None, f"Invalid CSV: {e}"
+            continue
+        extra = row.pop(None, None)
+        if extra:
+            yield reader.line_num, None, f"Row has {len(extra)} more value(s) than the header"
+        else:
+            yield reader.line_num, row, None
+
+
+def _resolve_data_table_id(table):
+    if str(table).isdigit():
+        return int(table)
+    with enhanced_db_utils.get_enhanced_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM data_tables WHERE table_name = ?", (table,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import CSV/NDJSON rows into a data table.")
+    parser.add_argument('kind', choices=('custom', 'data-table'),
+                        help="custom_<name> table or enhanced data table")
+    parser.add_argument('table', help="custom table name, or data table id/name")
+    parser.add_argument('path', help="input file (.csv, .ndjson/.jsonl, optionally .gz; '-' for stdin)")
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help="input format (default: from the file name)")
+    parser.add_argument('--upsert', action='store_true', help="update rows whose key already exists")
+    parser.add_argument('--key', help="unique/key column to upsert on")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--created-by', default='admin')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if args.path == '-':
+        stream = open_text_stream(sys.stdin.buffer)
+    else:
+        stream = open_text_stream(open(args.path, 'rb'), args.path)
+
+    options = {'upsert': args.upsert, 'key_column': args.key,
+               'created_by': args.created_by, 'batch_size': args.batch_size}
+    started = datetime.now()
+    with stream:
+        if args.kind == 'custom':
+            report, message = import_custom_table(args.table, stream, fmt, **options)
+        else:
+            table_id = _resolve_data_table_id(args.table)
+            if table_id is None:
+                report, message = None, f"Data table '{args.table}' not found"
+            else:
+                report, message = import_data_table(table_id, stream, fmt, **options)
+    elapsed = (datetime.now() - started).total_seconds()
+
+    print(message)
+    if report is None:
+        return 1
+    print(f"Processed {report['processed']} row(s) in {elapsed:.1f}s: "
+          f"{report['inserted']} inserted, {report['updated']} updated, {report['failed']} failed")
+    if report['ignored_columns']:
+        print(f"Ignored columns: {', '.join(report['ignored_columns'])}")
+    for error in report['errors']:
+        print(f"  line {error['line']}: {error['error']}")
+    if report['errors_truncated']:
+        print(f"  ... {report['failed'] - len(report['errors'])} more error(s)")
+    return 0 if report['failed'] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
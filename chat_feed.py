@@ -0,0 +1,131 @@
+"""
+In-memory fan-out for the floating admin chat.
+New messages are published once and every open stream picks them up from the
+shared feed, so clients only ever receive messages they have not seen yet.
+
+Only the most recent messages are kept in memory (a fixed-size ring buffer);
+every message is also appended to a JSON-lines log on disk, so the history is
+never rewritten and memory stays bounded however long the server runs.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+
+DEFAULT_CAPACITY = 500
+
+
+class ChatFeed:
+    """Ring buffer of chat messages with monotonically increasing ids.
+
+    Readers block in wait_for() until a message newer than their cursor is
+    published (or the timeout expires) instead of re-fetching the history.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, log_path=None, first_id=1):
+        self._cond = threading.Condition()
+        self._messages = deque(maxlen=capacity)
+        # Starting ids above anything a previous server run handed out lets
+        # clients with an old cursor be detected as stale after a restart.
+        self._base_id = first_id - 1
+        self._last_id = self._base_id
+        self.capacity = capacity
+        self.log_path = log_path
+        self.logged = 0
+
+    def load(self, messages):
+        """Seed the feed from stored messages, assigning ids where missing."""
+        with self._cond:
+            self._messages.clear()
+            self._last_id = self._base_id
+            for message in messages:
+                self._append(message)
+            self._cond.notify_all()
+            return list(self._messages)
+
+    def restore(self):
+        """Reload the newest messages from the on-disk log (e.g. after a restart)."""
+        if not self.log_path or not os.path.exists(self.log_path):
+            return self.load([])
+        messages = deque(maxlen=self.capacity)
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash; skip it
+                    continue
+        return self.load(messages)
+
+    def _append(self, message):
+        message = dict(message)
+        if not isinstance(message.get('id'), int) or message['id'] <= self._last_id:
+            message['id'] = self._last_id + 1
+        self._last_id = message['id']
+        self._messages.append(message)
+        return message
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, message):
+        """Assign the next id to message, log it and wake up every waiting stream."""
+        with self._cond:
+            message = self._append(dict(message, id=self._last_id + 1))
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(message, ensure_ascii=False) + '\n')
+                self.logged += 1
+            self._cond.notify_all()
+            return message
+
+    def recent(self):
+        """Return every buffered message (oldest first)."""
+        with self._cond:
+            return list(self._messages)
+
+    def since(self, last_id):
+        """Return the buffered messages published after last_id (oldest first)."""
+        with self._cond:
+            return self._since(last_id)
+
+    def _since(self, last_id):
+        newer = []
+        # Ids are increasing, so walk back from the end until we reach the cursor
+        for message in reversed(self._messages):
+            if message['id'] <= last_id:
+                break
+            newer.append(message)
+        newer.reverse()
+        return newer
+
+    def is_stale(self, last_id):
+        """True if a client at last_id cannot be brought up to date with a delta.
+
+        That happens when the cursor is ahead of the feed (the server restarted)
+        or when messages after it have already dropped out of the ring buffer.
+        """
+        with self._cond:
+            if last_id > self._last_id:
+                return True
+            return bool(last_id and self._messages and last_id < self._messages[0]['id'] - 1)
+
+    def wait_for(self, last_id, timeout=None):
+        """Block until messages newer than last_id exist; return them ([] on timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+            return self._since(last_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'buffered': len(self._messages),
+                'capacity': self.capacity,
+                'last_id': self._last_id,
+                'logged': self.logged,
+            }
@@ -0,0 +1,264 @@
+"""
+Durable per-user command queue for the desktop client service.
+Commands live in the client_service_queue table of the main database, so
+they survive restarts and are shared by every Flask worker process.
+
+Delivery is at-least-once: claiming a command hides it from other pollers
+for a visibility timeout. A command that is not acknowledged in time becomes
+claimable again, until it has been attempted max_attempts times. Commands
+that were never delivered expire after their TTL, and finished ones are
+garbage-collected after a retention period.
+
+Clients long-poll with wait_and_claim(): enqueue() wakes the user's waiting
+requests in this process at once. Commands queued by another worker process
+are picked up by a cheap re-check every LONG_POLL_RECHECK seconds.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+
+import db_utils
+
+# Seconds a claimed command stays hidden before it may be handed out again
+VISIBILITY_TIMEOUT = 60
+# Deliveries before an unacknowledged command is given up on
+MAX_ATTEMPTS = 3
+# Seconds an undelivered command waits for a client before it expires
+COMMAND_TTL = 15 * 60
+# Seconds finished (done/failed) commands are kept for inspection
+DONE_RETENTION = 24 * 60 * 60
+# Commands handed out by one claim by default, and the most a client may ask for
+CLAIM_LIMIT = 20
+CLAIM_MAX = 100
+# Minimum seconds between opportunistic garbage collections
+GC_INTERVAL = 60
+# Longest a long-poll request may wait, and how often it re-checks the table
+LONG_POLL_MAX = 30
+LONG_POLL_RECHECK = 5
+
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+
+# Per-user [condition, version]; the version is bumped by every enqueue
+_signals = {}
+_signals_lock = threading.Lock()
+
+
+def _signal(username):
+    with _signals_lock:
+        return _signals.setdefault(username, [threading.Condition(), 0])
+
+
+def notify(username):
+    """Wake username's long-poll requests in this process."""
+    signal = _signal(username)
+    with signal[0]:
+        signal[1] += 1
+        signal[0].notify_all()
+
+
+def _command_from_row(row):
+    command = json.loads(row['payload'])
+    command.update({
+        'id': row['id'],
+        'status': row['status'],
+        'attempts': row['attempts'],
+        'created': row['created_at'],
+    })
+    return command
+
+
+def enqueue(username, payload, ttl=COMMAND_TTL, max_attempts=MAX_ATTEMPTS):
+    """Queue a command (a JSON-serializable dict) for username's client service.
+
+    Returns (command_id, message); command_id is None on failure.
+    """
+    now = time.time()
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO client_service_queue
+                (username, payload, status, attempts, max_attempts, visible_at, expires_at, created_at)
+                VALUES (?, ?, 'pending', 0, ?, ?, ?, ?)
+            ''', (username, json.dumps(payload), max_attempts, now, now + ttl,
+                  datetime.utcnow().isoformat()))
+            conn.commit()
+            command_id = cursor.lastrowid
+    except Exception as e:
+        print(f"Error queueing client service command for {username}: {e}")
+        return None, f"Error queueing command: {str(e)}"
+
+    notify(username)
+    maybe_collect_garbage()
+    return command_id, "Command queued"
+
+
+def claim(username, limit=CLAIM_LIMIT, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Atomically claim up to limit deliverable commands for username, oldest first.
+
+    Claimed commands are hidden from other pollers for visibility_timeout
+    seconds; acknowledge them with ack() before then.
+    """
+    now = time.time()
+    limit = max(1, min(int(limit), CLAIM_MAX))
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Take the write lock up front so two pollers cannot claim the same rows
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute('''
+                SELECT * FROM client_service_queue
+                WHERE username = ? AND status IN ('pending', 'claimed') AND visible_at <= ?
+                  AND expires_at > ? AND attempts < max_attempts
+                ORDER BY id
+                LIMIT ?
+            ''', (username, now, now, limit))
+            rows = cursor.fetchall()
+            if rows:
+                cursor.executemany('''
+                    UPDATE client_service_queue
+                    SET status = 'claimed', attempts = attempts + 1, visible_at = ?
+                    WHERE id = ?
+                ''', [(now + visibility_timeout, row['id']) for row in rows])
+            conn.commit()
+    except Exception as e:
+        print(f"Error claiming client service commands for {username}: {e}")
+        return []
+
+    commands = []
+    for row in rows:
+        command = _command_from_row(row)
+        command.update(status='claimed', attempts=row['attempts'] + 1)
+        commands.append(command)
+    return commands
+
+
+def wait_and_claim(username, timeout, limit=CLAIM_LIMIT, visibility_timeout=VISIBILITY_TIMEOUT):
+    """Claim commands like claim(), waiting up to timeout seconds for one to be queued.
+
+    Returns [] if nothing arrived in time.
+    """
+    deadline = time.monotonic() + min(max(timeout, 0), LONG_POLL_MAX)
+    signal = _signal(username)
+    while True:
+        # Read the version before claiming so an enqueue in between is not missed
+        with signal[0]:
+            seen = signal[1]
+        commands = claim(username, limit, visibility_timeout)
+        remaining = deadline - time.monotonic()
+        if commands or remaining <= 0:
+            return commands
+        with signal[0]:
+            if signal[1] == seen:
+                signal[0].wait(min(remaining, LONG_POLL_RECHECK))
+
+
+def ack(username, command_ids, status='done', result=None):
+    """Mark username's claimed commands as finished; returns how many were updated.
+
+    status is 'done' or 'failed'. Commands that were not claimed (or belong
+    to another user) are left alone.
+    """
+    return sum(ack_many(username, [(command_id, status, result) for command_id in command_ids]))
+
+
+def ack_many(username, results):
+    """Acknowledge many claimed commands in one transaction.
+
+    results is a list of (command_id, status, result) with status 'done' or
+    'failed' and result any JSON-serializable value (or None). Returns one
+    bool per item: False if the command was not claimed by username (already
+    acknowledged, expired or unknown).
+    """
+    for _, status, _ in results:
+        if status not in ('done', 'failed'):
+            raise ValueError(f"Invalid ack status: {status}")
+    if not results:
+        return []
+    now = time.time()
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            acked = []
+            for command_id, status, result in results:
+                cursor.execute('''
+                    UPDATE client_service_queue
+                    SET status = ?, result = ?, completed_at = ?
+                    WHERE id = ? AND username = ? AND status = 'claimed'
+                ''', (status, json.dumps(result) if result is not None else None, now, command_id, username))
+                acked.append(cursor.rowcount > 0)
+            conn.commit()
+            return acked
+    except Exception as e:
+        print(f"Error acknowledging client service commands for {username}: {e}")
+        return [False] * len(results)
+
+
+def pending_count(username):
+    """Number of commands still waiting to be delivered (or redelivered) to username."""
+    now = time.time()
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM client_service_queue
+                WHERE username = ? AND status IN ('pending', 'claimed')
+                  AND expires_at > ? AND attempts < max_attempts
+            ''', (username, now))
+            return cursor.fetchone()[0]
+    except Exception as e:
+        print(f"Error counting client service commands for {username}: {e}")
+        return 0
+
+
+def collect_garbage(now=None):
+    """Fail commands that ran out of attempts and delete expired or old finished ones.
+
+    Returns the number of rows deleted.
+    """
+    now = time.time() if now is None else now
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            # Claimed for the last time and never acknowledged
+            cursor.execute('''
+                UPDATE client_service_queue SET status = 'failed', completed_at = ?
+                WHERE status = 'claimed' AND attempts >= max_attempts AND visible_at <= ?
+            ''', (now, now))
+            cursor.execute('''
+                DELETE FROM client_service_queue
+                WHERE (status IN ('pending', 'claimed') AND expires_at <= ?)
+                   OR (status IN ('done', 'failed') AND completed_at <= ?)
+            ''', (now, now - DONE_RETENTION))
+            removed = cursor.rowcount
+            conn.commit()
+            return removed
+    except Exception as e:
+        print(f"Error collecting client service queue garbage: {e}")
+        return 0
+
+
+def maybe_collect_garbage():
+    """Run collect_garbage() if it has not run in this process for GC_INTERVAL seconds."""
+    global _last_gc
+    now = time.time()
+    with _gc_lock:
+        if now - _last_gc < GC_INTERVAL:
+            return 0
+        _last_gc = now
+    return collect_garbage(now)
+
+
+def queue_stats():
+    """Row counts per status, for /admin/storage-stats."""
+    try:
+        with db_utils.get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM client_service_queue GROUP BY status")
+            return {status: count for status, count in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error reading client service queue stats: {e}")
+        return {}
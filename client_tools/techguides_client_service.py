@@ -16,6 +16,7 @@ import sys
 import time
 import hashlib
 import base64
+from collections import deque
 from datetime import datetime
 import socket
 import webbrowser
@@ -23,6 +24,16 @@ from urllib.parse import urlparse
 import pystray
 from PIL import Image, ImageDraw
 
+# Seconds the server holds a queue request open waiting for a command (long poll)
+QUEUE_LONG_POLL_WAIT = 25
+# Retry delays after polling errors: doubled per failure up to the maximum
+POLL_BACKOFF_INITIAL = 1
+POLL_BACKOFF_MAX = 60
+# Commands claimed per queue request
+QUEUE_CLAIM_LIMIT = 20
+# Recently executed command ids remembered so a redelivery is acked, not re-run
+EXECUTED_HISTORY = 500
+
 
 class TechGuidesClientService:
     def __init__(self):
@@ -33,6 +44,11 @@ class TechGuidesClientService:
         self.is_authenticated = False
         self.is_running = False
         self.polling_thread = None
+        self.executed_ids = deque(maxlen=EXECUTED_HISTORY)
+        # Last /api/external-tools response and its ETag, revalidated per use
+        self.tools_etag = None
+        self.tools_data = None
+        self.tools_by_id = {}
         self.config_file = "techguides_client_config.json"
         self.tray_icon = None
         self.window_visible = True
@@ -387,81 +403,122 @@ class TechGuidesClientService:
         self.log_message("Started polling for command execution requests")
         
     def poll_for_requests(self):
-        """Poll server for command execution requests"""
+        """Long-poll the server for command execution requests"""
+        backoff = POLL_BACKOFF_INITIAL
         while self.is_running and self.is_authenticated:
             try:
-                # Check for pending commands
+                # The server answers as soon as a command is queued, or after the wait
                 queue_url = f"{self.server_url}/api/client-service/queue"
-                response = self.session.get(queue_url, timeout=5)
+                started = time.monotonic()
+                response = self.session.get(queue_url, params={'wait': QUEUE_LONG_POLL_WAIT,
+                                                               'limit': QUEUE_CLAIM_LIMIT},
+                                            timeout=QUEUE_LONG_POLL_WAIT + 10)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('success'):
-                        queue = data.get('queue', [])
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                
+                data = response.json()
+                if data.get('success'):
+                    queue = data.get('queue', [])
                         
-                        # Process each pending command
-                        for item in queue:
-                            if item.get('status') == 'pending':
-                                if item.get('type') == 'command':
-                                    command_str = item.get('command', '')
-                                    self.log_message(f"Processing command: {command_str}")
-                                    
-                                    # Execute the command
-                                    success = self.execute_command(command_str)
-                                    
-                                    if success:
-                                        # Mark command as completed
-                                        self.complete_task(item.get('id'))
-                                    else:
-                                        self.log_message(f"Command execution failed: {command_str}")
-                                else:
-                                    # Legacy task support - remove this once fully migrated
-                                    tool_id = item.get('tool_id')
-                                    if tool_id:
-                                        self.log_message(f"Processing legacy task: {tool_id}")
-                                        self.execute_tool(tool_id)
-                                        self.complete_task(item.get('id'))
-                                
-                time.sleep(2)  # Poll every 2 seconds
+                    # Process each claimed command, then acknowledge them all at once
+                    results = []
+                    for item in queue:
+                        # The server hands out commands already claimed for this client
+                        if item.get('status') not in ('pending', 'claimed'):
+                            continue
+                        if item.get('id') in self.executed_ids:
+                            # Ran before but the ack was lost; acknowledge without re-running
+                            results.append({'id': item.get('id'), 'success': True})
+                            continue
+                        
+                        if item.get('type') == 'command':
+                            command_str = item.get('command', '')
+                            self.log_message(f"Processing command: {command_str}")
+                            
+                            # Execute the command
+                            success = bool(self.execute_command(command_str))
+                            if not success:
+                                self.log_message(f"Command execution failed: {command_str}")
+                        else:
+                            # Legacy task support - remove this once fully migrated
+                            tool_id = item.get('tool_id')
+                            if not tool_id:
+                                continue
+                            self.log_message(f"Processing legacy task: {tool_id}")
+                            self.execute_tool(tool_id)
+                            success = True
+                        
+                        self.executed_ids.append(item.get('id'))
+                        results.append({'id': item.get('id'), 'success': success})
+                    
+                    self.ack_tasks(results)
+                
+                backoff = POLL_BACKOFF_INITIAL
+                if not data.get('queue') and time.monotonic() - started < 1:
+                    # Server without long-poll support answered at once
+                    time.sleep(2)
                 
             except Exception as e:
-                self.log_message(f"Polling error: {e}")
-                time.sleep(5)  # Wait longer on error
+                self.log_message(f"Polling error: {e} (retrying in {backoff}s)")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, POLL_BACKOFF_MAX)
 
-    def complete_task(self, command_id):
-        """Mark a command as completed"""
+    def ack_tasks(self, results):
+        """Acknowledge processed commands in one request.
+
+        results is a list of {'id', 'success'} dicts; failed commands are
+        recorded as failed on the server and not delivered again.
+        """
+        if not results:
+            return
         try:
             queue_url = f"{self.server_url}/api/client-service/queue"
-            data = {
-                'action': 'complete',
-                'task_id': command_id  # Keep task_id for server compatibility
-            }
-            
-            response = self.session.post(queue_url, json=data, timeout=5)
+            response = self.session.post(queue_url, json={'action': 'ack', 'results': results}, timeout=5)
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success'):
-                    self.log_message(f"Command {command_id} marked as completed")
+                    self.log_message(f"Acknowledged {result.get('acked', 0)} of {len(results)} command(s)")
                 else:
-                    self.log_message(f"Failed to mark command as completed: {result.get('error')}")
+                    self.log_message(f"Failed to acknowledge commands: {result.get('error')}")
             else:
-                self.log_message(f"Failed to complete command: HTTP {response.status_code}")
+                self.log_message(f"Failed to acknowledge commands: HTTP {response.status_code}")
                 
         except Exception as e:
-            self.log_message(f"Error completing command {command_id}: {e}")
+            # Unacknowledged commands are redelivered; executed_ids keeps them from re-running
+            self.log_message(f"Error acknowledging commands: {e}")
                 
+    def fetch_tools(self):
+        """Return the /api/external-tools data, revalidating the cached copy by ETag.
+
+        Returns None (after logging) if the server could not be reached or
+        answered with an error.
+        """
+        tools_url = f"{self.server_url}/api/external-tools"
+        headers = {'If-None-Match': self.tools_etag} if self.tools_etag and self.tools_data else {}
+        response = self.session.get(tools_url, headers=headers, timeout=5)
+        
+        if response.status_code == 304:
+            return self.tools_data
+        if response.status_code != 200:
+            self.log_message(f"Failed to load tools: HTTP {response.status_code}")
+            return None
+        
+        self.tools_data = response.json()
+        self.tools_etag = response.headers.get('ETag')
+        self.tools_by_id = {tool.get('id'): tool for tool in self.tools_data.get('tools', [])
+                            if tool.get('id') and tool.get('enabled', False)}
+        return self.tools_data
+        
     def refresh_tools(self):
         """Refresh the list of available tools"""
         if not self.is_authenticated:
             return
             
         try:
-            tools_url = f"{self.server_url}/api/external-tools"
-            response = self.session.get(tools_url, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
+            data = self.fetch_tools()
+            if data is not None:
                 if data.get('hasAccess'):
                     tools = data.get('tools', [])
                     
@@ -475,8 +532,6 @@ class TechGuidesClientService:
                     self.log_message(f"Loaded {len(tools)} available tools")
                 else:
                     self.log_message("No access to external tools")
-            else:
-                self.log_message(f"Failed to load tools: HTTP {response.status_code}")
                 
         except Exception as e:
             self.log_message(f"Error refreshing tools: {e}")
@@ -484,21 +539,12 @@ class TechGuidesClientService:
     def execute_tool(self, tool_id):
         """Execute a specific tool by getting its configuration and running it locally"""
         try:
-            # First, get the tool configuration from the server
-            tools_url = f"{self.server_url}/api/external-tools"
-            response = self.session.get(tools_url, timeout=5)
+            # First, get the tool configuration (a 304 while the catalog is unchanged)
+            data = self.fetch_tools()
             
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 if data.get('hasAccess'):
-                    tools = data.get('tools', [])
-                    
-                    # Find the tool configuration
-                    tool_config = None
-                    for tool in tools:
-                        if tool.get('id') == tool_id and tool.get('enabled', False):
-                            tool_config = tool
-                            break
+                    tool_config = self.tools_by_id.get(tool_id)
                     
                     if not tool_config:
                         self.log_message(f"Tool {tool_id} not found or disabled")
@@ -539,8 +585,6 @@ class TechGuidesClientService:
                     
                 else:
                     self.log_message("No access to external tools")
-            else:
-                self.log_message(f"Failed to get tool configuration: HTTP {response.status_code}")
                 
         except Exception as e:
             self.log_message(f"Error executing tool {tool_id}: {e}")
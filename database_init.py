@@ -5,106 +5,331 @@ This module ensures the database and tables are properly set up.
 
 import sqlite3
 import os
+import json
 from datetime import datetime
+from db_migrations import run_migrations
 
-def init_database():
-    """Initialize the database with all required tables and columns."""
+def _create_base_tables(cursor):
+    """Migration 1: users, custom tables, external tools and legacy cases."""
+    # Create users table with all required columns
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            last_name TEXT,
+            bio TEXT,
+            timezone TEXT DEFAULT 'UTC',
+            language TEXT DEFAULT 'en',
+            email_notifications INTEGER DEFAULT 1,
+            chat_notifications INTEGER DEFAULT 1,
+            newsletter INTEGER DEFAULT 0,
+            created_at TEXT,
+            updated_at TEXT,
+            last_login TEXT,
+            api_key TEXT,
+            api_enabled INTEGER DEFAULT 0,
+            external_features INTEGER DEFAULT 0
+        )
+    ''')
+    
+    # Create custom tables metadata table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS custom_tables_metadata (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT UNIQUE NOT NULL,
+            display_name TEXT NOT NULL,
+            description TEXT,
+            columns_json TEXT NOT NULL,
+            created_at TEXT,
+            updated_at TEXT,
+            created_by TEXT
+        )
+    ''')
+    
+    # Create user external tools table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_external_tools (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            tool_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            icon TEXT DEFAULT 'bi bi-gear',
+            type TEXT NOT NULL CHECK (type IN ('executable', 'website', 'script')),
+            executable_path TEXT,
+            website_url TEXT,
+            parameters TEXT,
+            is_enabled INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT,
+            UNIQUE(username, tool_id)
+        )
+    ''')
+
+    # Create case templates table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS case_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            fields_json TEXT NOT NULL,
+            rules_json TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            created_by TEXT
+        )
+    ''')
+
+    # Create cases table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_id INTEGER NOT NULL,
+            case_data TEXT NOT NULL,
+            status TEXT DEFAULT 'open',
+            created_at TEXT,
+            updated_at TEXT,
+            created_by TEXT,
+            FOREIGN KEY (template_id) REFERENCES case_templates(id)
+        )
+    ''')
+
+
+def _create_forum_tables(cursor):
+    """Migration 2: forum posts, tags, comments, annotations and search index."""
+    # Create forum post tables (posts, tags, comments, annotations)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT,
+            author TEXT,
+            category TEXT DEFAULT 'General',
+            attachments_json TEXT DEFAULT '[]',
+            embedded_json TEXT DEFAULT '[]',
+            locked INTEGER DEFAULT 0,
+            created TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_post_tags (
+            post_id INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            position INTEGER DEFAULT 0,
+            PRIMARY KEY (post_id, tag),
+            FOREIGN KEY (post_id) REFERENCES forum_posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            comment_id TEXT NOT NULL,
+            name TEXT,
+            text TEXT,
+            created TEXT,
+            FOREIGN KEY (post_id) REFERENCES forum_posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_annotations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            annotation_id TEXT NOT NULL,
+            type TEXT DEFAULT 'highlight',
+            data TEXT,
+            position_json TEXT,
+            color TEXT,
+            author TEXT,
+            created TEXT,
+            FOREIGN KEY (post_id) REFERENCES forum_posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Records one-shot imports (e.g. posts.json) so they never run twice
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_import_log (
+            source TEXT PRIMARY KEY,
+            post_count INTEGER,
+            imported_at TEXT
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_posts_category_created ON forum_posts(category, created)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_posts_created ON forum_posts(created)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_posts_title ON forum_posts(title COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_post_tags_tag ON forum_post_tags(tag, post_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_comments_post ON forum_comments(post_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_annotations_post ON forum_annotations(post_id, id)')
+
+    # Full-text search index for the forum (rowid = forum_posts.id)
     try:
-        # Ensure database file exists and is accessible
-        db_path = 'database.db'
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Create users table with all required columns
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                first_name TEXT,
-                last_name TEXT,
-                bio TEXT,
-                timezone TEXT DEFAULT 'UTC',
-                language TEXT DEFAULT 'en',
-                email_notifications INTEGER DEFAULT 1,
-                chat_notifications INTEGER DEFAULT 1,
-                newsletter INTEGER DEFAULT 0,
-                created_at TEXT,
-                updated_at TEXT,
-                last_login TEXT,
-                api_key TEXT,
-                api_enabled INTEGER DEFAULT 0,
-                external_features INTEGER DEFAULT 0
+            CREATE VIRTUAL TABLE IF NOT EXISTS forum_posts_fts USING fts5(
+                title, body, tags, comments,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
             )
         ''')
-        
-        # Create custom tables metadata table
+    except sqlite3.OperationalError as e:
+        print(f"Forum search index unavailable (FTS5 not supported): {e}")
+
+
+def _create_case_indexes(cursor):
+    """Migration 3: secondary indexes for the case and custom table listings."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cases_created ON cases(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cases_template_created ON cases(template_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_case_templates_created ON case_templates(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_custom_tables_metadata_created ON custom_tables_metadata(created_at)')
+    cursor.execute('ANALYZE')
+
+
+def _create_custom_table_indexes(cursor):
+    """Migration 4: created_at indexes on existing custom tables for keyset paging."""
+    from db_utils import ensure_custom_table_indexes
+
+    cursor.execute('''
+        SELECT m.table_name FROM custom_tables_metadata m
+        JOIN sqlite_master s ON s.type = 'table' AND s.name = 'custom_' || m.table_name
+    ''')
+    for (table_name,) in cursor.fetchall():
+        ensure_custom_table_indexes(cursor, table_name)
+
+
+def _create_custom_table_registry(cursor):
+    """Migration 5: JSON column schemas and trigger-maintained row counts for custom tables."""
+    from db_utils import ensure_custom_table_triggers, parse_custom_columns
+
+    cursor.execute('ALTER TABLE custom_tables_metadata ADD COLUMN row_count INTEGER NOT NULL DEFAULT 0')
+    cursor.execute("SELECT table_name, columns_json FROM custom_tables_metadata")
+    for table_name, columns_json in cursor.fetchall():
+        # columns_json used to be written with str(columns)
+        cursor.execute("UPDATE custom_tables_metadata SET columns_json = ? WHERE table_name = ?",
+                       (json.dumps(parse_custom_columns(columns_json)), table_name))
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f"custom_{table_name}",))
+        if cursor.fetchone():
+            cursor.execute(f"SELECT COUNT(*) FROM custom_{table_name}")
+            cursor.execute("UPDATE custom_tables_metadata SET row_count = ? WHERE table_name = ?",
+                           (cursor.fetchone()[0], table_name))
+            ensure_custom_table_triggers(cursor, table_name)
+
+
+def _create_case_search_index(cursor):
+    """Migration 6: status index and full-text search over case field values."""
+    from db_utils import rebuild_case_search_index
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cases_status_created ON cases(status, created_at)')
+    # rowid = cases.id; kept in step by create_case/update_case/delete_case
+    try:
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS custom_tables_metadata (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                table_name TEXT UNIQUE NOT NULL,
-                display_name TEXT NOT NULL,
-                description TEXT,
-                columns_json TEXT NOT NULL,
-                created_at TEXT,
-                updated_at TEXT,
-                created_by TEXT
+            CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(
+                field_values,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
             )
         ''')
-        
-        # Create user external tools table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_external_tools (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                tool_id TEXT NOT NULL,
-                name TEXT NOT NULL,
-                description TEXT,
-                icon TEXT DEFAULT 'bi bi-gear',
-                type TEXT NOT NULL CHECK (type IN ('executable', 'website', 'script')),
-                executable_path TEXT,
-                website_url TEXT,
-                parameters TEXT,
-                is_enabled INTEGER DEFAULT 1,
-                created_at TEXT,
-                updated_at TEXT,
-                UNIQUE(username, tool_id)
-            )
-        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Case search index unavailable (FTS5 not supported): {e}")
+        return
+    rebuild_case_search_index(cursor)
+
+
+def _create_client_service_queue(cursor):
+    """Migration 7: durable per-user command queue for the desktop client service."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_service_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            visible_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            created_at TEXT,
+            completed_at REAL,
+            result TEXT
+        )
+    ''')
+    # Claims seek a user's deliverable commands; GC scans by expiry/completion
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_client_service_queue_user
+        ON client_service_queue(username, visible_at)
+        WHERE status IN ('pending', 'claimed')
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_client_service_queue_expires ON client_service_queue(expires_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_client_service_queue_completed ON client_service_queue(completed_at)')
+
+
+def _create_forum_change_counter(cursor):
+    """Migration 8: single-row forum change counter bumped by triggers on posts and tags."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_change_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO forum_change_counter (id, version) VALUES (1, 0)')
+    for table in ('forum_posts', 'forum_post_tags'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_change
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE forum_change_counter SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def _create_custom_table_data_versions(cursor):
+    """Migration 9: custom_tables_metadata.data_version, bumped on every row insert, update or delete."""
+    from db_utils import ensure_custom_table_triggers
+
+    cursor.execute('ALTER TABLE custom_tables_metadata ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        SELECT m.table_name FROM custom_tables_metadata m
+        JOIN sqlite_master s ON s.type = 'table' AND s.name = 'custom_' || m.table_name
+    ''')
+    for (table_name,) in cursor.fetchall():
+        ensure_custom_table_triggers(cursor, table_name)
+
+
+def _add_user_tools_version(cursor):
+    """Migration 10: users.tools_version, bumped with every change to a user's external tools."""
+    cursor.execute('ALTER TABLE users ADD COLUMN tools_version INTEGER NOT NULL DEFAULT 0')
+
+
+# (version, description, migrate(cursor)); append new steps, never edit applied ones
+MIGRATIONS = [
+    (1, 'Base tables', _create_base_tables),
+    (2, 'Forum tables and search index', _create_forum_tables),
+    (3, 'Case listing indexes', _create_case_indexes),
+    (4, 'Custom table created_at indexes', _create_custom_table_indexes),
+    (5, 'Custom table schema registry and row counts', _create_custom_table_registry),
+    (6, 'Case status index and search index', _create_case_search_index),
+    (7, 'Client service command queue', _create_client_service_queue),
+    (8, 'Forum change counter', _create_forum_change_counter),
+    (9, 'Custom table data versions', _create_custom_table_data_versions),
+    (10, 'User external tools version', _add_user_tools_version),
+]
+
+
+def init_database():
+    """Bring the database schema up to date by applying pending migrations."""
+    try:
+        # Ensure database file exists and is accessible
+        db_path = 'database.db'
 
-        # Create case templates table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS case_templates (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                fields_json TEXT NOT NULL,
-                rules_json TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                created_by TEXT
-            )
-        ''')
+        run_migrations(db_path, MIGRATIONS)
 
-        # Create cases table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cases (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                template_id INTEGER NOT NULL,
-                case_data TEXT NOT NULL,
-                status TEXT DEFAULT 'open',
-                created_at TEXT,
-                updated_at TEXT,
-                created_by TEXT,
-                FOREIGN KEY (template_id) REFERENCES case_templates(id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        
         print("Database initialized successfully!")
         return True
         
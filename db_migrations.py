@@ -0,0 +1,65 @@
+"""
+Versioned schema migrations for the Tech Guides databases.
+Each database records the migrations it has applied in a schema_version table,
+so startup only runs the steps that are new instead of replaying every
+CREATE TABLE and sample-data insert.
+"""
+
+import sqlite3
+from datetime import datetime
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    ''')
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(db_path, migrations):
+    """Apply pending migrations to db_path in version order.
+
+    migrations is a list of (version, description, migrate) tuples where
+    migrate(cursor) performs the change. Every migration runs in its own
+    transaction together with its schema_version row, so a failed step is
+    rolled back and retried on the next start. Returns the versions applied.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    applied = []
+    try:
+        current = get_schema_version(conn)
+        cursor = conn.cursor()
+        for version, description, migrate in sorted(migrations, key=lambda m: m[0]):
+            if version <= current:
+                continue
+
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have migrated while we waited for the lock
+                cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+                if cursor.fetchone():
+                    cursor.execute("ROLLBACK")
+                    continue
+                migrate(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now().isoformat())
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+
+            print(f"Applied migration {version} to {db_path}: {description}")
+            applied.append(version)
+        return applied
+    finally:
+        conn.close()
@@ -0,0 +1,157 @@
+"""
+SQLite connection pooling for the Tech Guides website.
+Connections are opened once, tuned with PRAGMAs and handed out again on later
+calls, so each helper in db_utils/enhanced_db_utils no longer pays for a fresh
+connect (and loses its page cache and prepared statements) every time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Maximum number of pooled connections per database file
+DEFAULT_POOL_SIZE = int(os.environ.get('TECHGUIDES_DB_POOL_SIZE', '8'))
+# Seconds to wait for a free connection before opening a temporary extra one
+DEFAULT_POOL_TIMEOUT = float(os.environ.get('TECHGUIDES_DB_POOL_TIMEOUT', '5'))
+# Per-connection page cache (KiB) and memory-mapped I/O window (bytes)
+DEFAULT_CACHE_KB = int(os.environ.get('TECHGUIDES_DB_CACHE_KB', '16384'))
+DEFAULT_MMAP_BYTES = int(os.environ.get('TECHGUIDES_DB_MMAP_BYTES', str(64 * 1024 * 1024)))
+# Prepared statements kept per connection (sqlite3's statement cache)
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """A bounded LIFO pool of tuned sqlite3 connections for one database file.
+
+    acquire() reuses an idle connection when there is one, opens a new one
+    while the pool is below its size, and otherwise waits for a release. If
+    the wait times out an extra connection is opened and closed on release,
+    so callers are never refused.
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT,
+                 cache_kb=DEFAULT_CACHE_KB, mmap_bytes=DEFAULT_MMAP_BYTES):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cache_kb = cache_kb
+        self.mmap_bytes = mmap_bytes
+        self._cond = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._overflow = set()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.overflows = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(self.mmap_bytes)}")
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.execute("PRAGMA busy_timeout = 5000")
+        cursor.close()
+        return conn
+
+    def acquire(self):
+        """Check out a connection; pair every call with release()."""
+        with self._cond:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            if self._open < self.size:
+                self._open += 1
+                self.misses += 1
+                new_connection = True
+            else:
+                new_connection = False
+                self.waits += 1
+                started = time.perf_counter()
+                self._cond.wait_for(lambda: self._idle, self.timeout)
+                self.wait_seconds += time.perf_counter() - started
+                if self._idle:
+                    self.hits += 1
+                    return self._idle.pop()
+                self.overflows += 1
+
+        try:
+            conn = self._connect()
+        except Exception:
+            if new_connection:
+                with self._cond:
+                    self._open -= 1
+            raise
+        if not new_connection:
+            with self._cond:
+                self._overflow.add(id(conn))
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, rolling back anything left uncommitted."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            discard = True
+
+        with self._cond:
+            overflow = id(conn) in self._overflow
+            self._overflow.discard(id(conn))
+            if discard or overflow:
+                if not overflow:
+                    self._open -= 1
+            else:
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it."""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except sqlite3.ProgrammingError:
+            # e.g. the caller closed the connection; do not hand it out again
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard)
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones are closed on release)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            total = self.hits + self.misses + self.overflows
+            return {
+                'path': os.path.basename(self.path),
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 4),
+                'overflows': self.overflows,
+            }
@@ -5,25 +5,54 @@ This module provides safe database operations with proper error handling.
 
 import sqlite3
 import json
+import ast
+import re
+import os
+import threading
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from contextlib import contextmanager
+from db_pool import ConnectionPool
+from json_store import freeze
+from pagination import decode_cursor, encode_cursor, fetch_keyset_page
+from result_cache import LRUTTLCache, MISSING
+from tool_catalog import invalidate as invalidate_tool_catalog
+
+# Shared pool of tuned connections (WAL, page cache, mmap, foreign keys)
+DB_POOL = ConnectionPool('database.db')
+# Custom table schema registry: parsed (read-only) column lists by table name.
+# Row counts live in custom_tables_metadata.row_count, kept by triggers.
+_custom_schemas = {}
+_custom_schemas_lock = threading.Lock()
+# Columns every custom table has besides its own (see create_custom_table)
+CUSTOM_LEADING_COLUMNS = ('id',)
+CUSTOM_TRAILING_COLUMNS = ('created_at', 'updated_at', 'created_by')
+# Custom table names are used as SQL identifiers (custom_<name>)
+CUSTOM_TABLE_NAME = re.compile(r'^[a-zA-Z][a-zA-Z0-9_]*$')
+# Memoized related-row lookups (form auto-fill), keyed by
+# (table_name, search_column, search_value, return_columns)
+RELATED_ROW_CACHE = LRUTTLCache(
+    maxsize=int(os.environ.get('TECHGUIDES_RELATED_CACHE_SIZE', '4096')),
+    ttl=float(os.environ.get('TECHGUIDES_RELATED_CACHE_TTL', '300'))
+)
+# External-features flags by (username,), checked on every external tool and
+# client-service request; dropped when the user's profile or flag changes
+PERMISSION_CACHE = LRUTTLCache(
+    maxsize=int(os.environ.get('TECHGUIDES_PERMISSION_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('TECHGUIDES_PERMISSION_CACHE_TTL', '30'))
+)
+# Values per WHERE column IN (...) list in batched related lookups
+RELATED_BATCH_CHUNK = 500
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections with automatic cleanup."""
-    conn = None
-    try:
-        conn = sqlite3.connect('database.db')
-        conn.row_factory = sqlite3.Row  # Enable row factory for dict-like access
+    """Context manager for pooled database connections.
+
+    Uncommitted changes are rolled back when the block exits and the
+    connection goes back to DB_POOL.
+    """
+    with DB_POOL.connection() as conn:
         yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
 
 def create_user(username, email, password, first_name, last_name, **kwargs):
     """Create a new user in the database."""
@@ -149,6 +178,20 @@ def get_user_by_username(username):
         print(f"Error fetching user: {e}")
         return None
 
+def user_has_external_features(username):
+    """Return whether username has external features enabled (False for unknown users).
+    
+    Answers are cached in PERMISSION_CACHE; database errors propagate.
+    """
+    def load():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT external_features FROM users WHERE username = ?", (username,))
+            row = cursor.fetchone()
+            return bool(row and row[0] == 1)
+    
+    return PERMISSION_CACHE.get_or_load((username,), load)
+
 def update_user_profile(username, data):
     """Update user profile information."""
     try:
@@ -200,6 +243,7 @@ def update_user_profile(username, data):
                 
                 rows_affected = cursor.rowcount
                 conn.commit()
+                PERMISSION_CACHE.invalidate(username)
                 
                 if rows_affected > 0:
                     return True, f"Successfully updated {rows_affected} row(s)"
@@ -252,6 +296,7 @@ def delete_user(username):
             rows_affected = cursor.rowcount
             
             conn.commit()
+            PERMISSION_CACHE.invalidate(username)
             
             if rows_affected > 0:
                 return True, "Account deleted successfully"
@@ -316,6 +361,7 @@ def toggle_user_external_features(username):
             """, (new_state, datetime.now().isoformat(), username))
             
             conn.commit()
+            PERMISSION_CACHE.invalidate(username)
             
             state_text = "enabled" if new_state == 1 else "disabled"
             return True, f"External features {state_text} for user {username}"
@@ -327,6 +373,101 @@ def toggle_user_external_features(username):
 
 # Custom Data Tables Management Functions
 
+def _check_custom_table_name(table_name):
+    if not isinstance(table_name, str) or not CUSTOM_TABLE_NAME.match(table_name):
+        raise ValueError(f"Invalid custom table name: {table_name!r}")
+
+
+def ensure_custom_table_indexes(cursor, table_name):
+    """Index custom_<table_name> on created_at for newest-first keyset paging.
+    
+    An index on created_at also carries the rowid (id), so it serves the
+    (created_at, id) ordering and cursor seeks.
+    """
+    _check_custom_table_name(table_name)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS "idx_custom_{table_name}_created"
+        ON "custom_{table_name}"(created_at)
+    """)
+
+
+def ensure_custom_table_triggers(cursor, table_name):
+    """Keep custom_tables_metadata in step with writes to custom_<table_name>.
+    
+    Inserts and deletes adjust row_count; every insert, update and delete
+    bumps data_version. Existing triggers are replaced.
+    """
+    _check_custom_table_name(table_name)
+    for event, delta in (('INSERT', ' + 1'), ('UPDATE', ''), ('DELETE', ' - 1')):
+        trigger = f"trg_custom_{table_name}_count_{event.lower()}"
+        count = f"row_count = row_count{delta}, " if delta else ""
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+        cursor.execute(f"""
+            CREATE TRIGGER "{trigger}"
+            AFTER {event} ON "custom_{table_name}"
+            BEGIN
+                UPDATE custom_tables_metadata SET {count}data_version = data_version + 1
+                WHERE table_name = '{table_name}';
+            END
+        """)
+
+
+def parse_custom_columns(columns_json):
+    """Parse stored columns_json: JSON, or the legacy str(list) form written before migration 5."""
+    try:
+        columns = json.loads(columns_json)
+    except (TypeError, ValueError):
+        try:
+            columns = ast.literal_eval(columns_json)
+        except (ValueError, SyntaxError):
+            columns = []
+    return freeze(columns if isinstance(columns, list) else [])
+
+
+def _custom_table_columns(table_name, columns_json):
+    # Parsing is cached per table; a changed columns_json replaces the entry
+    with _custom_schemas_lock:
+        cached = _custom_schemas.get(table_name)
+    if cached and cached[0] == columns_json:
+        return cached[1]
+    columns = parse_custom_columns(columns_json)
+    names = CUSTOM_LEADING_COLUMNS + tuple(col['name'] for col in columns) + CUSTOM_TRAILING_COLUMNS
+    with _custom_schemas_lock:
+        _custom_schemas[table_name] = (columns_json, columns, names)
+    return columns
+
+
+def invalidate_custom_schema(table_name=None):
+    """Drop cached schemas (all of them, or one table's)."""
+    with _custom_schemas_lock:
+        if table_name is None:
+            _custom_schemas.clear()
+        else:
+            _custom_schemas.pop(table_name, None)
+
+
+def get_custom_table_schema(table_name):
+    """Return the read-only column list of a custom table, or None if it does not exist.
+    
+    Served from the registry without touching the database once loaded.
+    """
+    with _custom_schemas_lock:
+        cached = _custom_schemas.get(table_name)
+    if cached:
+        return cached[1]
+    table = get_custom_table(table_name)
+    return table['columns'] if table else None
+
+
+def get_custom_table_columns(table_name):
+    """Return the column catalog (every column name, in table order) of a custom table, or None."""
+    if get_custom_table_schema(table_name) is None:
+        return None
+    with _custom_schemas_lock:
+        cached = _custom_schemas.get(table_name)
+    return cached[2] if cached else None
+
+
 def create_custom_table(table_name, columns, description=""):
     """Create a custom data table with specified columns."""
     try:
@@ -334,8 +475,7 @@ def create_custom_table(table_name, columns, description=""):
             cursor = conn.cursor()
             
             # Validate table name (alphanumeric and underscores only)
-            import re
-            if not re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', table_name):
+            if not CUSTOM_TABLE_NAME.match(table_name):
                 return False, "Table name must start with a letter and contain only letters, numbers, and underscores"
             
             # Check if table already exists
@@ -389,22 +529,26 @@ def create_custom_table(table_name, columns, description=""):
             """
             
             cursor.execute(create_sql)
+            ensure_custom_table_indexes(cursor, table_name)
+            ensure_custom_table_triggers(cursor, table_name)
             
             # Store table metadata
             cursor.execute("""
                 INSERT OR REPLACE INTO custom_tables_metadata 
-                (table_name, display_name, description, columns_json, created_at, created_by)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (table_name, display_name, description, columns_json, row_count, created_at, created_by)
+                VALUES (?, ?, ?, ?, 0, ?, ?)
             """, (
                 table_name,
                 table_name.replace('_', ' ').title(),
                 description,
-                str(columns),  # Store as string for now, could use JSON in future
+                json.dumps(columns),
                 datetime.now().isoformat(),
                 "admin"
             ))
             
             conn.commit()
+            invalidate_custom_schema(table_name)
+            RELATED_ROW_CACHE.invalidate(table_name)
             return True, f"Table '{table_name}' created successfully"
             
     except Exception as e:
@@ -412,89 +556,106 @@ def create_custom_table(table_name, columns, description=""):
         return False, f"Failed to create table: {str(e)}"
 
 
+def _custom_table_from_row(row):
+    return {
+        'table_name': row['table_name'],
+        'display_name': row['display_name'],
+        'description': row['description'],
+        'columns': _custom_table_columns(row['table_name'], row['columns_json']),
+        'row_count': row['row_count'],
+        'data_version': row['data_version'],
+        'created_at': row['created_at']
+    }
+
+
 def get_custom_tables():
-    """Get list of all custom tables."""
+    """Get list of all custom tables (one query; row counts are trigger-maintained)."""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            # Get tables from metadata
             cursor.execute("""
-                SELECT table_name, display_name, description, columns_json, created_at, 
-                       (SELECT COUNT(*) FROM custom_tables_metadata) as total_tables
+                SELECT table_name, display_name, description, columns_json, row_count, data_version, created_at
                 FROM custom_tables_metadata
                 ORDER BY created_at DESC
             """)
             
-            tables = []
-            for row in cursor.fetchall():
-                # Get row count for this table
-                try:
-                    cursor.execute(f"SELECT COUNT(*) as count FROM custom_{row['table_name']}")
-                    row_count = cursor.fetchone()['count']
-                except:
-                    row_count = 0
-                
-                # Parse columns (basic parsing since we stored as string)
-                columns_str = row['columns_json']
-                try:
-                    import ast
-                    columns = ast.literal_eval(columns_str)
-                except:
-                    columns = []
-                
-                tables.append({
-                    'table_name': row['table_name'],
-                    'display_name': row['display_name'],
-                    'description': row['description'],
-                    'columns': columns,
-                    'row_count': row_count,
-                    'created_at': row['created_at']
-                })
-            
-            return tables
+            return [_custom_table_from_row(row) for row in cursor.fetchall()]
             
     except Exception as e:
         print(f"Error getting custom tables: {e}")
         return []
 
 
-def get_custom_table_data(table_name, limit=100, offset=0):
-    """Get data from a custom table."""
+def get_custom_table(table_name):
+    """Get one custom table's metadata, or None if it does not exist."""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            # Validate table exists
             cursor.execute("""
-                SELECT table_name FROM custom_tables_metadata 
+                SELECT table_name, display_name, description, columns_json, row_count, data_version, created_at
+                FROM custom_tables_metadata
                 WHERE table_name = ?
             """, (table_name,))
             
-            if not cursor.fetchone():
+            row = cursor.fetchone()
+            return _custom_table_from_row(row) if row else None
+            
+    except Exception as e:
+        print(f"Error getting custom table {table_name}: {e}")
+        return None
+
+
+def get_custom_table_data(table_name, limit=100, offset=0, cursor=None, include_total=True):
+    """Get a newest-first page of data from a custom table.
+    
+    With a cursor token (from a previous page's next_cursor) the page is read
+    with a keyset seek on (created_at, id) and offset is ignored; otherwise
+    offset paging is used. The total is the trigger-maintained row_count.
+    """
+    try:
+        page_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return None, str(e)
+    
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            
+            # Validate table exists
+            db_cursor.execute("""
+                SELECT row_count FROM custom_tables_metadata 
+                WHERE table_name = ?
+            """, (table_name,))
+            
+            metadata = db_cursor.fetchone()
+            if not metadata:
                 return None, "Table not found"
             
             # Get table data
-            cursor.execute(f"""
-                SELECT * FROM custom_{table_name} 
-                ORDER BY created_at DESC 
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
-            
-            rows = []
-            for row in cursor.fetchall():
-                row_dict = dict(row)
-                rows.append(row_dict)
+            if cursor:
+                rows, next_cursor = fetch_keyset_page(
+                    db_cursor, f"SELECT * FROM custom_{table_name} WHERE 1=1", [], page_cursor, limit
+                )
+            else:
+                db_cursor.execute(f"""
+                    SELECT * FROM custom_{table_name} 
+                    ORDER BY created_at DESC, id DESC 
+                    LIMIT ? OFFSET ?
+                """, (limit + 1, offset))
+                rows = db_cursor.fetchall()
+                next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+                rows = rows[:limit]
             
-            # Get total count
-            cursor.execute(f"SELECT COUNT(*) as total FROM custom_{table_name}")
-            total = cursor.fetchone()['total']
+            total = metadata['row_count'] if include_total else None
             
             return {
-                'data': rows,
+                'data': [dict(row) for row in rows],
                 'total': total,
                 'limit': limit,
-                'offset': offset
+                'offset': offset,
+                'next_cursor': next_cursor
             }, None
             
     except Exception as e:
@@ -508,14 +669,8 @@ def insert_custom_table_row(table_name, data, created_by="admin"):
         with get_db_connection() as conn:
             cursor = conn.cursor()
             
-            # Get table metadata to validate columns
-            cursor.execute("""
-                SELECT columns_json FROM custom_tables_metadata 
-                WHERE table_name = ?
-            """, (table_name,))
-            
-            result = cursor.fetchone()
-            if not result:
+            # Validate the table against the schema registry
+            if get_custom_table_schema(table_name) is None:
                 return False, "Table not found"
             
             # Build INSERT statement
@@ -538,6 +693,7 @@ def insert_custom_table_row(table_name, data, created_by="admin"):
             """, values)
             
             conn.commit()
+            RELATED_ROW_CACHE.invalidate(table_name)
             return True, "Row inserted successfully"
             
     except Exception as e:
@@ -561,6 +717,8 @@ def delete_custom_table(table_name):
             """, (table_name,))
             
             conn.commit()
+            invalidate_custom_schema(table_name)
+            RELATED_ROW_CACHE.invalidate(table_name)
             return True, f"Table '{table_name}' deleted successfully"
             
     except Exception as e:
@@ -590,64 +748,138 @@ def get_custom_table_for_reference(table_name):
         return None, f"Error: {str(e)}"
 
 
+def _related_lookup_plan(table_name, search_column, return_columns):
+    """Validate a related-row lookup against the column catalog.
+    
+    Returns (name, return_columns) for a registered custom_<name> table, or
+    None if the table or search column is unknown or no return column is valid.
+    """
+    name = table_name[len('custom_'):] if table_name.startswith('custom_') else None
+    available_columns = get_custom_table_columns(name) if name else None
+    if available_columns is None:
+        return None
+    
+    if search_column not in available_columns:
+        print(f"Search column '{search_column}' not found in table '{table_name}'")
+        return None
+    
+    if return_columns:
+        # Validate return columns exist
+        valid_return_columns = tuple(col for col in return_columns if col in available_columns)
+        if not valid_return_columns:
+            print(f"No valid return columns found in table '{table_name}'")
+            return None
+        return name, valid_return_columns
+    
+    # Return all columns if none specified
+    return name, available_columns
+
+
 def get_custom_table_related_data(table_name, search_column, search_value, return_columns):
-    """Get related data from a custom table based on a specific field value."""
-    try:
+    """Get related data from a custom table based on a specific field value.
+    
+    table_name is the full custom_<name> table. Columns are checked against
+    the cached column catalog, and results (including "no match") are
+    memoized in RELATED_ROW_CACHE until the table is written to, so repeated
+    auto-fill lookups do not touch SQLite at all.
+    """
+    plan = _related_lookup_plan(table_name, search_column, return_columns)
+    if plan is None:
+        return None
+    name, valid_return_columns = plan
+    
+    def load():
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            # Validate table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            if not cursor.fetchone():
-                return None
-            
-            # Validate columns exist
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            available_columns = [row[1] for row in cursor.fetchall()]
-            
-            if search_column not in available_columns:
-                print(f"Search column '{search_column}' not found in table '{table_name}'")
-                return None
-            
-            # Build the query to get related data
-            if return_columns:
-                # Validate return columns exist
-                valid_return_columns = [col for col in return_columns if col in available_columns]
-                if not valid_return_columns:
-                    print(f"No valid return columns found in table '{table_name}'")
-                    return None
-                
-                columns_str = ', '.join(valid_return_columns)
-            else:
-                # Return all columns if none specified
-                columns_str = '*'
-            
-            # Execute query to find matching row
-            query = f"SELECT {columns_str} FROM {table_name} WHERE {search_column} = ? LIMIT 1"
-            cursor.execute(query, (search_value,))
-            
+            cursor.execute(
+                f"SELECT {', '.join(valid_return_columns)} FROM {table_name} WHERE {search_column} = ? LIMIT 1",
+                (search_value,)
+            )
             row = cursor.fetchone()
-            if not row:
-                return None
-            
-            # Convert row to dictionary
-            if return_columns:
-                column_names = valid_return_columns
-            else:
-                column_names = available_columns
-            
-            result = {}
-            for i, value in enumerate(row):
-                if i < len(column_names):
-                    result[column_names[i]] = value
-            
-            return result
-            
+            return freeze(dict(zip(valid_return_columns, row))) if row else None
+    
+    try:
+        return RELATED_ROW_CACHE.get_or_load((name, search_column, search_value, valid_return_columns), load)
     except Exception as e:
         print(f"Error getting related data from {table_name}: {e}")
         return None
 
 
+def get_custom_table_related_batch(lookups):
+    """Resolve many related-row lookups in one go.
+    
+    lookups is a list of dicts with 'table' (custom table name without the
+    custom_ prefix), 'column', a scalar 'value' and optional 'return' columns.
+    Cached results come from RELATED_ROW_CACHE; the rest are grouped per
+    (table, column) into WHERE column IN (...) queries on one connection.
+    Returns the rows (dict or None) in the same order as lookups; malformed
+    lookups (e.g. a list or object as the value) get None.
+    """
+    results = [None] * len(lookups)
+    # (name, column) -> {value: [(index, cache_key, return_columns)]}
+    pending = {}
+    for index, lookup in enumerate(lookups):
+        table, column = lookup.get('table'), lookup.get('column')
+        return_columns = lookup.get('return') or []
+        if (not isinstance(table, str) or not isinstance(column, str)
+                or not isinstance(lookup.get('value'), (str, int, float, type(None)))
+                or not isinstance(return_columns, list)
+                or not all(isinstance(col, str) for col in return_columns)):
+            continue
+        plan = _related_lookup_plan(f"custom_{table}", column, return_columns)
+        if plan is None:
+            continue
+        name, return_columns = plan
+        value = lookup.get('value')
+        key = (name, column, value, return_columns)
+        cached = RELATED_ROW_CACHE.get(key)
+        if cached is not MISSING:
+            results[index] = cached
+        else:
+            pending.setdefault((name, column), {}).setdefault(value, []).append((index, key, return_columns))
+    
+    if not pending:
+        return results
+    
+    generation = RELATED_ROW_CACHE.generation()
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for (name, column), by_value in pending.items():
+                wanted = {column}
+                for entries in by_value.values():
+                    for _, _, return_columns in entries:
+                        wanted.update(return_columns)
+                select_columns = [col for col in get_custom_table_columns(name) if col in wanted]
+                
+                # First (lowest id) row per value, like the single lookup's LIMIT 1
+                found = {}
+                values = list(by_value)
+                for start in range(0, len(values), RELATED_BATCH_CHUNK):
+                    chunk = values[start:start + RELATED_BATCH_CHUNK]
+                    cursor.execute(f"""
+                        SELECT {', '.join(select_columns)} FROM custom_{name}
+                        WHERE {column} IN ({', '.join('?' for _ in chunk)})
+                        ORDER BY id
+                    """, chunk)
+                    for row in cursor.fetchall():
+                        record = dict(zip(select_columns, row))
+                        found.setdefault(record[column], record)
+                # Form values arrive as text; match numeric columns by their text too
+                found_text = {str(key): record for key, record in found.items()}
+                
+                for value, entries in by_value.items():
+                    record = found.get(value) or found_text.get(str(value))
+                    for index, key, return_columns in entries:
+                        row = freeze({col: record[col] for col in return_columns}) if record else None
+                        RELATED_ROW_CACHE.put(key, row, generation)
+                        results[index] = row
+    except Exception as e:
+        print(f"Error getting related data batch: {e}")
+    
+    return results
+
+
 # User External Tools Management Functions
 
 def create_user_external_tool(username, tool_data):
@@ -677,8 +909,10 @@ def create_user_external_tool(username, tool_data):
                 current_time,
                 current_time
             ))
+            _bump_user_tools_version(cursor, username)
             
             conn.commit()
+            invalidate_tool_catalog(username)
             return True, "External tool created successfully"
             
     except Exception as e:
@@ -688,25 +922,46 @@ def create_user_external_tool(username, tool_data):
 
 def get_user_external_tools(username):
     """Get all external tools for a specific user."""
+    tools, _ = load_user_external_tools(username)
+    return tools if tools is not None else []
+
+
+def _bump_user_tools_version(cursor, username):
+    # Part of every tool write's transaction, so other processes see the change too
+    cursor.execute("UPDATE users SET tools_version = tools_version + 1 WHERE username = ?", (username,))
+
+
+def _user_external_tools_version(cursor, username):
+    cursor.execute("SELECT tools_version FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_user_external_tools_version(username):
+    """Cheap change marker for a user's external tools, or None if it could not be read."""
+    try:
+        with get_db_connection() as conn:
+            return _user_external_tools_version(conn.cursor(), username)
+    except Exception as e:
+        print(f"Error getting user external tools version: {e}")
+        return None
+
+
+def load_user_external_tools(username):
+    """Return (tools, version) read together for the tool catalog, or (None, None) on error."""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
+            version = _user_external_tools_version(cursor, username)
             cursor.execute("""
                 SELECT * FROM user_external_tools 
                 WHERE username = ? 
                 ORDER BY name
             """, (username,))
-            
-            tools = []
-            for row in cursor.fetchall():
-                tools.append(dict(row))
-            
-            return tools
-            
+            return [dict(row) for row in cursor.fetchall()], version
     except Exception as e:
-        print(f"Error getting user external tools: {e}")
-        return []
+        print(f"Error loading user external tools: {e}")
+        return None, None
 
 
 def update_user_external_tool(username, tool_id, tool_data):
@@ -736,7 +991,10 @@ def update_user_external_tool(username, tool_id, tool_data):
             ))
             
             rows_affected = cursor.rowcount
+            if rows_affected > 0:
+                _bump_user_tools_version(cursor, username)
             conn.commit()
+            invalidate_tool_catalog(username)
             
             if rows_affected > 0:
                 return True, "Tool updated successfully"
@@ -760,7 +1018,10 @@ def delete_user_external_tool(username, tool_id):
             """, (username, tool_id))
             
             rows_affected = cursor.rowcount
+            if rows_affected > 0:
+                _bump_user_tools_version(cursor, username)
             conn.commit()
+            invalidate_tool_catalog(username)
             
             if rows_affected > 0:
                 return True, "Tool deleted successfully"
@@ -796,8 +1057,10 @@ def toggle_user_external_tool(username, tool_id):
                 SET is_enabled = ?, updated_at = ?
                 WHERE username = ? AND tool_id = ?
             """, (new_state, datetime.now().isoformat(), username, tool_id))
+            _bump_user_tools_version(cursor, username)
             
             conn.commit()
+            invalidate_tool_catalog(username)
             
             state_text = "enabled" if new_state == 1 else "disabled"
             return True, f"Tool {state_text} successfully"
@@ -947,6 +1210,43 @@ def delete_case_template(template_id):
         return False
 
 
+def case_search_text(case_data):
+    """Flatten a case's field values (not its keys) into one string for the search index."""
+    if isinstance(case_data, dict):
+        return ' '.join(case_search_text(value) for value in case_data.values())
+    if isinstance(case_data, (list, tuple)):
+        return ' '.join(case_search_text(value) for value in case_data)
+    return '' if case_data is None else str(case_data)
+
+
+def fts_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def replace_fts_row(cursor, fts_table, rowid, values):
+    """Replace the row for rowid in an FTS5 table with values ({column: text}; None just removes it).
+
+    Without FTS5 this does nothing, and searches fall back to a table scan.
+    """
+    try:
+        cursor.execute(f"DELETE FROM {fts_table} WHERE rowid = ?", (rowid,))
+        if values is not None:
+            cursor.execute(
+                f"INSERT INTO {fts_table} (rowid, {', '.join(values)}) VALUES (?{', ?' * len(values)})",
+                (rowid, *values.values())
+            )
+    except sqlite3.OperationalError:
+        pass
+
+
+def _index_case(cursor, case_id, case_data):
+    """Refresh the full-text search row for a single case (None removes it)."""
+    replace_fts_row(cursor, 'cases_fts', case_id,
+                    None if case_data is None else {'field_values': case_search_text(case_data)})
+
+
 def create_case(template_id, case_data, created_by="admin", status="open"):
     """Create a new case."""
     try:
@@ -968,9 +1268,11 @@ def create_case(template_id, case_data, created_by="admin", status="open"):
                     created_by,
                 ),
             )
+            case_id = cursor.lastrowid
+            _index_case(cursor, case_id, case_data)
 
             conn.commit()
-            return cursor.lastrowid, "Case created"
+            return case_id, "Case created"
 
     except Exception as e:
         print(f"Error creating case: {e}")
@@ -991,27 +1293,105 @@ def get_all_cases():
                 ORDER BY c.created_at DESC
                 """
             )
-            cases = []
-            for row in cursor.fetchall():
-                cases.append(
-                    {
-                        "id": row["id"],
-                        "template_id": row["template_id"],
-                        "template_name": row["template_name"],
-                        "case_data": json.loads(row["case_data"]),
-                        "status": row["status"],
-                        "created_at": row["created_at"],
-                        "updated_at": row["updated_at"],
-                        "created_by": row["created_by"],
-                    }
-                )
-            return cases
+            return [_case_from_row(row) for row in cursor.fetchall()]
 
     except Exception as e:
         print(f"Error getting cases: {e}")
         return []
 
 
+def _case_from_row(row):
+    return {
+        "id": row["id"],
+        "template_id": row["template_id"],
+        "template_name": row["template_name"],
+        "case_data": json.loads(row["case_data"]),
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "created_by": row["created_by"],
+    }
+
+
+def get_case_statuses():
+    """Return the distinct case statuses in use (read from the status index)."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT status FROM cases WHERE status IS NOT NULL ORDER BY status")
+            return [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting case statuses: {e}")
+        return []
+
+
+def search_cases(search='', template_id=None, status=None, limit=50, cursor=None):
+    """Return one newest-first page of cases as (cases, next_cursor).
+
+    Template and status filters run in SQL on the (template_id, created_at)
+    and (status, created_at) indexes; search matches words in the case's
+    field values through the cases_fts index. Pages are keyset-paged: pass
+    the previous page's next_cursor to continue. An invalid cursor returns
+    the first page.
+    """
+    try:
+        page_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        page_cursor = None
+
+    query = """
+        SELECT c.id, c.template_id, c.case_data, c.status, c.created_at, c.updated_at, c.created_by,
+               t.name as template_name
+        FROM cases c
+        JOIN case_templates t ON c.template_id = t.id
+        WHERE 1 = 1
+    """
+    params = []
+    if template_id:
+        query += " AND c.template_id = ?"
+        params.append(template_id)
+    if status:
+        query += " AND c.status = ?"
+        params.append(status)
+
+    match = fts_match_query(search or '')
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            if match:
+                try:
+                    db_cursor.execute("SELECT 1 FROM cases_fts LIMIT 0")
+                    query += " AND c.id IN (SELECT rowid FROM cases_fts WHERE cases_fts MATCH ?)"
+                    params.append(match)
+                except sqlite3.OperationalError:
+                    # No FTS5: substring match on the stored JSON
+                    query += " AND c.case_data LIKE ?"
+                    params.append(f"%{search.strip()}%")
+            elif search and search.strip():
+                # Punctuation only; nothing can match
+                return [], None
+
+            rows, next_cursor = fetch_keyset_page(db_cursor, query, params, page_cursor, limit, alias='c.')
+            return [_case_from_row(row) for row in rows], next_cursor
+
+    except Exception as e:
+        print(f"Error searching cases: {e}")
+        return [], None
+
+
+def rebuild_case_search_index(cursor):
+    """Re-index every case into cases_fts (used by the migration that adds it)."""
+    cursor.execute("DELETE FROM cases_fts")
+    cursor.execute("SELECT id, case_data FROM cases")
+    for case_id, case_data in cursor.fetchall():
+        try:
+            data = json.loads(case_data)
+        except (TypeError, ValueError):
+            data = case_data
+        cursor.execute("INSERT INTO cases_fts (rowid, field_values) VALUES (?, ?)",
+                       (case_id, case_search_text(data)))
+
+
 def get_case(case_id):
     """Retrieve a single case by ID."""
     try:
@@ -1031,16 +1411,7 @@ def get_case(case_id):
             if not row:
                 return None
 
-            return {
-                "id": row["id"],
-                "template_id": row["template_id"],
-                "template_name": row["template_name"],
-                "case_data": json.loads(row["case_data"]),
-                "status": row["status"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"],
-                "created_by": row["created_by"],
-            }
+            return _case_from_row(row)
 
     except Exception as e:
         print(f"Error getting case {case_id}: {e}")
@@ -1064,9 +1435,12 @@ def update_case(case_id, case_data, status=None):
                 f"UPDATE cases SET {', '.join(fields)} WHERE id = ?",
                 values,
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                _index_case(cursor, case_id, case_data)
 
             conn.commit()
-            return cursor.rowcount > 0
+            return updated
 
     except Exception as e:
         print(f"Error updating case {case_id}: {e}")
@@ -1079,8 +1453,10 @@ def delete_case(case_id):
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM cases WHERE id = ?", (case_id,))
+            deleted = cursor.rowcount > 0
+            _index_case(cursor, case_id, None)
             conn.commit()
-            return cursor.rowcount > 0
+            return deleted
 
     except Exception as e:
         print(f"Error deleting case {case_id}: {e}")
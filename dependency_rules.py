@@ -0,0 +1,152 @@
+"""
+Compiled dependency rules for enhanced case templates.
+A template's field_dependencies are turned once into an evaluation plan: rules
+are ordered so that a field is evaluated only after every field it depends on,
+conditions are pre-bound to their parsed values and action configs are parsed
+up front, so validating a case is a plain walk over the plan.
+"""
+
+import heapq
+import json
+
+# Actions the server enforces; the rest (show/hide/enable/...) are client-side only
+SERVER_ACTIONS = ('require', 'set_value')
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_empty(value):
+    return not value or str(value).strip() == ''
+
+
+def compile_condition(condition_type, condition_value):
+    """Return a predicate(value) for a dependency condition."""
+    if condition_type == 'equals':
+        expected = str(condition_value)
+        return lambda value: str(value) == expected
+    if condition_type == 'not_equals':
+        expected = str(condition_value)
+        return lambda value: str(value) != expected
+    if condition_type == 'contains':
+        needle = str(condition_value or '')
+        return lambda value: needle in str(value)
+    if condition_type == 'not_contains':
+        needle = str(condition_value or '')
+        return lambda value: needle not in str(value)
+    if condition_type == 'is_empty':
+        return _is_empty
+    if condition_type == 'is_not_empty':
+        return lambda value: not _is_empty(value)
+    if condition_type in ('in_list', 'not_in_list'):
+        options = frozenset(str(condition_value or '').split(','))
+        if condition_type == 'in_list':
+            return lambda value: str(value) in options
+        return lambda value: str(value) not in options
+    if condition_type in ('greater_than', 'less_than'):
+        threshold = _to_number(condition_value)
+        if threshold is None:
+            return lambda value: False
+
+        def compare(value):
+            number = _to_number(value)
+            if number is None:
+                return False
+            return number > threshold if condition_type == 'greater_than' else number < threshold
+        return compare
+
+    return lambda value: False
+
+
+def _parse_action_config(raw):
+    if isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw or '{}')
+    except (TypeError, ValueError):
+        return {}
+
+
+class DependencyPlan:
+    """An ordered list of (field_id, field_name, rules) steps for one template.
+
+    Each rule is (parent_field_id, predicate, action_type, action_config).
+    """
+
+    def __init__(self, steps, has_cycle=False):
+        self.steps = steps
+        self.has_cycle = has_cycle
+
+    def apply(self, case_data):
+        """Apply set_value rules to case_data in place and return require errors."""
+        errors = []
+        for field_id, field_name, rules in self.steps:
+            for parent_field_id, predicate, action_type, action_config in rules:
+                if not predicate(case_data.get(parent_field_id)):
+                    continue
+                if action_type == 'require':
+                    if not case_data.get(field_id):
+                        errors.append(f"Field '{field_name}' is required")
+                elif action_type == 'set_value':
+                    case_data[field_id] = action_config.get('value')
+        return errors
+
+
+def compile_dependency_rules(fields, dependencies):
+    """Build a DependencyPlan from get_template_with_fields() output.
+
+    fields are in display order; dependencies maps a field's row id to its
+    dependency rows. Fields are topologically sorted on parent -> dependent
+    edges (display order breaks ties); fields caught in a cycle keep their
+    display order after everything else.
+    """
+    order = {field['field_id']: index for index, field in enumerate(fields)}
+    rules_by_field = {}
+    children = {field_id: set() for field_id in order}
+    pending_parents = {field_id: 0 for field_id in order}
+
+    for field in fields:
+        field_id = field['field_id']
+        rules = []
+        for dep in dependencies.get(field['id'], ()):
+            if dep['action_type'] not in SERVER_ACTIONS:
+                continue
+            parent = dep['parent_field_name']
+            rules.append((
+                parent,
+                compile_condition(dep['condition_type'], dep.get('condition_value')),
+                dep['action_type'],
+                _parse_action_config(dep.get('action_config'))
+            ))
+            if parent in order and parent != field_id and field_id not in children[parent]:
+                children[parent].add(field_id)
+                pending_parents[field_id] += 1
+        if rules:
+            rules_by_field[field_id] = tuple(rules)
+
+    ready = [(order[field_id], field_id) for field_id, count in pending_parents.items() if count == 0]
+    heapq.heapify(ready)
+    sorted_ids = []
+    while ready:
+        _, field_id = heapq.heappop(ready)
+        sorted_ids.append(field_id)
+        for child in children[field_id]:
+            pending_parents[child] -= 1
+            if pending_parents[child] == 0:
+                heapq.heappush(ready, (order[child], child))
+
+    has_cycle = len(sorted_ids) < len(order)
+    if has_cycle:
+        placed = set(sorted_ids)
+        sorted_ids.extend(field['field_id'] for field in fields if field['field_id'] not in placed)
+
+    names = {field['field_id']: field['field_name'] for field in fields}
+    steps = tuple(
+        (field_id, names[field_id], rules_by_field[field_id])
+        for field_id in sorted_ids if field_id in rules_by_field
+    )
+    return DependencyPlan(steps, has_cycle)
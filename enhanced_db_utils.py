@@ -5,24 +5,57 @@ Provides functions for managing interactive fields, data tables, and dependencie
 
 import sqlite3
 import json
+import hashlib
+import re
+import threading
+import time
 from datetime import datetime
 from contextlib import contextmanager
+from db_pool import ConnectionPool
+from json_store import freeze
+from dependency_rules import compile_condition, compile_dependency_rules
+from pagination import COUNT_CACHE_SIZE, COUNT_CACHE_TTL, decode_cursor, fetch_keyset_page
+from result_cache import LRUTTLCache
+
+# Shared pool of tuned connections (WAL, page cache, mmap, foreign keys)
+ENHANCED_DB_POOL = ConnectionPool('enhanced_database.db')
 
 @contextmanager
 def get_enhanced_db_connection():
-    """Context manager for enhanced database connections."""
-    conn = None
-    try:
-        conn = sqlite3.connect('enhanced_database.db')
-        conn.row_factory = sqlite3.Row
+    """Context manager for pooled enhanced database connections.
+
+    Uncommitted changes are rolled back when the block exits and the
+    connection goes back to ENHANCED_DB_POOL.
+    """
+    with ENHANCED_DB_POOL.connection() as conn:
         yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+
+# Cached enhanced case counts, keyed by ('enhanced_cases', filters...)
+CASE_COUNTS = LRUTTLCache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+
+# Data table search modes; prefix/exact use per-column JSON1 expression indexes,
+# which are only created for plain identifier column names
+SEARCH_MODES = ('contains', 'prefix', 'exact')
+SEARCH_INDEXABLE_COLUMN = re.compile(r'^[A-Za-z0-9_]+$')
+
+# Compiled (read-only) templates by template id: (template version, compiled
+# template, time of the last version check). Hits within TEMPLATE_CACHE_TTL
+# seconds of that check skip the database, so edits made by other processes
+# show up at most that late; edits made here invalidate the entry at once.
+TEMPLATE_CACHE_TTL = 5
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+_template_cache_stats = {'hits': 0, 'misses': 0}
+# Compiled dependency rule plans: (compiled template, plan) by template id
+_dependency_plans = {}
+# Serialized form bundles by template id: (etag, body, data table ids, compiled
+# template, data_version per table). A bundle is dropped with its template and
+# when one of its data tables is written to in this process; writes from other
+# processes are caught by comparing the template and data table versions.
+_form_bundles = {}
+_form_bundle_generation = 0
+# Option records preloaded per data table in a form bundle
+FORM_BUNDLE_OPTION_LIMIT = 100
 
 # Data Table Management Functions
 
@@ -59,6 +92,8 @@ def create_data_table(table_name, display_name, description, columns, created_by
                     current_time
                 ))
             
+            ensure_data_table_search_indexes(cursor, table_id)
+            
             conn.commit()
             return table_id, "Data table created successfully"
             
@@ -78,43 +113,159 @@ def add_data_table_record(table_id, record_data, created_by="admin"):
             ''', (table_id, json.dumps(record_data), current_time, created_by))
             
             conn.commit()
+            invalidate_form_bundles(table_id)
             return cursor.lastrowid, "Record added successfully"
             
     except Exception as e:
         return None, f"Error adding record: {str(e)}"
 
-def search_data_table(table_id, search_term="", limit=10):
-    """Search records in a data table."""
+def _record_value_sql(column_name):
+    """SQL expression for one column of record_data; must match the search indexes exactly."""
+    return f"json_extract(record_data, '$.{column_name}')"
+
+def _ascii_lower(text):
+    # NOCASE only folds ASCII letters, so only those may be folded here
+    return ''.join(ch.lower() if ch.isascii() else ch for ch in text)
+
+def _prefix_upper_bound(prefix):
+    """Exclusive NOCASE upper bound for values starting with prefix, or None if unbounded.
+    
+    prefix must already be folded with _ascii_lower(). The last character is
+    bumped by one, except that an upper-case ASCII letter would be folded
+    back down by NOCASE ('@' + 1 is 'A', which sorts as 'a'), so the next
+    character in NOCASE order after '@' is '['.
+    """
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if 0xD800 <= code <= 0xDFFF:
+            code = 0xE000
+        if code <= 0x10FFFF:
+            bumped = '[' if 'A' <= chr(code) <= 'Z' else chr(code)
+            return prefix[:-1] + bumped
+        prefix = prefix[:-1]
+    return None
+
+def _typed_search_value(search_term, data_type):
+    if data_type == 'number':
+        for convert in (int, float):
+            try:
+                return convert(search_term)
+            except ValueError:
+                pass
+    return search_term
+
+def ensure_data_table_search_indexes(cursor, table_id):
+    """Create a partial JSON1 expression index for each searchable column of a data table.
+    
+    The indexes cover only the table's active records and let the exact and
+    prefix search modes seek instead of scanning every record's JSON text.
+    """
+    table_id = int(table_id)
+    cursor.execute('''
+        SELECT id, column_name FROM data_table_columns
+        WHERE table_id = ? AND is_searchable = 1
+    ''', (table_id,))
+    
+    created = 0
+    for column_id, column_name in [tuple(row) for row in cursor.fetchall()]:
+        if not SEARCH_INDEXABLE_COLUMN.match(column_name):
+            continue
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_data_table_search_{table_id}_{int(column_id)}
+            ON data_table_records({_record_value_sql(column_name)} COLLATE NOCASE)
+            WHERE table_id = {table_id} AND is_active = 1
+        ''')
+        created += 1
+    return created
+
+def search_data_table(table_id, search_term="", limit=10, mode="contains", column=None):
+    """Search records in a data table.
+    
+    Only the values of searchable columns are matched (never the JSON keys).
+    mode is 'contains' (substring, scans the table's records), 'prefix' or
+    'exact' (both case-insensitive and served by the per-column indexes;
+    prefix matches on non-text columns compare the value as text and scan).
+    column restricts the search to a single column.
+    """
     try:
+        table_id = int(table_id)
+        if mode not in SEARCH_MODES:
+            return [], f"Unknown search mode: {mode}"
+        
         with get_enhanced_db_connection() as conn:
             cursor = conn.cursor()
             
             # Get table columns
             cursor.execute('''
-                SELECT column_name, display_name, is_display_field, is_searchable
+                SELECT column_name, display_name, data_type, is_display_field, is_searchable
                 FROM data_table_columns 
                 WHERE table_id = ? 
                 ORDER BY is_key_field DESC, is_display_field DESC
             ''', (table_id,))
             columns = cursor.fetchall()
             
-            # Get records
-            query = '''
+            # Get records; table_id is inlined so the partial indexes apply
+            base_query = f'''
                 SELECT id, record_data 
                 FROM data_table_records 
-                WHERE table_id = ? AND is_active = 1
+                WHERE table_id = {table_id} AND is_active = 1
             '''
-            params = [table_id]
+            query = base_query
+            params = []
+            branches = 1
             
             if search_term:
-                query += ' AND record_data LIKE ?'
-                params.append(f'%{search_term}%')
+                searchable = [col for col in columns
+                              if col['is_searchable'] and (not column or col['column_name'] == column)]
+                clauses = []
+                for col in searchable:
+                    escaped = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    if mode == 'contains':
+                        clauses.append("json_extract(record_data, ?) LIKE ? ESCAPE '\\'")
+                        params.extend([f'$."{col["column_name"]}"', f'%{escaped}%'])
+                        continue
+                    
+                    if not SEARCH_INDEXABLE_COLUMN.match(col['column_name']):
+                        continue
+                    expr = _record_value_sql(col['column_name'])
+                    if mode == 'exact':
+                        clauses.append(f'{expr} COLLATE NOCASE = ?')
+                        params.append(_typed_search_value(search_term, col['data_type']))
+                    elif col['data_type'] == 'text':
+                        # Prefix as a range so the NOCASE index can be seeked
+                        lower = _ascii_lower(search_term)
+                        upper = _prefix_upper_bound(lower)
+                        clauses.append(f'{expr} COLLATE NOCASE >= ?')
+                        params.append(lower)
+                        if upper is not None:
+                            clauses[-1] += f' AND {expr} COLLATE NOCASE < ?'
+                            params.append(upper)
+                    else:
+                        # Numbers, dates and booleans: match their text form
+                        clauses.append(f"CAST({expr} AS TEXT) LIKE ? ESCAPE '\\'")
+                        params.append(f'{escaped}%')
+                
+                if not clauses:
+                    return [], "No searchable columns"
+                if mode == 'contains':
+                    query += ' AND (' + ' OR '.join(clauses) + ')'
+                else:
+                    # One index seek per column; SQLite would scan for an OR of
+                    # expression indexes. A record can match several columns, so
+                    # over-fetch and drop duplicates below.
+                    query = ' UNION ALL '.join(f'{base_query} AND {clause}' for clause in clauses)
+                    branches = len(clauses)
             
             query += ' LIMIT ?'
-            params.append(limit)
+            params.append(limit * branches)
             
             cursor.execute(query, params)
-            records = cursor.fetchall()
+            seen = set()
+            records = []
+            for record in cursor.fetchall():
+                if record['id'] not in seen and len(records) < limit:
+                    seen.add(record['id'])
+                    records.append(record)
             
             # Format results
             results = []
@@ -160,6 +311,7 @@ def create_enhanced_template(name, description, category, fields, created_by="ad
             template_id = cursor.lastrowid
             
             # Create fields
+            field_row_ids = {}
             for order, field in enumerate(fields):
                 cursor.execute('''
                     INSERT INTO template_fields 
@@ -177,11 +329,24 @@ def create_enhanced_template(name, description, category, fields, created_by="ad
                     json.dumps(field.get('validation_rules', {})),
                     json.dumps(field.get('conditional_logic', {})),
                     field.get('data_table_id'),
-                    field.get('parent_field_id'),
+                    None,
                     current_time
                 ))
+                field_row_ids[field['field_id']] = cursor.lastrowid
+            
+            # Parent fields may be given by their field_id (as the builders do);
+            # the columns reference template_fields rows, so map them to row ids
+            def resolve_parent(parent):
+                return field_row_ids.get(parent, parent)
+            
+            for field in fields:
+                field_record_id = field_row_ids[field['field_id']]
                 
-                field_record_id = cursor.lastrowid
+                if field.get('parent_field_id') is not None:
+                    cursor.execute(
+                        'UPDATE template_fields SET parent_field_id = ? WHERE id = ?',
+                        (resolve_parent(field['parent_field_id']), field_record_id)
+                    )
                 
                 # Create field dependencies if specified
                 if 'dependencies' in field:
@@ -193,7 +358,7 @@ def create_enhanced_template(name, description, category, fields, created_by="ad
                             VALUES (?, ?, ?, ?, ?, ?, ?)
                         ''', (
                             field_record_id,
-                            dep['parent_field_id'],
+                            resolve_parent(dep['parent_field_id']),
                             dep['condition_type'],
                             dep.get('condition_value'),
                             dep['action_type'],
@@ -202,59 +367,199 @@ def create_enhanced_template(name, description, category, fields, created_by="ad
                         ))
             
             conn.commit()
+            invalidate_template_cache(template_id)
             return template_id, "Enhanced template created successfully"
             
     except Exception as e:
         return None, f"Error creating enhanced template: {str(e)}"
 
+def _load_template_with_fields(cursor, template_id):
+    """Read a template, its fields and their dependencies (two queries in total)."""
+    cursor.execute('''
+        SELECT * FROM enhanced_case_templates WHERE id = ?
+    ''', (template_id,))
+    template = cursor.fetchone()
+    
+    if not template:
+        return None
+    
+    # Fields and their dependencies in one pass; a field with no
+    # dependencies comes back once with NULL dependency columns
+    cursor.execute('''
+        SELECT tf.*, dt.table_name as data_table_name,
+               fd.id as dep_id, fd.parent_field_id as dep_parent_field_id,
+               fd.condition_type as dep_condition_type, fd.condition_value as dep_condition_value,
+               fd.action_type as dep_action_type, fd.action_config as dep_action_config,
+               fd.created_at as dep_created_at, pf.field_id as dep_parent_field_name
+        FROM template_fields tf
+        LEFT JOIN data_tables dt ON tf.data_table_id = dt.id
+        LEFT JOIN field_dependencies fd ON fd.dependent_field_id = tf.id
+        LEFT JOIN template_fields pf ON fd.parent_field_id = pf.id
+        WHERE tf.template_id = ?
+        ORDER BY tf.display_order, tf.id, fd.id
+    ''', (template_id,))
+    
+    fields = []
+    field_dependencies = {}
+    for row in cursor.fetchall():
+        row = dict(row)
+        dep = {key[4:]: row.pop(key) for key in list(row) if key.startswith('dep_')}
+        if row['id'] not in field_dependencies:
+            field_dependencies[row['id']] = []
+            fields.append(row)
+        # Inner-join semantics for the parent field, as before
+        if dep['id'] is not None and dep['parent_field_name'] is not None:
+            field_dependencies[row['id']].append({
+                'id': dep['id'],
+                'dependent_field_id': row['id'],
+                'parent_field_id': dep['parent_field_id'],
+                'condition_type': dep['condition_type'],
+                'condition_value': dep['condition_value'],
+                'action_type': dep['action_type'],
+                'action_config': dep['action_config'],
+                'created_at': dep['created_at'],
+                'parent_field_name': dep['parent_field_name']
+            })
+    
+    return {
+        'template': dict(template),
+        'fields': fields,
+        'dependencies': field_dependencies
+    }
+
 def get_template_with_fields(template_id):
-    """Get complete template with all fields and dependencies."""
+    """Get complete template with all fields and dependencies.
+    
+    The result is compiled once per template version and shared read-only
+    between requests. A cache hit makes no database round trip unless the
+    entry's last version check is older than TEMPLATE_CACHE_TTL; call
+    invalidate_template_cache() to drop an entry outright.
+    """
+    try:
+        template_id = int(template_id)
+    except (TypeError, ValueError):
+        return None, "Template not found"
+    
+    with _template_cache_lock:
+        entry = _template_cache.get(template_id)
+        if entry and time.monotonic() - entry[2] < TEMPLATE_CACHE_TTL:
+            _template_cache_stats['hits'] += 1
+            return entry[1], "Template retrieved successfully"
+    
     try:
         with get_enhanced_db_connection() as conn:
             cursor = conn.cursor()
-            
-            # Get template
-            cursor.execute('''
-                SELECT * FROM enhanced_case_templates WHERE id = ?
-            ''', (template_id,))
-            template = cursor.fetchone()
-            
-            if not template:
-                return None, "Template not found"
-            
-            # Get fields
-            cursor.execute('''
-                SELECT tf.*, dt.table_name as data_table_name
-                FROM template_fields tf
-                LEFT JOIN data_tables dt ON tf.data_table_id = dt.id
-                WHERE tf.template_id = ?
-                ORDER BY tf.display_order
-            ''', (template_id,))
-            fields = cursor.fetchall()
-            
-            # Get dependencies for each field
-            field_dependencies = {}
-            for field in fields:
-                cursor.execute('''
-                    SELECT fd.*, pf.field_id as parent_field_name
-                    FROM field_dependencies fd
-                    JOIN template_fields pf ON fd.parent_field_id = pf.id
-                    WHERE fd.dependent_field_id = ?
-                ''', (field['id'],))
-                dependencies = cursor.fetchall()
-                field_dependencies[field['id']] = [dict(dep) for dep in dependencies]
-            
-            # Format result
-            result = {
-                'template': dict(template),
-                'fields': [dict(field) for field in fields],
-                'dependencies': field_dependencies
-            }
-            
-            return result, "Template retrieved successfully"
+            if entry:
+                # Triggers bump the version on every template, field or dependency
+                # change, so edits made by other processes are seen here too
+                cursor.execute('SELECT version FROM enhanced_case_templates WHERE id = ?', (template_id,))
+                row = cursor.fetchone()
+                if row and row[0] == entry[0]:
+                    with _template_cache_lock:
+                        _template_cache_stats['hits'] += 1
+                        if _template_cache.get(template_id) is entry:
+                            _template_cache[template_id] = (entry[0], entry[1], time.monotonic())
+                    return entry[1], "Template retrieved successfully"
+            with _template_cache_lock:
+                _template_cache_stats['misses'] += 1
+            result = _load_template_with_fields(cursor, template_id)
             
     except Exception as e:
         return None, f"Error retrieving template: {str(e)}"
+    
+    if not result:
+        return None, "Template not found"
+    
+    compiled = freeze(result)
+    with _template_cache_lock:
+        _template_cache[template_id] = (result['template'].get('version'), compiled, time.monotonic())
+    return compiled, "Template retrieved successfully"
+
+def invalidate_template_cache(template_id=None):
+    """Drop one compiled template (or all of them) so the next read reloads it."""
+    global _form_bundle_generation
+    with _template_cache_lock:
+        _form_bundle_generation += 1
+        if template_id is None:
+            _template_cache.clear()
+            _dependency_plans.clear()
+            _form_bundles.clear()
+        else:
+            _template_cache.pop(template_id, None)
+            _dependency_plans.pop(template_id, None)
+            _form_bundles.pop(template_id, None)
+
+def template_cache_stats():
+    """Return hit/miss counters and (template id, version) keys of the compiled-template cache."""
+    with _template_cache_lock:
+        return dict(_template_cache_stats,
+                    cached=[[template_id, entry[0]] for template_id, entry in _template_cache.items()],
+                    form_bundles=sorted(_form_bundles))
+
+def get_form_bundle(template_id):
+    """Return ((etag, body), message) for a template's case-form bundle.
+    
+    The body is the JSON for the compiled template plus the option records of
+    every data table its fields look up, keyed by table id, so the form loads
+    with one request. The serialized bundle and its content hash (the ETag)
+    are cached until the template or one of its data tables changes; serving
+    a cached bundle costs one data_version lookup.
+    """
+    template_data, message = get_template_with_fields(template_id)
+    if not template_data:
+        return None, message
+    template_id = template_data['template']['id']
+    table_ids = sorted({field['data_table_id'] for field in template_data['fields'] if field['data_table_id']})
+    
+    with _template_cache_lock:
+        entry = _form_bundles.get(template_id)
+        generation = _form_bundle_generation
+    try:
+        versions = _data_table_versions(table_ids)
+    except Exception as e:
+        return None, f"Error retrieving form bundle: {str(e)}"
+    if entry and entry[3] is template_data and entry[4] == versions:
+        return entry[:2], "Form bundle retrieved successfully"
+    
+    options = {}
+    for table_id in table_ids:
+        results, message = search_data_table(table_id, limit=FORM_BUNDLE_OPTION_LIMIT)
+        options[str(table_id)] = [
+            {'id': result['id'], 'label': result['display'], 'data': result['data']}
+            for result in results
+        ]
+    
+    body = json.dumps({'success': True, 'template': template_data, 'options': options},
+                      separators=(',', ':'), default=str)
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+    with _template_cache_lock:
+        # A concurrent write may have made the options stale; serve but don't keep them
+        if generation == _form_bundle_generation:
+            _form_bundles[template_id] = (etag, body, frozenset(table_ids), template_data, versions)
+    return (etag, body), "Form bundle retrieved successfully"
+
+def _data_table_versions(table_ids):
+    """Return {table id: data_version} for the given data tables."""
+    if not table_ids:
+        return {}
+    with get_enhanced_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, data_version FROM data_tables WHERE id IN ({', '.join('?' * len(table_ids))})",
+            table_ids
+        )
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
+def invalidate_form_bundles(table_id=None):
+    """Drop the form bundles that use data table table_id (or all of them)."""
+    global _form_bundle_generation
+    with _template_cache_lock:
+        _form_bundle_generation += 1
+        if table_id is None:
+            _form_bundles.clear()
+        else:
+            for template_id in [t for t, entry in _form_bundles.items() if int(table_id) in entry[2]]:
+                del _form_bundles[template_id]
 
 # Case Management
 
@@ -301,6 +606,7 @@ def create_enhanced_case(template_id, title, description, case_data, created_by=
             ''', (case_id, 'created', f'Case {case_number} created', current_time, created_by))
             
             conn.commit()
+            CASE_COUNTS.invalidate()
             return case_id, case_number, "Case created successfully"
             
     except Exception as e:
@@ -343,43 +649,75 @@ def update_case_field(case_id, field_name, old_value, new_value, updated_by="adm
     except Exception as e:
         return False, f"Error updating field: {str(e)}"
 
-def get_cases_list(status=None, assigned_to=None, template_id=None, limit=50, offset=0):
-    """Get a list of cases with optional filtering."""
+def _case_filters(status=None, assigned_to=None, template_id=None):
+    clauses = ''
+    params = []
+    
+    if status:
+        clauses += ' AND ec.status = ?'
+        params.append(status)
+    
+    if assigned_to:
+        clauses += ' AND ec.assigned_to = ?'
+        params.append(assigned_to)
+    
+    if template_id:
+        clauses += ' AND ec.template_id = ?'
+        params.append(template_id)
+    
+    return clauses, params
+
+def get_cases_list(status=None, assigned_to=None, template_id=None, limit=50, offset=0, cursor=None):
+    """Get a newest-first list of cases with optional filtering.
+    
+    Pass cursor (a token from encode_cursor() of the previous page's last
+    case) to page with a keyset seek on (created_at, id) instead of offset.
+    """
+    try:
+        page_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return [], str(e)
+    
     try:
         with get_enhanced_db_connection() as conn:
-            cursor = conn.cursor()
+            db_cursor = conn.cursor()
             
+            filters, params = _case_filters(status, assigned_to, template_id)
             query = '''
                 SELECT ec.*, ect.name as template_name
                 FROM enhanced_cases ec
                 JOIN enhanced_case_templates ect ON ec.template_id = ect.id
                 WHERE 1=1
-            '''
-            params = []
-            
-            if status:
-                query += ' AND ec.status = ?'
-                params.append(status)
-            
-            if assigned_to:
-                query += ' AND ec.assigned_to = ?'
-                params.append(assigned_to)
-            
-            if template_id:
-                query += ' AND ec.template_id = ?'
-                params.append(template_id)
-            
-            query += ' ORDER BY ec.created_at DESC LIMIT ? OFFSET ?'
-            params.extend([limit, offset])
+            ''' + filters
             
-            cursor.execute(query, params)
-            cases = cursor.fetchall()
+            if cursor:
+                cases, _ = fetch_keyset_page(db_cursor, query, params, page_cursor, limit, alias='ec.')
+            else:
+                query += ' ORDER BY ec.created_at DESC, ec.id DESC LIMIT ? OFFSET ?'
+                params.extend([limit, offset])
+                db_cursor.execute(query, params)
+                cases = db_cursor.fetchall()
             
             return [dict(case) for case in cases], "Cases retrieved successfully"
             
     except Exception as e:
         return [], f"Error retrieving cases: {str(e)}"
 
+def count_cases(status=None, assigned_to=None, template_id=None):
+    """Count cases matching the filters; cached for a short time in CASE_COUNTS."""
+    def compute():
+        with get_enhanced_db_connection() as conn:
+            db_cursor = conn.cursor()
+            filters, params = _case_filters(status, assigned_to, template_id)
+            db_cursor.execute('SELECT COUNT(*) FROM enhanced_cases ec WHERE 1=1' + filters, params)
+            return db_cursor.fetchone()[0]
+    
+    try:
+        return CASE_COUNTS.get_or_load(('enhanced_cases', status, assigned_to, str(template_id or '')), compute)
+    except Exception as e:
+        print(f"Error counting cases: {e}")
+        return None
+
 def get_data_tables_list():
     """Get list of all available data tables."""
     try:
@@ -428,65 +766,66 @@ def get_templates_list():
 
 # Utility Functions
 
+def get_dependency_plan(template_id):
+    """Get the compiled dependency rules for a template (cached with the template)."""
+    try:
+        template_id = int(template_id)
+    except (TypeError, ValueError):
+        return None, "Template not found"
+    
+    template_data, msg = get_template_with_fields(template_id)
+    if not template_data:
+        return None, msg
+    
+    with _template_cache_lock:
+        entry = _dependency_plans.get(template_id)
+        if entry and entry[0] is template_data:
+            return entry[1], "Plan retrieved successfully"
+    
+    plan = compile_dependency_rules(template_data['fields'], template_data['dependencies'])
+    with _template_cache_lock:
+        # Only keep it if the template was not invalidated in the meantime
+        entry = _template_cache.get(template_id)
+        if entry and entry[1] is template_data:
+            _dependency_plans[template_id] = (template_data, plan)
+    return plan, "Plan retrieved successfully"
+
 def validate_field_dependencies(template_id, case_data):
     """Validate field dependencies for a case."""
     try:
-        template_data, msg = get_template_with_fields(template_id)
-        if not template_data:
+        plan, msg = get_dependency_plan(template_id)
+        if not plan:
             return False, msg
         
-        errors = []
-        
-        for field in template_data['fields']:
-            field_id = field['field_id']
-            field_value = case_data.get(field_id)
-            
-            # Check dependencies
-            if field['id'] in template_data['dependencies']:
-                for dep in template_data['dependencies'][field['id']]:
-                    parent_value = case_data.get(dep['parent_field_name'])
-                    
-                    # Evaluate condition
-                    condition_met = evaluate_condition(
-                        parent_value, 
-                        dep['condition_type'], 
-                        dep.get('condition_value')
-                    )
-                    
-                    # Apply action if condition is met
-                    if condition_met:
-                        action_config = json.loads(dep.get('action_config', '{}'))
-                        
-                        if dep['action_type'] == 'require' and not field_value:
-                            errors.append(f"Field '{field['field_name']}' is required")
-                        elif dep['action_type'] == 'set_value':
-                            case_data[field_id] = action_config.get('value')
-        
+        errors = plan.apply(case_data)
         return len(errors) == 0, errors if errors else "Validation passed"
         
     except Exception as e:
         return False, f"Error validating dependencies: {str(e)}"
 
+def validate_many(template_id, case_data_list):
+    """Validate a batch of case data dicts against one template (e.g. for bulk imports).
+    
+    Returns a list of {'index', 'is_valid', 'errors'} entries, one per case.
+    """
+    try:
+        plan, msg = get_dependency_plan(template_id)
+        if not plan:
+            return None, msg
+        
+        results = []
+        for index, case_data in enumerate(case_data_list):
+            errors = plan.apply(case_data)
+            results.append({'index': index, 'is_valid': not errors, 'errors': errors})
+        
+        return results, f"Validated {len(results)} cases"
+        
+    except Exception as e:
+        return None, f"Error validating dependencies: {str(e)}"
+
 def evaluate_condition(value, condition_type, condition_value):
     """Evaluate a dependency condition."""
-    if condition_type == 'equals':
-        return str(value) == str(condition_value)
-    elif condition_type == 'not_equals':
-        return str(value) != str(condition_value)
-    elif condition_type == 'contains':
-        return condition_value in str(value)
-    elif condition_type == 'not_contains':
-        return condition_value not in str(value)
-    elif condition_type == 'is_empty':
-        return not value or str(value).strip() == ''
-    elif condition_type == 'is_not_empty':
-        return value and str(value).strip() != ''
-    elif condition_type == 'in_list':
-        return str(value) in condition_value.split(',')
-    elif condition_type == 'not_in_list':
-        return str(value) not in condition_value.split(',')
-    
-    return False
+    return compile_condition(condition_type, condition_value)(value)
 
 def get_field_options_for_dependency(parent_field_id, parent_value):
     """Get dynamic options for a dependent field based on parent value."""
@@ -3,17 +3,33 @@ Enhanced case management routes for the Flask application.
 Handles template creation, case management, and data table operations.
 """
 
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, Response
 import json
 from enhanced_db_utils import (
     create_enhanced_template, get_template_with_fields, create_enhanced_case,
     update_case_field, get_cases_list, create_data_table, add_data_table_record,
-    search_data_table, get_data_tables_list, validate_field_dependencies,
-    get_field_options_for_dependency, get_templates_list
+    search_data_table, get_data_tables_list, validate_field_dependencies, validate_many,
+    get_field_options_for_dependency, get_templates_list, count_cases, get_form_bundle, SEARCH_MODES
+)
+from pagination import encode_cursor
+from bulk_import import IMPORT_FORMATS, detect_format, open_text_stream, import_data_table
+from bulk_export import (
+    open_data_table_export, open_enhanced_cases_export, export_response
 )
 
 enhanced_bp = Blueprint('enhanced', __name__, url_prefix='/enhanced')
 
+@enhanced_bp.app_template_filter('from_json')
+def from_json_filter(value):
+    """Decode a JSON config column for templates; anything unparsable becomes {}."""
+    if isinstance(value, dict):
+        return value
+    try:
+        decoded = json.loads(value)
+    except (TypeError, ValueError):
+        return {}
+    return decoded if isinstance(decoded, dict) else {}
+
 @enhanced_bp.route('/template-builder')
 def template_builder():
     """Show the enhanced template builder interface."""
@@ -47,14 +63,29 @@ def cases_list():
     per_page = int(request.args.get('per_page', 20))
     
     offset = (page - 1) * per_page
-    cases, message = get_cases_list(status, assigned_to, template_id, per_page, offset)
+    # "Next" links carry a keyset cursor; page numbers are kept for display and "Previous"
+    page_cursor = request.args.get('cursor') or None
+    cases, message = get_cases_list(status, assigned_to, template_id, per_page, offset, cursor=page_cursor)
+    if page_cursor and not cases and page > 1:
+        cases, message = get_cases_list(status, assigned_to, template_id, per_page, offset)
+    total_cases = count_cases(status, assigned_to, template_id)
     templates = get_templates_list()
     
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    next_url = None
+    if len(cases) == per_page:
+        next_url = url_for('enhanced.cases_list', **dict(args, page=page + 1, cursor=encode_cursor(cases[-1])))
+    prev_url = url_for('enhanced.cases_list', **dict(args, page=page - 1)) if page > 1 else None
+    
     return render_template('enhanced_cases_list.html', 
                          cases=cases, 
                          templates=templates,
                          current_page=page,
-                         per_page=per_page)
+                         per_page=per_page,
+                         total_cases=total_cases,
+                         next_url=next_url,
+                         prev_url=prev_url)
 
 @enhanced_bp.route('/case/<int:case_id>')
 def view_case(case_id):
@@ -138,6 +169,26 @@ def api_get_template(template_id):
     else:
         return jsonify({'success': False, 'message': message}), 404
 
+@enhanced_bp.route('/api/templates/<int:template_id>/form-bundle')
+def api_get_form_bundle(template_id):
+    """API endpoint returning a template with its data-table option sets.
+    
+    Responses carry an ETag and must be revalidated, so an unchanged form
+    loads from the browser cache with a 304.
+    """
+    if 'username' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    bundle, message = get_form_bundle(template_id)
+    if bundle is None:
+        return jsonify({'success': False, 'message': message}), 404
+    
+    etag, body = bundle
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @enhanced_bp.route('/api/cases/create', methods=['POST'])
 def api_create_case():
     """API endpoint to create a new case."""
@@ -216,6 +267,21 @@ def api_update_case_field(case_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@enhanced_bp.route('/api/cases/export')
+def api_export_cases():
+    """API endpoint to stream enhanced cases as CSV or NDJSON (?status=, ?template_id=)."""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    
+    export, _ = open_enhanced_cases_export(
+        status=request.args.get('status') or None,
+        template_id=request.args.get('template_id', type=int)
+    )
+    response, message = export_response(export, 'enhanced_cases', request.args)
+    if response is None:
+        return jsonify({'success': False, 'message': message}), 400
+    return response
+
 @enhanced_bp.route('/api/data-tables')
 def api_get_data_tables():
     """API endpoint to get list of data tables."""
@@ -298,6 +364,46 @@ def api_add_data_record(table_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@enhanced_bp.route('/api/data-tables/<int:table_id>/import', methods=['POST'])
+def api_import_data_records(table_id):
+    """API endpoint to bulk import CSV/NDJSON records into a data table."""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    
+    upload = request.files.get('file')
+    filename = upload.filename if upload else request.args.get('filename', '')
+    fmt = request.values.get('format') or detect_format(filename, request.content_type)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'message': f"Unsupported format '{fmt}'"}), 400
+    
+    stream = open_text_stream(upload.stream if upload else request.stream, filename)
+    report, message = import_data_table(
+        table_id,
+        stream,
+        fmt,
+        upsert=request.values.get('upsert') in ('1', 'true', 'on'),
+        key_column=request.values.get('key') or None,
+        created_by=session['username']
+    )
+    
+    if report is None:
+        return jsonify({'success': False, 'message': message}), 400
+    return jsonify({'success': True, 'message': message, 'report': report})
+
+@enhanced_bp.route('/api/data-tables/<int:table_id>/export')
+def api_export_data_records(table_id):
+    """API endpoint to stream a data table's active records as CSV or NDJSON."""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    
+    export, message = open_data_table_export(table_id)
+    if export is None:
+        return jsonify({'success': False, 'message': message}), 404
+    response, message = export_response(export, f"data_table_{table_id}", request.args)
+    if response is None:
+        return jsonify({'success': False, 'message': message}), 400
+    return response
+
 @enhanced_bp.route('/api/data-tables/<int:table_id>/search')
 def api_search_data_table(table_id):
     """API endpoint to search records in a data table."""
@@ -306,8 +412,14 @@ def api_search_data_table(table_id):
     
     search_term = request.args.get('q', '')
     limit = int(request.args.get('limit', 10))
+    # contains (default), prefix or exact; prefix/exact are index-backed
+    mode = request.args.get('mode', 'contains')
+    column = request.args.get('column') or None
+    
+    if mode not in SEARCH_MODES:
+        return jsonify({'success': False, 'message': f"mode must be one of: {', '.join(SEARCH_MODES)}"}), 400
     
-    results, message = search_data_table(table_id, search_term, limit)
+    results, message = search_data_table(table_id, search_term, limit, mode=mode, column=column)
     
     return jsonify({
         'success': True,
@@ -351,3 +463,31 @@ def api_validate_template_data(template_id):
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
+
+@enhanced_bp.route('/api/templates/<int:template_id>/validate-many', methods=['POST'])
+def api_validate_many(template_id):
+    """API endpoint to validate a batch of case data against template rules."""
+    if 'username' not in session:
+        return jsonify({'success': False, 'message': 'Not authenticated'}), 401
+    
+    try:
+        data = request.get_json()
+        cases = data.get('cases', [])
+        
+        if not isinstance(cases, list):
+            return jsonify({'success': False, 'message': 'cases must be a list'}), 400
+        
+        results, message = validate_many(template_id, cases)
+        
+        if results is None:
+            return jsonify({'success': False, 'message': message}), 404
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'invalid_count': sum(1 for result in results if not result['is_valid']),
+            'message': message
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
@@ -871,12 +871,10 @@ def main():
 
 if __name__ == "__main__":
     # Initialize the enhanced database first
-    from enhanced_database_init import init_enhanced_database, create_sample_data_tables, create_form_builder_configs
+    from enhanced_database_init import init_enhanced_database
     
     print("Initializing enhanced database...")
     if init_enhanced_database():
-        create_sample_data_tables()
-        create_form_builder_configs()
         main()
     else:
         print("Failed to initialize database. Please check the error messages above.")
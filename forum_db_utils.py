@@ -0,0 +1,801 @@
+"""
+Forum post storage for the How To section.
+Posts, tags, comments and annotations live in SQLite and are addressed by a
+stable integer post ID instead of their position in posts.json.
+"""
+
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from db_utils import fts_match_query, get_db_connection, replace_fts_row
+
+# Search result weights for title, body, tags and comments
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 0.5)
+SNIPPET_TOKENS = 16
+
+
+def _new_item_id():
+    """Timestamp based identifier used for comments and annotations."""
+    return datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+
+
+def _row_to_post(row, tags=None):
+    """Convert a forum_posts row into the dict shape the templates expect."""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'content': row['content'] or '',
+        'author': row['author'],
+        'category': row['category'] or 'General',
+        'created': row['created'] or '',
+        'attachments': json.loads(row['attachments_json'] or '[]'),
+        'embedded': json.loads(row['embedded_json'] or '[]'),
+        'locked': bool(row['locked']),
+        'tags': tags if tags is not None else []
+    }
+
+
+def _write_tags(cursor, post_id, tags):
+    cursor.execute("DELETE FROM forum_post_tags WHERE post_id = ?", (post_id,))
+    seen = set()
+    rows = []
+    for tag in tags:
+        if tag and tag not in seen:
+            seen.add(tag)
+            rows.append((post_id, tag, len(rows)))
+    cursor.executemany(
+        "INSERT INTO forum_post_tags (post_id, tag, position) VALUES (?, ?, ?)",
+        rows
+    )
+
+
+def _read_tags(cursor, post_id):
+    cursor.execute(
+        "SELECT tag FROM forum_post_tags WHERE post_id = ? ORDER BY position",
+        (post_id,)
+    )
+    return [row['tag'] for row in cursor.fetchall()]
+
+
+def strip_html(content):
+    """Reduce post HTML to plain text for indexing."""
+    text = re.sub(r'(?is)<(script|style)[^>]*>.*?</\1>', ' ', content or '')
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+
+def _index_post(cursor, post_id):
+    """Refresh the full-text search row for a single post (removed if the post is gone)."""
+    cursor.execute("SELECT title, content FROM forum_posts WHERE id = ?", (post_id,))
+    row = cursor.fetchone()
+    values = None
+    if row:
+        cursor.execute("SELECT tag FROM forum_post_tags WHERE post_id = ?", (post_id,))
+        tags = ' '.join(r['tag'] for r in cursor.fetchall())
+        cursor.execute("SELECT name, text FROM forum_comments WHERE post_id = ?", (post_id,))
+        comments = ' '.join(f"{r['name'] or ''} {r['text'] or ''}" for r in cursor.fetchall())
+        values = {'title': row['title'], 'body': strip_html(row['content']),
+                  'tags': tags, 'comments': comments}
+    replace_fts_row(cursor, 'forum_posts_fts', post_id, values)
+
+
+def import_posts_from_json(posts_path):
+    """One-shot import of the legacy posts.json file into the forum tables.
+
+    Posts are inserted oldest first so IDs grow with creation time. The import
+    is recorded in forum_import_log and is skipped on every later call.
+    """
+    source = os.path.basename(posts_path)
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT source FROM forum_import_log WHERE source = ?", (source,))
+            if cursor.fetchone():
+                return 0, "Already imported"
+
+            posts = []
+            if os.path.exists(posts_path):
+                with open(posts_path, 'r', encoding='utf-8') as f:
+                    posts = json.load(f)
+
+            # posts.json keeps the newest post first
+            for post in reversed(posts):
+                cursor.execute("""
+                    INSERT INTO forum_posts
+                    (title, content, author, category, attachments_json, embedded_json,
+                     locked, created, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    (post.get('title') or '').strip(),
+                    post.get('content', ''),
+                    post.get('author', 'Admin'),
+                    post.get('category', 'General'),
+                    json.dumps(post.get('attachments', [])),
+                    json.dumps(post.get('embedded', [])),
+                    1 if post.get('locked') else 0,
+                    post.get('created', datetime.utcnow().strftime('%Y-%m-%d %H:%M')),
+                    datetime.now().isoformat()
+                ))
+                post_id = cursor.lastrowid
+
+                tags = post.get('tags', [])
+                _write_tags(cursor, post_id, tags if isinstance(tags, list) else [])
+
+                for comment in post.get('comments', []):
+                    cursor.execute("""
+                        INSERT INTO forum_comments (post_id, comment_id, name, text, created)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (
+                        post_id,
+                        comment.get('id') or _new_item_id(),
+                        comment.get('name', 'Anonymous'),
+                        comment.get('text', ''),
+                        comment.get('created')
+                    ))
+
+                for annotation in post.get('annotations', []):
+                    cursor.execute("""
+                        INSERT INTO forum_annotations
+                        (post_id, annotation_id, type, data, position_json, color, author, created)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        post_id,
+                        annotation.get('id') or _new_item_id(),
+                        annotation.get('type', 'highlight'),
+                        annotation.get('data', ''),
+                        json.dumps(annotation.get('position', {})),
+                        annotation.get('color', '#ffff00'),
+                        annotation.get('author', 'Anonymous'),
+                        annotation.get('created')
+                    ))
+
+                _index_post(cursor, post_id)
+
+            cursor.execute("""
+                INSERT INTO forum_import_log (source, post_count, imported_at)
+                VALUES (?, ?, ?)
+            """, (source, len(posts), datetime.now().isoformat()))
+
+            conn.commit()
+            invalidate_posting_lists()
+            return len(posts), f"Imported {len(posts)} posts from {source}"
+
+    except Exception as e:
+        print(f"Error importing posts from {posts_path}: {e}")
+        return 0, f"Import failed: {str(e)}"
+
+
+def get_forum_post(post_id, include_comments=False):
+    """Get a single post (with tags) by its ID."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT * FROM forum_posts WHERE id = ?", (post_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            post = _row_to_post(row, _read_tags(cursor, post_id))
+
+            if include_comments:
+                cursor.execute("""
+                    SELECT comment_id, name, text, created FROM forum_comments
+                    WHERE post_id = ? ORDER BY id
+                """, (post_id,))
+                post['comments'] = [
+                    {'id': c['comment_id'], 'name': c['name'], 'text': c['text'], 'created': c['created']}
+                    for c in cursor.fetchall()
+                ]
+
+            return post
+
+    except Exception as e:
+        print(f"Error getting forum post {post_id}: {e}")
+        return None
+
+
+def get_all_forum_posts():
+    """Get every post with its tags, newest first."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT post_id, tag FROM forum_post_tags ORDER BY post_id, position")
+            tags_by_post = {}
+            for row in cursor.fetchall():
+                tags_by_post.setdefault(row['post_id'], []).append(row['tag'])
+
+            cursor.execute("SELECT * FROM forum_posts ORDER BY created DESC, id DESC")
+            return [_row_to_post(row, tags_by_post.get(row['id'], [])) for row in cursor.fetchall()]
+
+    except Exception as e:
+        print(f"Error getting forum posts: {e}")
+        return []
+
+
+def create_forum_post(title, content, category, tags=None, attachments=None, embedded=None, author='Admin'):
+    """Create a post and return its new ID."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO forum_posts
+                (title, content, author, category, attachments_json, embedded_json,
+                 locked, created, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
+            """, (
+                title,
+                content,
+                author,
+                category,
+                json.dumps(attachments or []),
+                json.dumps(embedded or []),
+                datetime.utcnow().strftime('%Y-%m-%d %H:%M'),
+                datetime.now().isoformat()
+            ))
+            post_id = cursor.lastrowid
+            _write_tags(cursor, post_id, tags or [])
+            _index_post(cursor, post_id)
+
+            conn.commit()
+            invalidate_posting_lists()
+            return post_id, "Post created"
+
+    except Exception as e:
+        print(f"Error creating forum post: {e}")
+        return None, str(e)
+
+
+def update_forum_post(post_id, title, content, category, tags=None, new_attachments=None, new_embedded=None):
+    """Update a post. Tags are only replaced when a list is given."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT attachments_json, embedded_json FROM forum_posts WHERE id = ?",
+                (post_id,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return False
+
+            attachments = json.loads(row['attachments_json'] or '[]') + list(new_attachments or [])
+            embedded = json.loads(row['embedded_json'] or '[]') + list(new_embedded or [])
+
+            cursor.execute("""
+                UPDATE forum_posts
+                SET title = ?, content = ?, category = ?, attachments_json = ?,
+                    embedded_json = ?, updated_at = ?
+                WHERE id = ?
+            """, (
+                title,
+                content,
+                category,
+                json.dumps(attachments),
+                json.dumps(embedded),
+                datetime.now().isoformat(),
+                post_id
+            ))
+
+            if tags is not None:
+                _write_tags(cursor, post_id, tags)
+            _index_post(cursor, post_id)
+
+            conn.commit()
+            invalidate_posting_lists()
+            return True
+
+    except Exception as e:
+        print(f"Error updating forum post {post_id}: {e}")
+        return False
+
+
+def update_forum_post_content(post_id, title, content):
+    """Rewrite only the title and content of a post (used by cleanup)."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE forum_posts SET title = ?, content = ?, updated_at = ? WHERE id = ?",
+                (title, content, datetime.now().isoformat(), post_id)
+            )
+            _index_post(cursor, post_id)
+            conn.commit()
+            invalidate_posting_lists()
+            return cursor.rowcount > 0
+
+    except Exception as e:
+        print(f"Error updating forum post content {post_id}: {e}")
+        return False
+
+
+def delete_forum_post(post_id):
+    """Delete a post together with its tags, comments and annotations."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM forum_post_tags WHERE post_id = ?", (post_id,))
+            cursor.execute("DELETE FROM forum_comments WHERE post_id = ?", (post_id,))
+            cursor.execute("DELETE FROM forum_annotations WHERE post_id = ?", (post_id,))
+            cursor.execute("DELETE FROM forum_posts WHERE id = ?", (post_id,))
+            deleted = cursor.rowcount > 0
+            _index_post(cursor, post_id)
+            conn.commit()
+            invalidate_posting_lists()
+            return deleted
+
+    except Exception as e:
+        print(f"Error deleting forum post {post_id}: {e}")
+        return False
+
+
+def toggle_forum_post_lock(post_id):
+    """Flip the locked flag on a post."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE forum_posts SET locked = CASE WHEN locked = 1 THEN 0 ELSE 1 END WHERE id = ?",
+                (post_id,)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    except Exception as e:
+        print(f"Error toggling lock on forum post {post_id}: {e}")
+        return False
+
+
+def rename_forum_category(old_category, new_category):
+    """Move every post in old_category to new_category."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE forum_posts SET category = ?, updated_at = ? WHERE category = ?",
+                (new_category, datetime.now().isoformat(), old_category)
+            )
+            conn.commit()
+            invalidate_posting_lists()
+            return cursor.rowcount
+
+    except Exception as e:
+        print(f"Error renaming forum category {old_category}: {e}")
+        return 0
+
+
+# Tags
+
+def get_forum_post_tags(post_id):
+    """Return (title, tags) for a post, or (None, None) if it does not exist."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT title FROM forum_posts WHERE id = ?", (post_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None, None
+            return row['title'], _read_tags(cursor, post_id)
+
+    except Exception as e:
+        print(f"Error getting tags for forum post {post_id}: {e}")
+        return None, None
+
+
+def set_forum_post_tags(post_id, tags):
+    """Replace all tags on a post and return the stored list."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            _write_tags(cursor, post_id, tags)
+            _index_post(cursor, post_id)
+            conn.commit()
+            invalidate_posting_lists()
+            return _read_tags(cursor, post_id)
+
+    except Exception as e:
+        print(f"Error setting tags for forum post {post_id}: {e}")
+        return None
+
+
+def add_forum_post_tag(post_id, tag):
+    """Append a tag to a post. Returns the new tag list or None if it already existed."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO forum_post_tags (post_id, tag, position)
+                VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM forum_post_tags WHERE post_id = ?))
+            """, (post_id, tag, post_id))
+            if cursor.rowcount == 0:
+                return None
+            _index_post(cursor, post_id)
+            conn.commit()
+            invalidate_posting_lists()
+            return _read_tags(cursor, post_id)
+
+    except Exception as e:
+        print(f"Error adding tag to forum post {post_id}: {e}")
+        return None
+
+
+def remove_forum_post_tag(post_id, tag):
+    """Remove a tag from a post. Returns the new tag list or None if it was not present."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM forum_post_tags WHERE post_id = ? AND tag = ?",
+                (post_id, tag)
+            )
+            if cursor.rowcount == 0:
+                return None
+            _index_post(cursor, post_id)
+            conn.commit()
+            invalidate_posting_lists()
+            return _read_tags(cursor, post_id)
+
+    except Exception as e:
+        print(f"Error removing tag from forum post {post_id}: {e}")
+        return None
+
+
+# Comments
+
+def add_forum_comment(post_id, name, text):
+    """Add a comment to a post and return its comment ID."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            comment_id = _new_item_id()
+            cursor.execute("""
+                INSERT INTO forum_comments (post_id, comment_id, name, text, created)
+                VALUES (?, ?, ?, ?, ?)
+            """, (post_id, comment_id, name, text, datetime.utcnow().isoformat()))
+            _index_post(cursor, post_id)
+            conn.commit()
+            return comment_id
+
+    except Exception as e:
+        print(f"Error adding comment to forum post {post_id}: {e}")
+        return None
+
+
+def delete_forum_comment(post_id, comment_id):
+    """Delete a comment from a post."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM forum_comments WHERE post_id = ? AND comment_id = ?",
+                (post_id, comment_id)
+            )
+            deleted = cursor.rowcount > 0
+            _index_post(cursor, post_id)
+            conn.commit()
+            return deleted
+
+    except Exception as e:
+        print(f"Error deleting comment {comment_id}: {e}")
+        return False
+
+
+# Annotations
+
+def _row_to_annotation(row):
+    return {
+        'id': row['annotation_id'],
+        'type': row['type'],
+        'data': row['data'],
+        'position': json.loads(row['position_json'] or '{}'),
+        'color': row['color'],
+        'author': row['author'],
+        'created': row['created']
+    }
+
+
+def get_forum_annotations(post_id):
+    """Return all annotations on a post."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM forum_annotations WHERE post_id = ? ORDER BY id",
+                (post_id,)
+            )
+            return [_row_to_annotation(row) for row in cursor.fetchall()]
+
+    except Exception as e:
+        print(f"Error getting annotations for forum post {post_id}: {e}")
+        return []
+
+
+def add_forum_annotation(post_id, annotation, author):
+    """Store an annotation on a post and return it."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            new_annotation = {
+                'id': _new_item_id(),
+                'type': annotation.get('type', 'highlight'),  # highlight, drawing, note
+                'data': annotation.get('data', ''),
+                'position': annotation.get('position', {}),
+                'color': annotation.get('color', '#ffff00'),
+                'author': author,
+                'created': datetime.utcnow().isoformat()
+            }
+            cursor.execute("""
+                INSERT INTO forum_annotations
+                (post_id, annotation_id, type, data, position_json, color, author, created)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                post_id,
+                new_annotation['id'],
+                new_annotation['type'],
+                new_annotation['data'],
+                json.dumps(new_annotation['position']),
+                new_annotation['color'],
+                new_annotation['author'],
+                new_annotation['created']
+            ))
+            conn.commit()
+            return new_annotation
+
+    except Exception as e:
+        print(f"Error adding annotation to forum post {post_id}: {e}")
+        return None
+
+
+def delete_forum_annotation(post_id, annotation_id):
+    """Delete an annotation from a post."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM forum_annotations WHERE post_id = ? AND annotation_id = ?",
+                (post_id, annotation_id)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    except Exception as e:
+        print(f"Error deleting annotation {annotation_id}: {e}")
+        return False
+
+
+# Search
+
+def _mark_snippet(snippet):
+    """Escape a raw snippet and turn the sentinel markers into <mark> tags."""
+    escaped = html.escape(snippet)
+    return escaped.replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def search_forum_posts(query, limit=None):
+    """Search posts by title, text, tags and comments, best match first.
+
+    Returns a list of {'id', 'snippet'} dicts. The snippet is HTML-safe with
+    matched words wrapped in <mark>.
+    """
+    match = fts_match_query(query)
+    if not match:
+        return []
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                sql = f"""
+                    SELECT rowid AS id,
+                           snippet(forum_posts_fts, -1, char(2), char(3), '...', {SNIPPET_TOKENS}) AS snippet
+                    FROM forum_posts_fts
+                    WHERE forum_posts_fts MATCH ?
+                    ORDER BY bm25(forum_posts_fts, {', '.join(str(w) for w in SEARCH_WEIGHTS)})
+                """
+                params = [match]
+                if limit:
+                    sql += " LIMIT ?"
+                    params.append(limit)
+                cursor.execute(sql, params)
+                return [
+                    {'id': row['id'], 'snippet': _mark_snippet(row['snippet'] or '')}
+                    for row in cursor.fetchall()
+                ]
+            except sqlite3.OperationalError as e:
+                print(f"Forum search index unavailable, scanning posts instead: {e}")
+
+            # Fallback without FTS5: substring match on title and content
+            like = f"%{query.strip()}%"
+            cursor.execute("""
+                SELECT id FROM forum_posts
+                WHERE title LIKE ? OR content LIKE ?
+                ORDER BY created DESC
+            """, (like, like))
+            return [{'id': row['id'], 'snippet': None} for row in cursor.fetchall()]
+
+    except Exception as e:
+        print(f"Error searching forum posts: {e}")
+        return []
+
+
+def rebuild_forum_search_index(force=False):
+    """Re-index every post. Without force, only runs when the index is out of step."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM forum_posts")
+            post_count = cursor.fetchone()[0]
+            try:
+                cursor.execute("SELECT COUNT(*) FROM forum_posts_fts")
+            except sqlite3.OperationalError:
+                return 0
+            if not force and cursor.fetchone()[0] == post_count:
+                return 0
+
+            cursor.execute("DELETE FROM forum_posts_fts")
+            cursor.execute("SELECT id FROM forum_posts")
+            post_ids = [row['id'] for row in cursor.fetchall()]
+            for post_id in post_ids:
+                _index_post(cursor, post_id)
+
+            conn.commit()
+            return len(post_ids)
+
+    except Exception as e:
+        print(f"Error rebuilding forum search index: {e}")
+        return 0
+
+
+# Posting lists
+
+class ForumPostingLists:
+    """Precomputed post ID lists for the forum page.
+
+    For every sort order there is one global ID list and one list per
+    category, so an unfiltered page is a slice. Tags map to ID sets, so
+    multi-tag filters are set intersections that start from the smallest set.
+    """
+
+    SORT_ORDERS = ('newest', 'oldest', 'title')
+
+    def __init__(self, posts, post_tags):
+        newest = sorted(posts, key=lambda p: (p['created'] or '', p['id']), reverse=True)
+        by_title = sorted(posts, key=lambda p: ((p['title'] or '').lower(), p['id']))
+        self.order = {
+            'newest': [p['id'] for p in newest],
+            'oldest': [p['id'] for p in reversed(newest)],
+            'title': [p['id'] for p in by_title]
+        }
+        self.rank = {
+            name: {post_id: pos for pos, post_id in enumerate(ids)}
+            for name, ids in self.order.items()
+        }
+        self.category_of = {p['id']: p['category'] or 'General' for p in posts}
+
+        self.by_category = {}
+        for name, ids in self.order.items():
+            for post_id in ids:
+                lists = self.by_category.setdefault(self.category_of[post_id], {})
+                lists.setdefault(name, []).append(post_id)
+
+        tag_sets = {}
+        for post_id, tag in post_tags:
+            tag_sets.setdefault(tag, set()).add(post_id)
+        self.by_tag = {tag: frozenset(ids) for tag, ids in tag_sets.items()}
+        self.tags = sorted(self.by_tag)
+
+    def category_count(self, category):
+        return len(self.by_category.get(category, {}).get('newest', []))
+
+    def select(self, sort_by='newest', category=None, tags=None, ranked_ids=None):
+        """Return the ordered list of post IDs that match every filter.
+
+        ranked_ids (search hits, best first) restricts the result; when
+        sort_by is 'relevance' that ranking is also the output order.
+        """
+        if sort_by not in self.SORT_ORDERS and not (sort_by == 'relevance' and ranked_ids is not None):
+            sort_by = 'newest'
+
+        if not tags and ranked_ids is None:
+            # No set filters: the posting list already is the answer
+            if category:
+                return self.by_category.get(category, {}).get(sort_by, [])
+            return self.order[sort_by]
+
+        candidates = None
+        if tags:
+            tag_sets = sorted((self.by_tag.get(tag, frozenset()) for tag in tags), key=len)
+            candidates = set(tag_sets[0])
+            for tag_set in tag_sets[1:]:
+                candidates &= tag_set
+        if ranked_ids is not None:
+            ranked_set = set(ranked_ids)
+            candidates = ranked_set if candidates is None else candidates & ranked_set
+        if category:
+            candidates = {post_id for post_id in candidates if self.category_of.get(post_id) == category}
+
+        if sort_by == 'relevance':
+            return [post_id for post_id in ranked_ids if post_id in candidates]
+        rank = self.rank[sort_by]
+        return sorted((post_id for post_id in candidates if post_id in rank), key=rank.__getitem__)
+
+
+# (watermark, ForumPostingLists) or None
+_posting_lists = None
+_posting_lists_lock = threading.Lock()
+
+
+def invalidate_posting_lists():
+    """Drop the cached posting lists; the next forum page view rebuilds them."""
+    global _posting_lists
+    with _posting_lists_lock:
+        _posting_lists = None
+
+
+def _posting_lists_watermark(cursor):
+    """Forum change counter; triggers on forum_posts and forum_post_tags bump it on every write."""
+    cursor.execute("SELECT version FROM forum_change_counter WHERE id = 1")
+    row = cursor.fetchone()
+    return row['version'] if row else None
+
+
+def get_posting_lists():
+    """Return the current posting lists, building them if a post has changed."""
+    global _posting_lists
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            watermark = _posting_lists_watermark(cursor)
+            cached = _posting_lists
+            if cached is not None and watermark is not None and cached[0] == watermark:
+                return cached[1]
+            cursor.execute("SELECT id, category, created, title FROM forum_posts")
+            posts = [dict(row) for row in cursor.fetchall()]
+            cursor.execute("SELECT post_id, tag FROM forum_post_tags")
+            post_tags = [(row['post_id'], row['tag']) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error building forum posting lists: {e}")
+        return ForumPostingLists([], [])
+
+    lists = ForumPostingLists(posts, post_tags)
+    if watermark is not None:
+        with _posting_lists_lock:
+            # Keep whichever build saw the later counter
+            if _posting_lists is None or _posting_lists[0] < watermark:
+                _posting_lists = (watermark, lists)
+    return lists
+
+
+def get_forum_posts_by_ids(post_ids):
+    """Fetch posts (with tags) for the given IDs, keeping the given order."""
+    if not post_ids:
+        return []
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ', '.join('?' for _ in post_ids)
+
+            cursor.execute(f"""
+                SELECT post_id, tag FROM forum_post_tags
+                WHERE post_id IN ({placeholders})
+                ORDER BY post_id, position
+            """, list(post_ids))
+            tags_by_post = {}
+            for row in cursor.fetchall():
+                tags_by_post.setdefault(row['post_id'], []).append(row['tag'])
+
+            cursor.execute(f"SELECT * FROM forum_posts WHERE id IN ({placeholders})", list(post_ids))
+            posts = {row['id']: _row_to_post(row, tags_by_post.get(row['id'], [])) for row in cursor.fetchall()}
+            return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    except Exception as e:
+        print(f"Error getting forum posts by id: {e}")
+        return []
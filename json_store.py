@@ -0,0 +1,254 @@
+"""
+Cached JSON file storage for the Tech Guides website.
+Parsed files are kept in memory and only re-read when the file changes on disk.
+Writes go to a temp file that is fsynced and renamed over the original, under
+an inter-process lock, and saves that pile up behind a running flush are
+written together in a single flush.
+"""
+
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FrozenDict(dict):
+    """A dict that refuses in-place modification.
+
+    Cached snapshots are shared between requests, so any attempt to mutate
+    one raises instead of silently corrupting the cache for everyone else.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Cached JSON snapshots are read-only; load with mutable=True to modify")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value):
+    """Recursively convert dicts/lists into read-only FrozenDict/tuple values."""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Recursively convert a frozen snapshot back into plain, mutable dicts/lists."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _stat_key(path):
+    """Return the (mtime, size, inode) triple used to detect file changes."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive inter-process lock on ``path + '.lock'``."""
+    with open(path + '.lock', 'a+') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_json(path, data):
+    """Write data as JSON via temp file + fsync + rename; return bytes written.
+
+    Readers (in this or any other process) see either the old file or the new
+    one, never a half-written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fcntl:
+        # Persist the rename itself (not supported for directories on Windows)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    return size
+
+
+class JsonStore:
+    """In-process cache for a single JSON file.
+
+    The file is parsed at most once per on-disk version. Readers get a shared
+    immutable snapshot; writers ask for a mutable copy and call save().
+
+    save() is group-committed: while one thread is flushing, later saves only
+    replace the pending data, and the next flush writes the newest version on
+    behalf of all of them. Every save() still returns only once its data (or
+    newer data) is on disk.
+    """
+
+    def __init__(self, path, default=None, normalize=None):
+        self.path = path
+        self.default = default
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._key = None
+        self._snapshot = None
+        self._pending = None
+        self._version = 0
+        self._flushed_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.flushes = 0
+        self.coalesced = 0
+        self.bytes_written = 0
+        self.flush_seconds = 0.0
+
+    def _default_value(self):
+        return self.default() if callable(self.default) else self.default
+
+    def load(self, mutable=False):
+        """Return the file contents, re-parsing only if the file has changed."""
+        key = _stat_key(self.path)
+        with self._lock:
+            if self._snapshot is not None and (self._pending is not None or key == self._key):
+                self.hits += 1
+                snapshot = self._snapshot
+            elif self._pending is not None:
+                # A save is waiting to be flushed; it is newer than the file
+                self.misses += 1
+                snapshot = freeze(self._pending)
+                self._snapshot = snapshot
+            else:
+                self.misses += 1
+                if key is None:
+                    data = self._default_value()
+                else:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                if self.normalize:
+                    data = self.normalize(data)
+                snapshot = freeze(data)
+                self._key = key
+                self._snapshot = snapshot
+        return thaw(snapshot) if mutable else snapshot
+
+    def save(self, data):
+        """Write data to disk, coalescing with any saves queued behind a flush.
+
+        data must not be modified after it is passed in.
+        """
+        with self._lock:
+            self._version += 1
+            version = self._version
+            self._pending = data
+            self._snapshot = None
+            self.saves += 1
+
+        with self._flush_lock:
+            with self._lock:
+                if self._flushed_version >= version:
+                    # A flush that started after our save already wrote it
+                    self.coalesced += 1
+                    return
+                data = self._pending
+                target_version = self._version
+
+            started = time.perf_counter()
+            try:
+                with file_lock(self.path):
+                    size = atomic_write_json(self.path, data)
+            except Exception:
+                with self._lock:
+                    if self._version == target_version:
+                        self._pending = None
+                        self._snapshot = None
+                        self._key = None
+                raise
+
+            with self._lock:
+                self._flushed_version = target_version
+                self.flushes += 1
+                self.bytes_written += size
+                self.flush_seconds += time.perf_counter() - started
+                if self._version == target_version:
+                    # Nothing newer is queued; a snapshot built from the
+                    # pending data now matches the file on disk.
+                    self._pending = None
+                    self._key = _stat_key(self.path)
+
+    def invalidate(self):
+        """Forget the cached snapshot so the next load re-reads the file."""
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._key = None
+            self._snapshot = None
+
+    def stats(self):
+        return {
+            'path': os.path.basename(self.path),
+            'hits': self.hits,
+            'misses': self.misses,
+            'saves': self.saves,
+            'flushes': self.flushes,
+            'coalesced': self.coalesced,
+            'bytes_written': self.bytes_written,
+            'flush_seconds': round(self.flush_seconds, 4),
+        }
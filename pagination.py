@@ -0,0 +1,69 @@
+"""
+Keyset pagination helpers for the listing APIs.
+Lists are ordered newest first on (created_at, id). A page cursor is an
+opaque token holding the (created_at, id) of the last row shown, so the next
+page is a seek on the created_at index instead of an OFFSET scan, and deep
+pages cost the same as the first one.
+"""
+
+import base64
+import json
+
+# Seconds a cached total count is served before it is recomputed, and how
+# many filter combinations are kept (see result_cache.LRUTTLCache)
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_SIZE = 256
+
+
+def encode_cursor(row):
+    """Return the opaque cursor for a row (anything with created_at and id keys)."""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (created_at, id) from a cursor token; raises ValueError if it is invalid."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid page cursor")
+    if not isinstance(row_id, int) or not (created_at is None or isinstance(created_at, str)):
+        raise ValueError("Invalid page cursor")
+    return created_at, row_id
+
+
+def fetch_keyset_page(cursor, query, params, page_cursor, limit, alias=''):
+    """Run query (a SELECT ending in a WHERE clause) for one newest-first page.
+
+    page_cursor is a decoded (created_at, id) pair or None for the first page.
+    Rows with a NULL created_at sort last and are paged by id alone.
+    Returns (rows, next_cursor_token); next_cursor_token is None on the last page.
+    """
+    created_col = f"{alias}created_at"
+    id_col = f"{alias}id"
+    order = f" ORDER BY {created_col} DESC, {id_col} DESC LIMIT ?"
+    params = list(params)
+
+    if page_cursor is None:
+        cursor.execute(query + order, params + [limit + 1])
+        rows = cursor.fetchall()
+    else:
+        created_at, row_id = page_cursor
+        if created_at is None:
+            cursor.execute(query + f" AND {created_col} IS NULL AND {id_col} < ?" + order,
+                           params + [row_id, limit + 1])
+            rows = cursor.fetchall()
+        else:
+            cursor.execute(query + f" AND ({created_col}, {id_col}) < (?, ?)" + order,
+                           params + [created_at, row_id, limit + 1])
+            rows = cursor.fetchall()
+            if len(rows) <= limit:
+                # The row-value comparison never matches NULLs; they come after everything else
+                cursor.execute(query + f" AND {created_col} IS NULL" + order,
+                               params + [limit + 1 - len(rows)])
+                rows += cursor.fetchall()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
@@ -0,0 +1,96 @@
+"""
+A small thread-safe LRU cache with per-entry expiry for query results.
+Keys are tuples whose first item names the table the result was read from,
+so writes to a table can drop just that table's entries.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUTTLCache:
+    """Least-recently-used cache holding at most maxsize entries for ttl seconds each.
+
+    None is a valid cached value, so lookups that found nothing are
+    remembered too.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=MISSING):
+        """Return the cached value for key, or default (the MISSING sentinel) on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def get_or_load(self, key, load):
+        """Return the cached value for key, calling load() and caching its result on a miss."""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.generation()
+        value = load()
+        self.put(key, value, generation)
+        return value
+
+    def generation(self):
+        """Token to pass to put() for values read from the database after this call."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation=None):
+        """Cache value for key, unless an invalidation happened since generation was taken."""
+        with self._lock:
+            # A write to the table while the value was loaded may have made it stale
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, table=None):
+        """Drop every entry (or every entry for one table)."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if table is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == table]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
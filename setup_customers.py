@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from db_utils import *
+from bulk_import import import_custom_table_rows
 
 # Create customers table and add sample data
 try:
@@ -31,21 +32,23 @@ try:
         {'name': 'Future Systems Inc', 'number': 'FUTR005'}
     ]
     
-    added_count = 0
-    for customer in sample_customers:
-        success, error = insert_custom_table_row('customers', customer)
-        if success:
-            name = customer['name']
-            number = customer['number']
-            print(f'Added customer: {name} - {number}')
-            added_count += 1
+    # One batched import instead of a transaction per customer
+    report, message = import_custom_table_rows(
+        'customers',
+        ((line, customer, None) for line, customer in enumerate(sample_customers, start=1))
+    )
+    if report is None:
+        print(f'Error adding customers: {message}')
+        exit(1)
+
+    for error in report['errors']:
+        customer = sample_customers[error['line'] - 1]
+        if 'UNIQUE constraint failed' in error['error']:
+            print(f'Customer already exists: {customer["name"]}')
         else:
-            if 'UNIQUE constraint failed' in str(error):
-                print(f'Customer already exists: {customer["name"]}')
-            else:
-                print(f'Error adding customer: {error}')
-    
-    print(f'Added {added_count} new customers')
+            print(f'Error adding customer {customer["name"]}: {error["error"]}')
+
+    print(f'Added {report["inserted"]} new customers')
             
 except Exception as e:
     print(f'Error: {e}')
@@ -4,6 +4,12 @@ document.addEventListener('DOMContentLoaded', () => {
   let rules = [];
   try { rules = JSON.parse(rulesEl.dataset.rules || '[]'); } catch(e) { console.error(e); }
 
+  // Lookups queued within one tick are sent together to the batch endpoint,
+  // at most RELATED_BATCH_MAX (see app.py) per request
+  const BATCH_MAX = 200;
+  let pending = [];
+  let flushTimer = null;
+
   rules.forEach(rule => {
     const src = document.querySelector(`[name="${rule.source}"]`);
     if (src) {
@@ -13,24 +19,46 @@ document.addEventListener('DOMContentLoaded', () => {
 
   function applyRule(rule, value) {
     if (!rule.table || !rule.match_column) return;
-    const params = new URLSearchParams();
-    params.append('column', rule.match_column);
-    params.append('value', value);
-    if (rule.map) {
-      Object.values(rule.map).forEach(c => params.append('return', c));
+    pending.push({ rule, value });
+    if (!flushTimer) flushTimer = setTimeout(flushLookups, 10);
+  }
+
+  function flushLookups() {
+    const queued = pending;
+    pending = [];
+    flushTimer = null;
+    for (let start = 0; start < queued.length; start += BATCH_MAX) {
+      sendBatch(queued.slice(start, start + BATCH_MAX));
     }
-    fetch(`/api/data-tables/${rule.table}/related?` + params.toString())
+  }
+
+  function sendBatch(batch) {
+    const lookups = batch.map(({ rule, value }) => ({
+      table: rule.table,
+      column: rule.match_column,
+      value: value,
+      return: Object.values(rule.map || {})
+    }));
+    fetch('/api/data-tables/related-batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ lookups })
+    })
       .then(r => r.json())
       .then(data => {
-        if (data.success && data.row) {
-          Object.entries(rule.map || {}).forEach(([fieldId, col]) => {
-            if (data.row[col] !== undefined) {
-              const tgt = document.querySelector(`[name="${fieldId}"]`);
-              if (tgt) tgt.value = data.row[col];
-            }
-          });
-        }
+        if (!data.success) return;
+        batch.forEach(({ rule }, i) => fillFields(rule, data.rows[i]));
       })
       .catch(err => console.error('Case rule error', err));
   }
-});
+
+  function fillFields(rule, row) {
+    if (!row) return;
+    Object.entries(rule.map || {}).forEach(([fieldId, col]) => {
+      if (row[col] !== undefined) {
+        const tgt = document.querySelector(`[name="${fieldId}"]`);
+        if (tgt) tgt.value = row[col];
+      }
+    });
+  }
+});
\ No newline at end of file
@@ -21,7 +21,7 @@ function initializeEnhancedCaseForm() {
     const dependencies = JSON.parse(templateDataElement.dataset.dependencies || '[]');
     
     // Initialize data table lookups
-    initializeDataTableLookups();
+    initializeDataTableLookups(templateId);
     
     // Initialize field dependencies
     if (dependencies.length > 0) {
@@ -37,45 +37,44 @@ function initializeEnhancedCaseForm() {
     console.log('Enhanced Case Form initialized successfully');
 }
 
-function initializeDataTableLookups() {
-    const dataTableFields = document.querySelectorAll('.data-table-lookup');
+function initializeDataTableLookups(templateId) {
+    const dataTableFields = Array.from(document.querySelectorAll('.data-table-lookup'))
+        .filter(field => field.dataset.tableId);
+    if (dataTableFields.length === 0) return;
 
-    dataTableFields.forEach(field => {
-        const tableId = field.dataset.tableId;
-        const column = field.dataset.column || '';
-        const lookupType = field.dataset.lookupType || field.tagName.toLowerCase();
-        if (!tableId) return;
+    dataTableFields.forEach(field => field.classList.add('loading'));
 
-        loadDataTableOptions(field, tableId, column, lookupType);
-    });
-}
-
-function loadDataTableOptions(field, tableId, column, type) {
-    field.classList.add('loading');
-
-    fetch(`/enhanced/api/data-tables/${tableId}/search?q=&limit=100&column=${column}`)
+    // One request carries the options of every lookup; the browser revalidates it by ETag
+    fetch(`/enhanced/api/templates/${templateId}/form-bundle`)
         .then(response => response.json())
         .then(data => {
-            if (data.success && data.results) {
-                if (type === 'select') {
-                    populateSelectOptions(field, data.results);
-                    if (field.dataset.searchable === 'true') makeFieldSearchable(field);
-                } else if (type === 'radio' || type === 'checkbox') {
-                    populateChoiceOptions(field, data.results, type, field.dataset.fieldName);
-                } else if (type === 'input') {
-                    populateAutocomplete(field, data.results);
-                }
-            } else {
+            if (!data.success) {
                 console.error('Failed to load data table options:', data.message);
+                return;
             }
+            dataTableFields.forEach(field => {
+                const lookupType = field.dataset.lookupType || field.tagName.toLowerCase();
+                populateLookupField(field, data.options[field.dataset.tableId] || [], lookupType);
+            });
         })
         .catch(error => {
             console.error('Error loading data table options:', error);
         })
         .finally(() => {
-            field.classList.remove('loading');
+            dataTableFields.forEach(field => field.classList.remove('loading'));
         });
 }
+
+function populateLookupField(field, records, type) {
+    if (type === 'select') {
+        populateSelectOptions(field, records);
+        if (field.dataset.searchable === 'true') makeFieldSearchable(field);
+    } else if (type === 'radio' || type === 'checkbox') {
+        populateChoiceOptions(field, records, type, field.dataset.fieldName);
+    } else if (type === 'input') {
+        populateAutocomplete(field, records);
+    }
+}
 
 function populateSelectOptions(selectField, records) {
     // Clear existing options except the first one
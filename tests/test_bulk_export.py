@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import bulk_export
+import db_utils
+import enhanced_db_utils
+from database_init import MIGRATIONS
+from db_migrations import run_migrations
+from enhanced_database_init import ENHANCED_MIGRATIONS
+
+
+@contextmanager
+def counting_connection(conn, calls):
+    calls.append(1)
+    yield conn
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_custom_table_export_reads_in_chunks(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = connect(db_path)
+    calls = []
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: counting_connection(conn, calls))
+    monkeypatch.setattr(bulk_export, 'EXPORT_CHUNK_SIZE', 2)
+    db_utils.create_custom_table('parts', [{'name': 'sku', 'type': 'string'}])
+    for sku in ('A', 'B, "quoted"', 'C', 'D', 'E'):
+        db_utils.insert_custom_table_row('parts', {'sku': sku})
+
+    export, _ = bulk_export.open_custom_table_export('parts')
+    del calls[:]
+    data = b''.join(bulk_export.iter_export_bytes(*export, 'csv', compress=True))
+
+    parsed = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode())))
+    assert [row['sku'] for row in parsed] == ['A', 'B, "quoted"', 'C', 'D', 'E']
+    assert list(parsed[0]) == ['id', 'sku', 'created_at', 'updated_at', 'created_by']
+    assert len(calls) == 3
+
+    assert bulk_export.open_custom_table_export('missing') == (None, "Table not found")
+
+
+def test_data_table_export_as_ndjson(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'enhanced.db')
+    run_migrations(db_path, [m for m in ENHANCED_MIGRATIONS if m[0] in (1, 4)])
+    conn = connect(db_path)
+    monkeypatch.setattr(enhanced_db_utils, 'get_enhanced_db_connection', lambda: counting_connection(conn, []))
+    table_id, _ = enhanced_db_utils.create_data_table('parts', 'Parts', '', [
+        {'column_name': 'sku', 'display_name': 'SKU', 'data_type': 'text'},
+        {'column_name': 'qty', 'display_name': 'Qty', 'data_type': 'number'},
+    ])
+    enhanced_db_utils.add_data_table_record(table_id, {'sku': 'A1', 'qty': 2})
+    enhanced_db_utils.add_data_table_record(table_id, {'sku': 'B1', 'qty': 3})
+    conn.execute("UPDATE data_table_records SET is_active = 0 WHERE id = 2")
+
+    export, _ = bulk_export.open_data_table_export(table_id)
+    lines = b''.join(bulk_export.iter_export_bytes(*export, 'ndjson')).decode().splitlines()
+
+    records = [json.loads(line) for line in lines]
+    assert [(record['id'], record['sku'], record['qty']) for record in records] == [(1, 'A1', 2)]
+    assert export[0] == ['id', 'sku', 'qty', 'created_at', 'updated_at', 'created_by']
+
+
+def test_export_response_checks_format_and_compresses():
+    export = (['id', 'name'], iter([{'id': 1, 'name': 'a'}]))
+    assert bulk_export.export_response(export, 'parts', {'format': 'xml'}) == (None, "Unsupported format 'xml'")
+
+    response, _ = bulk_export.export_response(export, 'parts', {'format': 'ndjson', 'gzip': '1'})
+    assert response.mimetype == 'application/gzip'
+    assert 'parts.ndjson.gz' in response.headers['Content-Disposition']
+    assert json.loads(gzip.decompress(b''.join(response.response))) == {'id': 1, 'name': 'a'}
@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import bulk_import
+import db_utils
+import enhanced_db_utils
+from database_init import MIGRATIONS
+from db_migrations import run_migrations
+from enhanced_database_init import ENHANCED_MIGRATIONS
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@contextmanager
+def shared_connection(conn):
+    yield conn
+
+
+def setup_custom_table(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = connect(db_path)
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: shared_connection(conn))
+    ok, message = db_utils.create_custom_table('parts', [
+        {'name': 'sku', 'type': 'string', 'required': True, 'unique': True},
+        {'name': 'price', 'type': 'decimal'},
+        {'name': 'stock', 'type': 'integer'},
+    ], 'Parts')
+    assert ok, message
+    return conn
+
+
+def test_csv_import_reports_bad_rows_and_keeps_going(monkeypatch, tmp_path):
+    conn = setup_custom_table(monkeypatch, tmp_path)
+    data = io.StringIO(
+        "sku,price,stock,colour\n"
+        "A1,1.5,3,red\n"
+        "A2,abc,1,blue\n"
+        ",2,2,green\n"
+        "A1,9,9,red\n"
+        "A3,4,,red\n"
+    )
+
+    report, message = bulk_import.import_custom_table('parts', data, 'csv', batch_size=2)
+
+    assert report['processed'] == 5
+    assert report['inserted'] == 2
+    assert [error['line'] for error in report['errors']] == [3, 4, 5]
+    assert 'UNIQUE' in report['errors'][2]['error']
+    assert report['ignored_columns'] == ['colour']
+    rows = conn.execute("SELECT sku, price, stock FROM custom_parts ORDER BY sku").fetchall()
+    assert [tuple(row) for row in rows] == [('A1', 1.5, 3), ('A3', 4.0, None)]
+
+
+def test_csv_upsert_updates_only_columns_in_the_file(monkeypatch, tmp_path):
+    conn = setup_custom_table(monkeypatch, tmp_path)
+    bulk_import.import_custom_table('parts', io.StringIO("sku,price,stock\nA1,1,5\nA2,2,6\n"))
+
+    report, _ = bulk_import.import_custom_table(
+        'parts', io.StringIO("sku,price\nA2,20\nA3,30\n"), upsert=True)
+
+    assert (report['inserted'], report['updated'], report['failed']) == (1, 1, 0)
+    rows = conn.execute("SELECT sku, price, stock FROM custom_parts ORDER BY sku").fetchall()
+    assert [tuple(row) for row in rows] == [('A1', 1.0, 5), ('A2', 20.0, 6), ('A3', 30.0, None)]
+
+
+def test_upsert_checks_required_columns_like_insert(monkeypatch, tmp_path):
+    conn = setup_custom_table(monkeypatch, tmp_path)
+    ok, message = db_utils.create_custom_table('bins', [
+        {'name': 'code', 'type': 'string', 'unique': True},
+        {'name': 'aisle', 'type': 'string', 'required': True},
+    ], 'Bins')
+    assert ok, message
+
+    report, message = bulk_import.import_custom_table('bins', io.StringIO("code\nB1\n"), upsert=True)
+    assert report is None and message == "Missing required column(s): aisle"
+
+    report, _ = bulk_import.import_custom_table('bins', io.StringIO("code,aisle\nB1,\nB2,4\n"), upsert=True)
+    assert (report['inserted'], report['updated'], report['failed']) == (1, 0, 1)
+    assert conn.execute("SELECT COUNT(*) FROM custom_bins").fetchone()[0] == 1
+
+
+def test_ndjson_upsert_into_data_table(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'enhanced.db')
+    run_migrations(db_path, [m for m in ENHANCED_MIGRATIONS if m[0] in (1, 4)])
+    conn = connect(db_path)
+    monkeypatch.setattr(enhanced_db_utils, 'get_enhanced_db_connection', lambda: shared_connection(conn))
+    table_id, _ = enhanced_db_utils.create_data_table('parts', 'Parts', '', [
+        {'column_name': 'sku', 'display_name': 'SKU', 'data_type': 'text', 'is_key_field': 1},
+        {'column_name': 'qty', 'display_name': 'Qty', 'data_type': 'number'},
+        {'column_name': 'active', 'display_name': 'Active', 'data_type': 'boolean'},
+    ])
+    enhanced_db_utils.add_data_table_record(table_id, {'sku': 'A1', 'qty': 1, 'active': True})
+
+    data = io.StringIO(
+        '{"sku": "A1", "qty": "7"}\n'
+        '{"sku": "B1", "qty": 2, "active": "no"}\n'
+        'not json\n'
+        '\n'
+        '{"sku": "B1", "qty": 3}\n'
+        '{"sku": "C1", "qty": "x"}\n'
+    )
+    report, _ = bulk_import.import_data_table(table_id, data, 'ndjson', upsert=True)
+
+    assert (report['inserted'], report['updated'], report['failed']) == (1, 1, 2)
+    assert [error['line'] for error in report['errors']] == [3, 6]
+    rows = conn.execute("SELECT record_data FROM data_table_records ORDER BY id").fetchall()
+    records = [json.loads(row['record_data']) for row in rows]
+    assert records == [{'sku': 'A1', 'qty': 7, 'active': True}, {'sku': 'B1', 'qty': 3, 'active': False}]
@@ -0,0 +1,46 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from chat_feed import ChatFeed
+
+
+def test_publish_assigns_ids_and_since_returns_delta():
+    feed = ChatFeed()
+    feed.load([{'text': 'old'}])
+
+    message = feed.publish({'text': 'new'})
+    assert message['id'] == 2
+    assert [m['text'] for m in feed.since(0)] == ['old', 'new']
+    assert [m['text'] for m in feed.since(1)] == ['new']
+    assert feed.since(2) == []
+
+
+def test_wait_for_wakes_on_publish():
+    feed = ChatFeed()
+    assert feed.wait_for(0, timeout=0.01) == []
+
+    timer = threading.Timer(0.05, feed.publish, args=({'text': 'hi'},))
+    timer.start()
+    messages = feed.wait_for(0, timeout=5)
+    timer.join()
+    assert [m['id'] for m in messages] == [1]
+
+
+def test_ring_buffer_is_bounded_and_logged(tmp_path):
+    log_path = tmp_path / 'chat_log.jsonl'
+    feed = ChatFeed(capacity=3, log_path=str(log_path), first_id=100)
+    for i in range(5):
+        feed.publish({'text': str(i)})
+
+    assert [m['id'] for m in feed.recent()] == [102, 103, 104]
+    assert [m['text'] for m in feed.since(102)] == ['3', '4']
+    assert feed.is_stale(100)
+    assert not feed.is_stale(101)
+    assert feed.is_stale(105)
+    assert len(log_path.read_text(encoding='utf-8').splitlines()) == 5
+
+    restored = ChatFeed(capacity=3, log_path=str(log_path))
+    assert [m['text'] for m in restored.restore()] == ['2', '3', '4']
+    assert restored.last_id == 104
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import client_queue
+import db_utils
+from database_init import MIGRATIONS
+from db_migrations import run_migrations
+
+
+def setup_queue(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+
+    @contextmanager
+    def connection():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(db_utils, 'get_db_connection', connection)
+    return db_path
+
+
+def test_claims_are_exclusive_until_the_visibility_timeout(monkeypatch, tmp_path):
+    setup_queue(monkeypatch, tmp_path)
+    first, _ = client_queue.enqueue('alice', {'type': 'command', 'command': 'cmd|a'})
+    second, _ = client_queue.enqueue('alice', {'type': 'command', 'command': 'cmd|b'})
+    client_queue.enqueue('bob', {'type': 'command', 'command': 'cmd|c'})
+
+    claimed = client_queue.claim('alice', visibility_timeout=0)
+    assert [(c['id'], c['command'], c['attempts']) for c in claimed] == [(first, 'cmd|a', 1), (second, 'cmd|b', 1)]
+
+    assert client_queue.ack('alice', [first]) == 1
+    assert client_queue.ack('bob', [second]) == 0
+
+    # Not acknowledged before the (zero) visibility timeout: delivered again, once
+    assert [(c['id'], c['attempts']) for c in client_queue.claim('alice')] == [(second, 2)]
+    assert client_queue.claim('alice') == []
+    assert client_queue.pending_count('alice') == 1
+
+
+def test_unacked_commands_fail_and_expired_ones_are_collected(monkeypatch, tmp_path):
+    db_path = setup_queue(monkeypatch, tmp_path)
+    retried, _ = client_queue.enqueue('alice', {'command': 'cmd|a'}, max_attempts=1)
+    client_queue.enqueue('alice', {'command': 'cmd|b'}, ttl=0)
+    assert [c['id'] for c in client_queue.claim('alice', visibility_timeout=0)] == [retried]
+    assert client_queue.claim('alice') == []
+
+    assert client_queue.collect_garbage() == 1
+    assert client_queue.queue_stats() == {'failed': 1}
+    assert client_queue.collect_garbage(now=client_queue.time.time() + client_queue.DONE_RETENTION + 1) == 1
+    assert sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM client_service_queue").fetchone()[0] == 0
+
+
+def test_long_poll_wakes_up_when_a_command_is_queued(monkeypatch, tmp_path):
+    setup_queue(monkeypatch, tmp_path)
+    assert client_queue.wait_and_claim('alice', timeout=0.05) == []
+
+    timer = threading.Timer(0.1, client_queue.enqueue, ('alice', {'command': 'cmd|a'}))
+    timer.start()
+    started = time.monotonic()
+    claimed = client_queue.wait_and_claim('alice', timeout=10)
+    timer.join()
+    assert [c['command'] for c in claimed] == ['cmd|a']
+    assert time.monotonic() - started < client_queue.LONG_POLL_RECHECK
+
+
+def test_claim_many_and_bulk_ack(monkeypatch, tmp_path):
+    db_path = setup_queue(monkeypatch, tmp_path)
+    ids = [client_queue.enqueue('alice', {'command': f'cmd|{n}'})[0] for n in range(5)]
+
+    first = client_queue.claim('alice', limit=3)
+    second = client_queue.claim('alice', limit=3)
+    assert [c['id'] for c in first] == ids[:3] and [c['id'] for c in second] == ids[3:]
+
+    acked = client_queue.ack_many('alice', [(ids[0], 'done', {'exit': 0}), (ids[1], 'failed', 'not found'),
+                                            (ids[0], 'done', None), (999, 'done', None)])
+    assert acked == [True, True, False, False]
+    statuses = dict(sqlite3.connect(db_path).execute("SELECT id, status FROM client_service_queue").fetchall())
+    assert [statuses[i] for i in ids] == ['done', 'failed', 'claimed', 'claimed', 'claimed']
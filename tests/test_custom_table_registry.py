@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import db_utils
+from database_init import MIGRATIONS
+from db_migrations import run_migrations
+
+
+@contextmanager
+def counting_connection(conn, calls):
+    calls.append(1)
+    yield conn
+
+
+def test_migration_converts_legacy_schemas_and_counts_rows(tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, [m for m in MIGRATIONS if m[0] < 5])
+    conn = sqlite3.connect(db_path)
+    legacy = [{'name': 'sku', 'type': 'string', 'required': True, 'unique': False}]
+    conn.execute("INSERT INTO custom_tables_metadata (table_name, display_name, columns_json) VALUES (?, ?, ?)",
+                 ('parts', 'Parts', str(legacy)))
+    conn.execute("CREATE TABLE custom_parts (id INTEGER PRIMARY KEY, sku TEXT, created_at TEXT)")
+    conn.executemany("INSERT INTO custom_parts (sku) VALUES (?)", [('a',), ('b',)])
+    conn.commit()
+
+    run_migrations(db_path, MIGRATIONS)
+
+    columns_json, row_count = conn.execute(
+        "SELECT columns_json, row_count FROM custom_tables_metadata WHERE table_name = 'parts'").fetchone()
+    assert json.loads(columns_json) == legacy
+    assert row_count == 2
+    conn.execute("INSERT INTO custom_parts (sku) VALUES ('c')")
+    conn.execute("DELETE FROM custom_parts WHERE sku = 'a'")
+    assert conn.execute("SELECT row_count, data_version FROM custom_tables_metadata").fetchone() == (2, 2)
+    conn.execute("UPDATE custom_parts SET sku = 'd' WHERE sku = 'b'")
+    assert conn.execute("SELECT row_count, data_version FROM custom_tables_metadata").fetchone() == (2, 3)
+
+
+def test_triggers_refuse_names_that_are_not_identifiers(tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    with pytest.raises(ValueError):
+        db_utils.ensure_custom_table_triggers(conn.cursor(), "x'; DROP TABLE users; --")
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_custom_%'").fetchone()[0] == 0
+
+
+def test_listing_is_one_query_and_schemas_are_cached(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    calls = []
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: counting_connection(conn, calls))
+    db_utils.invalidate_custom_schema()
+
+    for name in ('parts', 'vendors'):
+        ok, message = db_utils.create_custom_table(name, [{'name': 'code', 'type': 'string'}])
+        assert ok, message
+    db_utils.insert_custom_table_row('parts', {'code': 'A1'})
+    del calls[:]
+
+    tables = {table['table_name']: table for table in db_utils.get_custom_tables()}
+    assert len(calls) == 1
+    assert tables['parts']['row_count'] == 1 and tables['vendors']['row_count'] == 0
+    assert tables['parts']['columns'] == ({'name': 'code', 'type': 'string'},)
+
+    assert db_utils.get_custom_table_schema('vendors') is tables['vendors']['columns']
+    assert len(calls) == 1
+
+
+def test_related_lookups_are_memoized_until_the_table_changes(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    calls = []
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: counting_connection(conn, calls))
+    db_utils.invalidate_custom_schema()
+    db_utils.RELATED_ROW_CACHE.invalidate()
+    db_utils.create_custom_table('customers', [{'name': 'number', 'type': 'string'},
+                                               {'name': 'name', 'type': 'string'}])
+    db_utils.insert_custom_table_row('customers', {'number': 'C1', 'name': 'Acme'})
+    del calls[:]
+    before = db_utils.RELATED_ROW_CACHE.stats()
+
+    lookup = lambda: db_utils.get_custom_table_related_data('custom_customers', 'number', 'C1', ['name', 'bogus'])
+    assert lookup() == {'name': 'Acme'}
+    assert lookup() == {'name': 'Acme'}
+    assert db_utils.get_custom_table_related_data('custom_customers', 'number', 'C2', []) is None
+    assert db_utils.get_custom_table_related_data('custom_customers', 'number', 'C2', []) is None
+    assert len(calls) == 2
+    assert db_utils.get_custom_table_related_data('users', 'username', 'admin', []) is None
+
+    db_utils.insert_custom_table_row('customers', {'number': 'C2', 'name': 'Globex'})
+    row = db_utils.get_custom_table_related_data('custom_customers', 'number', 'C2', [])
+    assert row['name'] == 'Globex' and list(row)[0] == 'id'
+    stats = db_utils.RELATED_ROW_CACHE.stats()
+    assert (stats['hits'] - before['hits'], stats['misses'] - before['misses']) == (2, 3)
+
+
+def test_related_batch_groups_lookups_into_one_query_per_column(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    calls = []
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: counting_connection(conn, calls))
+    db_utils.invalidate_custom_schema()
+    db_utils.RELATED_ROW_CACHE.invalidate()
+    db_utils.create_custom_table('customers', [{'name': 'number', 'type': 'string'},
+                                               {'name': 'name', 'type': 'string'},
+                                               {'name': 'city', 'type': 'string'}])
+    for number, name, city in (('C1', 'Acme', 'Oslo'), ('C2', 'Globex', 'Rome')):
+        db_utils.insert_custom_table_row('customers', {'number': number, 'name': name, 'city': city})
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    rows = db_utils.get_custom_table_related_batch([
+        {'table': 'customers', 'column': 'number', 'value': 'C2', 'return': ['name']},
+        {'table': 'customers', 'column': 'number', 'value': 'C1', 'return': ['city']},
+        {'table': 'customers', 'column': 'number', 'value': 'C9', 'return': ['name']},
+        {'table': 'customers', 'column': 'bogus', 'value': 'C1'},
+        {'table': 'missing', 'column': 'number', 'value': 'C1'},
+    ])
+    assert rows == [{'name': 'Globex'}, {'city': 'Oslo'}, None, None, None]
+    assert len([sql for sql in statements if 'IN (' in sql]) == 1
+
+    del statements[:]
+    assert db_utils.get_custom_table_related_data('custom_customers', 'number', 'C1', ['city']) == {'city': 'Oslo'}
+    assert statements == []
+
+    assert db_utils.get_custom_table_related_batch([
+        {'table': 'customers', 'column': 'number', 'value': ['C1']},
+        {'table': 'customers', 'column': 'number', 'value': {'C1': 1}},
+        {'table': 'customers', 'column': ['number'], 'value': 'C1'},
+        {'table': 'customers', 'column': 'number', 'value': 'C1', 'return': 'name'},
+        {'table': 'customers', 'column': 'number', 'value': 'C1', 'return': ['name']},
+    ]) == [None, None, None, None, {'name': 'Acme'}]
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from db_migrations import run_migrations
+
+
+def test_migrations_apply_once_in_order(tmp_path):
+    db_path = str(tmp_path / 'test.db')
+    calls = []
+
+    def create(cursor):
+        calls.append(1)
+        cursor.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, created_at TEXT)")
+
+    def index(cursor):
+        calls.append(2)
+        cursor.execute("CREATE INDEX idx_items_created ON items(created_at)")
+
+    migrations = [(2, 'Index', index), (1, 'Create', create)]
+    assert run_migrations(db_path, migrations) == [1, 2]
+    assert run_migrations(db_path, migrations) == []
+    assert calls == [1, 2]
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    db_path = str(tmp_path / 'test.db')
+
+    def broken(cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_migrations(db_path, [(1, 'Broken', broken)])
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == 0
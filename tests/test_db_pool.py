@@ -0,0 +1,43 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from db_pool import ConnectionPool
+
+
+def test_connections_are_reused_and_tuned(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'test.db'), size=2)
+
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+    with pool.connection() as conn:
+        assert conn is first
+        conn.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+    stats = pool.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 2
+
+
+def test_exhausted_pool_waits_then_overflows(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'test.db'), size=1, timeout=0.01)
+    held = pool.acquire()
+
+    extra = pool.acquire()
+    assert extra is not held
+    pool.release(extra)
+    assert pool.stats()['overflows'] == 1
+    assert pool.stats()['open'] == 1
+
+    threading.Timer(0.01, pool.release, args=(held,)).start()
+    pool.timeout = 5
+    assert pool.acquire() is held
+    assert pool.stats()['waits'] == 2
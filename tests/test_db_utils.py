@@ -83,3 +83,46 @@ def test_case_crud(monkeypatch):
 
     db_utils.delete_case(cid)
     assert db_utils.get_case(cid) is None
+
+
+def test_case_search_filters_and_pages_in_sql(monkeypatch):
+    conn = setup_memory_db()
+    conn.execute("CREATE VIRTUAL TABLE cases_fts USING fts5(field_values)")
+    patch_db(monkeypatch, conn)
+
+    t1, _ = db_utils.create_case_template('T3', '', [{'id': 'a', 'name': 'A', 'type': 'text'}])
+    t2, _ = db_utils.create_case_template('T4', '', [{'id': 'a', 'name': 'A', 'type': 'text'}])
+    ids = [db_utils.create_case(t1, {'a': f'Brake pad {n}'})[0] for n in range(3)]
+    other, _ = db_utils.create_case(t2, {'a': 'Brake drum'})
+    db_utils.update_case(ids[0], {'a': 'Clutch'}, status='closed')
+
+    page, cursor = db_utils.search_cases('brake', limit=2)
+    rest, last = db_utils.search_cases('brake', limit=2, cursor=cursor)
+    assert sorted(c['id'] for c in page + rest) == sorted(ids[1:] + [other]) and last is None
+    assert [c['id'] for c in db_utils.search_cases('bra', template_id=t2)[0]] == [other]
+    assert [c['id'] for c in db_utils.search_cases('', status='closed')[0]] == [ids[0]]
+    assert db_utils.get_case_statuses() == ['closed', 'open']
+    assert db_utils.search_cases('a')[0] == []
+
+    db_utils.delete_case(other)
+    assert conn.execute("SELECT COUNT(*) FROM cases_fts").fetchone()[0] == 3
+
+
+def test_external_feature_checks_are_cached_until_toggled(monkeypatch):
+    conn = setup_memory_db()
+    conn.execute("CREATE TABLE users (username TEXT PRIMARY KEY, external_features INTEGER DEFAULT 0, updated_at TEXT)")
+    conn.execute("INSERT INTO users (username) VALUES ('alice')")
+    statements = []
+    conn.set_trace_callback(statements.append)
+    patch_db(monkeypatch, conn)
+    db_utils.PERMISSION_CACHE.invalidate()
+
+    assert db_utils.user_has_external_features('alice') is False
+    assert db_utils.user_has_external_features('alice') is False
+    assert db_utils.user_has_external_features('nobody') is False
+    assert len([sql for sql in statements if sql.startswith('SELECT external_features')]) == 2
+
+    db_utils.toggle_user_external_features('alice')
+    assert db_utils.user_has_external_features('alice') is True
+    db_utils.update_user_profile('alice', {'external_features': 0})
+    assert db_utils.user_has_external_features('alice') is False
@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from dependency_rules import compile_condition, compile_dependency_rules
+
+
+def dep(parent, condition_type, condition_value, action_type, action_config='{}'):
+    return {'parent_field_name': parent, 'condition_type': condition_type,
+            'condition_value': condition_value, 'action_type': action_type,
+            'action_config': action_config}
+
+
+def test_conditions():
+    assert compile_condition('greater_than', '10')('10.5')
+    assert not compile_condition('greater_than', '10')('abc')
+    assert compile_condition('less_than', '3')(2)
+    assert compile_condition('in_list', 'a,b')('b')
+    assert compile_condition('not_in_list', 'a,b')('c')
+    assert compile_condition('is_not_empty', None)('x') is True
+    assert not compile_condition('unknown', None)('x')
+
+
+def test_set_value_chains_run_in_dependency_order():
+    # Displayed first, but depends on 'middle', which depends on 'source'
+    fields = [
+        {'id': 1, 'field_id': 'last', 'field_name': 'Last'},
+        {'id': 2, 'field_id': 'middle', 'field_name': 'Middle'},
+        {'id': 3, 'field_id': 'source', 'field_name': 'Source'},
+    ]
+    dependencies = {
+        1: [dep('middle', 'equals', 'set', 'require')],
+        2: [dep('source', 'greater_than', '5', 'set_value', '{"value": "set"}'),
+            dep('source', 'equals', 'x', 'hide')],
+        3: [],
+    }
+    plan = compile_dependency_rules(fields, dependencies)
+    assert [step[0] for step in plan.steps] == ['middle', 'last']
+
+    case_data = {'source': '7'}
+    assert plan.apply(case_data) == ["Field 'Last' is required"]
+    assert case_data['middle'] == 'set'
+    assert plan.apply({'source': '2'}) == []
+
+
+def test_cycles_fall_back_to_display_order():
+    fields = [
+        {'id': 1, 'field_id': 'a', 'field_name': 'A'},
+        {'id': 2, 'field_id': 'b', 'field_name': 'B'},
+    ]
+    dependencies = {
+        1: [dep('b', 'is_empty', None, 'require')],
+        2: [dep('a', 'is_empty', None, 'require')],
+    }
+    plan = compile_dependency_rules(fields, dependencies)
+    assert plan.has_cycle
+    assert [step[0] for step in plan.steps] == ['a', 'b']
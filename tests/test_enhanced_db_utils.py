@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import enhanced_db_utils
+from db_migrations import run_migrations
+from enhanced_database_init import ENHANCED_MIGRATIONS
+
+
+def setup_enhanced_db(tmp_path):
+    db_path = str(tmp_path / 'enhanced.db')
+    # Schema only; skip the sample data migrations
+    run_migrations(db_path, [m for m in ENHANCED_MIGRATIONS if m[0] in (1, 4, 6, 7)])
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+@contextmanager
+def counting_connection(conn, calls):
+    calls.append(1)
+    yield conn
+
+
+def patch_db(monkeypatch, conn):
+    calls = []
+    monkeypatch.setattr(enhanced_db_utils, 'get_enhanced_db_connection', lambda: counting_connection(conn, calls))
+    enhanced_db_utils.invalidate_template_cache()
+    return calls
+
+
+SAMPLE_FIELDS = [
+    {'field_id': 'kind', 'field_name': 'Kind', 'field_type': 'select', 'is_required': 1},
+    {'field_id': 'detail', 'field_name': 'Detail', 'field_type': 'text',
+     'dependencies': [{'parent_field_id': 'kind', 'condition_type': 'equals',
+                       'condition_value': 'b', 'action_type': 'require'}]},
+]
+
+
+def test_template_is_loaded_once_and_cached(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    calls = patch_db(monkeypatch, conn)
+
+    template_id, _ = enhanced_db_utils.create_enhanced_template('T', '', 'General', SAMPLE_FIELDS)
+    del calls[:]
+    loads = []
+    conn.set_trace_callback(lambda sql: loads.append(sql) if 'FROM template_fields tf' in sql else None)
+
+    template, _ = enhanced_db_utils.get_template_with_fields(template_id)
+    again, _ = enhanced_db_utils.get_template_with_fields(template_id)
+    assert again is template
+    assert len(loads) == 1 and len(calls) == 1
+
+    detail = template['fields'][1]
+    deps = template['dependencies'][detail['id']]
+    assert [dep['parent_field_name'] for dep in deps] == ['kind']
+    assert template['dependencies'][template['fields'][0]['id']] == ()
+
+    is_valid, errors = enhanced_db_utils.validate_field_dependencies(template_id, {'kind': 'b'})
+    assert not is_valid and len(loads) == 1
+
+    enhanced_db_utils.invalidate_template_cache(template_id)
+    enhanced_db_utils.get_template_with_fields(template_id)
+    assert len(loads) == 2
+
+
+def test_template_edits_from_other_processes_are_seen(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    calls = patch_db(monkeypatch, conn)
+    template_id, _ = enhanced_db_utils.create_enhanced_template('T', '', 'General', SAMPLE_FIELDS)
+    template, _ = enhanced_db_utils.get_template_with_fields(template_id)
+    assert not enhanced_db_utils.validate_field_dependencies(template_id, {'kind': 'b'})[0]
+
+    # Written behind the cache's back, as another worker or a script would
+    conn.execute("UPDATE template_fields SET field_name = 'Type' WHERE field_id = 'kind'")
+    conn.execute("DELETE FROM field_dependencies")
+    conn.commit()
+    del calls[:]
+    assert enhanced_db_utils.get_template_with_fields(template_id)[0] is template
+    assert not calls
+
+    # Once the TTL is up the version check finds the edit
+    monkeypatch.setattr(enhanced_db_utils, 'TEMPLATE_CACHE_TTL', 0)
+    edited, _ = enhanced_db_utils.get_template_with_fields(template_id)
+    assert edited is not template and edited['fields'][0]['field_name'] == 'Type'
+    assert enhanced_db_utils.validate_field_dependencies(template_id, {'kind': 'b'})[0]
+
+
+def test_validate_many_uses_one_plan(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    calls = patch_db(monkeypatch, conn)
+
+    template_id, _ = enhanced_db_utils.create_enhanced_template('T', '', 'General', SAMPLE_FIELDS)
+    del calls[:]
+
+    results, _ = enhanced_db_utils.validate_many(template_id, [
+        {'kind': 'a'}, {'kind': 'b'}, {'kind': 'b', 'detail': 'given'}
+    ])
+    assert [result['is_valid'] for result in results] == [True, False, True]
+    assert len(calls) == 1
+
+
+def test_search_modes_match_values_only(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    patch_db(monkeypatch, conn)
+
+    table_id, _ = enhanced_db_utils.create_data_table('parts', 'Parts', '', [
+        {'column_name': 'sku', 'display_name': 'SKU', 'data_type': 'text', 'is_key_field': 1},
+        {'column_name': 'name', 'display_name': 'Name', 'data_type': 'text', 'is_display_field': 1},
+        {'column_name': 'note', 'display_name': 'Note', 'data_type': 'text', 'is_searchable': 0},
+    ])
+    for sku, name in [('AB-1', 'Bolt'), ('AB-2', 'Nut'), ('CD-1', 'Abacus')]:
+        enhanced_db_utils.add_data_table_record(table_id, {'sku': sku, 'name': name, 'note': 'ab'})
+
+    def skus(term, mode, **kwargs):
+        results, _ = enhanced_db_utils.search_data_table(table_id, term, limit=10, mode=mode, **kwargs)
+        return sorted(result['data']['sku'] for result in results)
+
+    assert skus('ab', 'prefix') == ['AB-1', 'AB-2', 'CD-1']
+    assert skus('ab', 'prefix', column='sku') == ['AB-1', 'AB-2']
+    assert skus('ab-2', 'exact') == ['AB-2']
+    assert skus('sku', 'contains') == []
+    assert skus('-1', 'contains') == ['AB-1', 'CD-1']
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM data_table_records WHERE table_id = ? AND is_active = 1 "
+        "AND json_extract(record_data, '$.sku') COLLATE NOCASE = 'x'".replace('?', str(table_id))
+    ).fetchall()
+    assert 'idx_data_table_search_' in plan[0][3]
+
+
+def test_prefix_search_bounds_and_non_text_columns(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    patch_db(monkeypatch, conn)
+
+    table_id, _ = enhanced_db_utils.create_data_table('contacts', 'Contacts', '', [
+        {'column_name': 'email', 'display_name': 'Email', 'data_type': 'text', 'is_display_field': 1},
+        {'column_name': 'qty', 'display_name': 'Qty', 'data_type': 'number'},
+    ])
+    for email, qty in [('john@example.com', 12), ('JOHN@x.org', 125), ('john_smith', 3),
+                       ('johnathan', 1), ('a[1]', 0), ('a\\b', 0), ('ab', 0)]:
+        enhanced_db_utils.add_data_table_record(table_id, {'email': email, 'qty': qty})
+
+    def emails(term, column):
+        results, _ = enhanced_db_utils.search_data_table(table_id, term, limit=10, mode='prefix', column=column)
+        return sorted(result['data']['email'] for result in results)
+
+    assert emails('john@', 'email') == ['JOHN@x.org', 'john@example.com']
+    assert emails('a[', 'email') == ['a[1]']
+    assert emails('12', 'qty') == ['JOHN@x.org', 'john@example.com']
+
+
+def test_form_bundle_is_cached_until_its_data_table_changes(monkeypatch, tmp_path):
+    conn = setup_enhanced_db(tmp_path)
+    calls = patch_db(monkeypatch, conn)
+
+    table_id, _ = enhanced_db_utils.create_data_table('parts', 'Parts', '', [
+        {'column_name': 'sku', 'display_name': 'SKU', 'data_type': 'text', 'is_key_field': 1, 'is_display_field': 1},
+    ])
+    enhanced_db_utils.add_data_table_record(table_id, {'sku': 'AB-1'})
+    template_id, _ = enhanced_db_utils.create_enhanced_template('T', '', 'General', [
+        {'field_id': 'part', 'field_name': 'Part', 'field_type': 'select', 'data_table_id': table_id},
+    ])
+    del calls[:]
+
+    (etag, body), _ = enhanced_db_utils.get_form_bundle(template_id)
+    assert json.loads(body)['options'][str(table_id)][0]['label'] == 'AB-1'
+    assert enhanced_db_utils.get_form_bundle(template_id)[0] == (etag, body)
+    # Template, versions and options; then only the data table version check
+    assert len(calls) == 4
+
+    enhanced_db_utils.add_data_table_record(table_id, {'sku': 'AB-2'})
+    (new_etag, body), _ = enhanced_db_utils.get_form_bundle(template_id)
+    assert new_etag != etag and len(json.loads(body)['options'][str(table_id)]) == 2
+
+    # A record written by another process never calls invalidate_form_bundles()
+    conn.execute("INSERT INTO data_table_records (table_id, record_data) VALUES (?, ?)",
+                 (table_id, json.dumps({'sku': 'AB-3'})))
+    conn.commit()
+    (newest_etag, body), _ = enhanced_db_utils.get_form_bundle(template_id)
+    assert newest_etag != new_etag and len(json.loads(body)['options'][str(table_id)]) == 3
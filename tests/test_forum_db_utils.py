@@ -0,0 +1,172 @@
+import sqlite3
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import forum_db_utils
+from database_init import _create_forum_change_counter
+
+
+def setup_memory_db():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript('''
+        CREATE TABLE forum_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT,
+            author TEXT,
+            category TEXT DEFAULT 'General',
+            attachments_json TEXT DEFAULT '[]',
+            embedded_json TEXT DEFAULT '[]',
+            locked INTEGER DEFAULT 0,
+            created TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE forum_post_tags (
+            post_id INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            position INTEGER DEFAULT 0,
+            PRIMARY KEY (post_id, tag)
+        );
+        CREATE TABLE forum_comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            comment_id TEXT NOT NULL,
+            name TEXT,
+            text TEXT,
+            created TEXT
+        );
+        CREATE TABLE forum_annotations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            annotation_id TEXT NOT NULL,
+            type TEXT DEFAULT 'highlight',
+            data TEXT,
+            position_json TEXT,
+            color TEXT,
+            author TEXT,
+            created TEXT
+        );
+        CREATE TABLE forum_import_log (
+            source TEXT PRIMARY KEY,
+            post_count INTEGER,
+            imported_at TEXT
+        );
+        CREATE VIRTUAL TABLE forum_posts_fts USING fts5(
+            title, body, tags, comments, prefix = '2 3'
+        );
+    ''')
+    _create_forum_change_counter(conn.cursor())
+    return conn
+
+
+@contextmanager
+def memory_connection(conn):
+    try:
+        yield conn
+    finally:
+        pass
+
+
+def patch_db(monkeypatch, conn):
+    monkeypatch.setattr(forum_db_utils, 'get_db_connection', lambda: memory_connection(conn))
+
+
+def test_import_posts_from_json_runs_once(monkeypatch, tmp_path):
+    conn = setup_memory_db()
+    patch_db(monkeypatch, conn)
+
+    posts_path = tmp_path / 'posts.json'
+    posts_path.write_text(json.dumps([
+        {'title': 'Newer', 'content': 'b', 'category': 'General', 'created': '2025-07-02 10:00',
+         'tags': ['x'], 'comments': [{'name': 'A', 'text': 'hi'}]},
+        {'title': 'Older', 'content': 'a', 'category': 'Ontrak', 'created': '2025-07-01 10:00',
+         'tags': [], 'annotations': [{'id': 'n1', 'type': 'note', 'data': 'd'}]},
+    ]), encoding='utf-8')
+
+    count, _ = forum_db_utils.import_posts_from_json(str(posts_path))
+    assert count == 2
+    assert forum_db_utils.import_posts_from_json(str(posts_path))[0] == 0
+
+    older = forum_db_utils.get_forum_post(1)
+    newer = forum_db_utils.get_forum_post(2, include_comments=True)
+    assert older['title'] == 'Older'
+    assert newer['tags'] == ['x']
+    assert newer['comments'][0]['id']
+    assert forum_db_utils.get_forum_annotations(1)[0]['id'] == 'n1'
+
+
+def test_post_ids_are_stable(monkeypatch):
+    conn = setup_memory_db()
+    patch_db(monkeypatch, conn)
+
+    first_id, _ = forum_db_utils.create_forum_post('First', 'a', 'General', tags=['one'])
+    second_id, _ = forum_db_utils.create_forum_post('Second', 'b', 'General')
+
+    assert forum_db_utils.add_forum_post_tag(first_id, 'two') == ['one', 'two']
+    assert forum_db_utils.add_forum_post_tag(first_id, 'two') is None
+
+    forum_db_utils.delete_forum_post(first_id)
+    assert forum_db_utils.get_forum_post(first_id) is None
+    assert forum_db_utils.get_forum_post(second_id)['title'] == 'Second'
+
+
+def test_search_is_ranked_and_incremental(monkeypatch):
+    conn = setup_memory_db()
+    patch_db(monkeypatch, conn)
+
+    body_id, _ = forum_db_utils.create_forum_post('Setup', '<p>Install the <b>indicator</b> driver</p>', 'General')
+    title_id, _ = forum_db_utils.create_forum_post('Indicator settings', '<p>Other text</p>', 'General')
+
+    hits = forum_db_utils.search_forum_posts('indic')
+    assert [hit['id'] for hit in hits] == [title_id, body_id]
+    assert '<mark>Indicator</mark>' in hits[0]['snippet']
+    assert '<b>' not in hits[1]['snippet']
+
+    forum_db_utils.add_forum_comment(body_id, 'Tech', 'remember the firmware')
+    assert [hit['id'] for hit in forum_db_utils.search_forum_posts('firmware')] == [body_id]
+
+    forum_db_utils.delete_forum_post(title_id)
+    assert [hit['id'] for hit in forum_db_utils.search_forum_posts('indicator')] == [body_id]
+
+
+def test_posting_lists_filter_and_order():
+    posts = [
+        {'id': 1, 'category': 'General', 'created': '2025-01-01 10:00', 'title': 'b'},
+        {'id': 2, 'category': 'Ontrak', 'created': '2025-01-02 10:00', 'title': 'a'},
+        {'id': 3, 'category': 'General', 'created': '2025-01-03 10:00', 'title': 'c'},
+    ]
+    post_tags = [(1, 'x'), (2, 'x'), (3, 'x'), (3, 'y'), (1, 'y')]
+    lists = forum_db_utils.ForumPostingLists(posts, post_tags)
+
+    assert lists.select('newest') == [3, 2, 1]
+    assert lists.select('title') == [2, 1, 3]
+    assert lists.select('oldest', category='General') == [1, 3]
+    assert lists.select('newest', tags=['x', 'y']) == [3, 1]
+    assert lists.select('newest', category='Ontrak', tags=['y']) == []
+    assert lists.select('relevance', ranked_ids=[1, 2, 3], tags=['y']) == [1, 3]
+    assert lists.tags == ['x', 'y']
+    assert lists.category_count('General') == 2
+
+
+def test_posting_lists_follow_writes_from_other_processes(monkeypatch):
+    conn = setup_memory_db()
+    patch_db(monkeypatch, conn)
+    forum_db_utils.invalidate_posting_lists()
+    first_id, _ = forum_db_utils.create_forum_post('First', 'a', 'General', tags=['one'])
+    lists = forum_db_utils.get_posting_lists()
+    assert forum_db_utils.get_posting_lists() is lists
+
+    # Another worker's writes never reach this process's invalidate_posting_lists()
+    monkeypatch.setattr(forum_db_utils, 'invalidate_posting_lists', lambda: None)
+    second_id, _ = forum_db_utils.create_forum_post('Second', 'b', 'General')
+    assert forum_db_utils.get_posting_lists().select('newest', category='General')[0] == second_id
+
+    forum_db_utils.add_forum_post_tag(second_id, 'one')
+    assert forum_db_utils.get_posting_lists().select('newest', tags=['one']) == [second_id, first_id]
+
+    forum_db_utils.rename_forum_category('General', 'Ontrak')
+    assert forum_db_utils.get_posting_lists().category_count('Ontrak') == 2
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import json_store
+
+
+def test_load_is_cached_until_file_changes(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps([{'a': 1}]), encoding='utf-8')
+    store = json_store.JsonStore(str(path), default=list)
+
+    first = store.load()
+    second = store.load()
+    assert first is second
+    assert store.misses == 1 and store.hits == 1
+
+    store.save([{'a': 2}, {'a': 3}])
+    assert [row['a'] for row in store.load()] == [2, 3]
+    assert store.misses == 2
+
+
+def test_snapshots_are_read_only(tmp_path):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps([{'tags': ['x']}]), encoding='utf-8')
+    store = json_store.JsonStore(str(path), default=list)
+
+    snapshot = store.load()
+    with pytest.raises(TypeError):
+        snapshot[0]['tags'] = []
+
+    editable = store.load(mutable=True)
+    editable[0]['tags'].append('y')
+    assert list(store.load()[0]['tags']) == ['x']
+
+
+def test_missing_file_uses_default(tmp_path):
+    store = json_store.JsonStore(str(tmp_path / 'missing.json'), default=lambda: ['General'])
+    assert list(store.load()) == ['General']
+
+
+def test_save_is_atomic_and_coalesced(tmp_path):
+    path = tmp_path / 'data.json'
+    store = json_store.JsonStore(str(path), default=list)
+
+    threads = [threading.Thread(target=store.save, args=([i],)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.saves == 20
+    assert store.flushes + store.coalesced == 20
+    assert len(json.loads(path.read_text(encoding='utf-8'))) == 1
+    assert list(store.load()) == json.loads(path.read_text(encoding='utf-8'))
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == '.tmp'] == []
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from pagination import decode_cursor, encode_cursor, fetch_keyset_page
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    token = encode_cursor({'created_at': '2024-01-01T10:00:00', 'id': 7})
+    assert decode_cursor(token) == ('2024-01-01T10:00:00', 7)
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_keyset_pages_cover_ties_and_null_timestamps():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, kind TEXT, created_at TEXT)")
+    rows = [('a', '2024-01-01'), ('a', '2024-01-02'), ('a', '2024-01-02'), ('b', '2024-01-03'),
+            ('a', None), ('a', '2024-01-04'), ('a', None)]
+    conn.executemany("INSERT INTO items (kind, created_at) VALUES (?, ?)", rows)
+
+    seen = []
+    token = None
+    while True:
+        page, token = fetch_keyset_page(conn.cursor(), "SELECT * FROM items WHERE kind = ?", ['a'],
+                                        decode_cursor(token) if token else None, 2)
+        seen.extend(row['id'] for row in page)
+        if not token:
+            break
+
+    assert seen == [6, 3, 2, 1, 7, 5]
+
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import result_cache
+from result_cache import LRUTTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUTTLCache(maxsize=2)
+    cache.get_or_load(('t', 1), lambda: 'one')
+    cache.get_or_load(('t', 2), lambda: 'two')
+    cache.get(('t', 1))
+    cache.get_or_load(('t', 3), lambda: 'three')
+
+    assert cache.get(('t', 2), None) is None
+    assert cache.get(('t', 1)) == 'one'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_and_invalidate_per_table(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = LRUTTLCache(ttl=10)
+    cache.get_or_load(('a', 1), lambda: None)
+    cache.get_or_load(('b', 1), lambda: 'b')
+
+    assert cache.get_or_load(('a', 1), lambda: 'reloaded') is None
+    cache.invalidate('a')
+    assert cache.get_or_load(('a', 1), lambda: 'reloaded') == 'reloaded'
+    now[0] += 11
+    assert cache.get_or_load(('b', 1), lambda: 'fresh') == 'fresh'
+
+
+def test_value_loaded_across_an_invalidation_is_not_kept():
+    cache = LRUTTLCache()
+    counts = iter([3, 4, 5])
+
+    def load_while_written():
+        cache.invalidate('parts')
+        return next(counts)
+
+    assert cache.get_or_load(('parts',), load_while_written) == 3
+    assert cache.get_or_load(('parts',), lambda: next(counts)) == 4
+    assert cache.get_or_load(('parts',), lambda: next(counts)) == 4
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 2)
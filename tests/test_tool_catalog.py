@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+import db_utils
+import tool_catalog
+from database_init import MIGRATIONS
+from db_migrations import run_migrations
+from json_store import freeze
+
+
+@contextmanager
+def shared_connection(conn):
+    yield conn
+
+
+def make_config(allow_user_tools=True):
+    return freeze({
+        'settings': {'allow_user_tools': allow_user_tools},
+        'server_tools': [
+            {'id': 'rdp', 'name': 'Remote Desktop', 'enabled': True},
+            {'id': 'viewer', 'name': 'Case Viewer', 'enabled': True, 'hidden': True},
+            {'id': 'old', 'name': 'Retired', 'enabled': False},
+        ],
+    })
+
+
+def test_server_tools_win_and_hidden_tools_stay_runnable():
+    user_tools = freeze([
+        {'tool_id': 'rdp', 'name': 'My RDP', 'is_enabled': 1},
+        {'tool_id': 'notes', 'name': 'Notes', 'is_enabled': 1},
+        {'tool_id': 'off', 'name': 'Off', 'is_enabled': 0},
+    ])
+    catalog = tool_catalog.ToolCatalog(make_config(), user_tools)
+
+    assert catalog.get('rdp') == ('server', make_config()['server_tools'][0])
+    assert catalog.get('viewer')[0] == 'server'
+    assert catalog.get('notes')[0] == 'user'
+    assert catalog.get('old') == (None, None) and catalog.get('off') == (None, None)
+    assert [tool['name'] for tool in catalog.tools] == ['Remote Desktop', 'My RDP', 'Notes']
+
+    hidden_user_tools = tool_catalog.ToolCatalog(make_config(allow_user_tools=False), user_tools)
+    assert [tool['name'] for tool in hidden_user_tools.tools] == ['Remote Desktop']
+    assert hidden_user_tools.etag != catalog.etag
+    assert tool_catalog.ToolCatalog(make_config(), user_tools).etag == catalog.etag
+
+
+def test_catalog_is_rebuilt_after_invalidation_or_any_change():
+    tool_catalog.invalidate()
+    loads = []
+    state = {'version': 1, 'fail': False}
+
+    def tools_version(username):
+        return state['version']
+
+    def load_user_tools(username):
+        loads.append(username)
+        if state['fail']:
+            return None, None
+        return [{'tool_id': 'notes', 'name': 'Notes', 'is_enabled': 1}], state['version']
+
+    get = lambda config: tool_catalog.get_tool_catalog('alice', config, tools_version, load_user_tools)
+    config = make_config()
+    catalog = get(config)
+    assert get(config) is catalog
+    assert loads == ['alice']
+
+    tool_catalog.invalidate('alice')
+    rebuilt = get(config)
+    assert rebuilt is not catalog and rebuilt.etag == catalog.etag
+    assert get(make_config()) is not rebuilt
+    assert len(loads) == 3
+
+    # Tools changed by another process: only the version tells
+    config = make_config()
+    catalog = get(config)
+    state['version'] = 2
+    assert get(config) is not catalog and len(loads) == 5
+
+    # A failed read is served without user tools but never cached
+    state.update(version=3, fail=True)
+    assert get(config).get('notes') == (None, None)
+    state['fail'] = False
+    assert get(config).get('notes')[0] == 'user'
+
+
+def test_tool_writes_bump_the_users_tools_version(monkeypatch, tmp_path):
+    db_path = str(tmp_path / 'main.db')
+    run_migrations(db_path, MIGRATIONS)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    monkeypatch.setattr(db_utils, 'get_db_connection', lambda: shared_connection(conn))
+    conn.execute("INSERT INTO users (username, email, password) VALUES ('alice', 'a@example.com', 'x')")
+    conn.commit()
+    version = db_utils.get_user_external_tools_version
+
+    assert version('alice') == 0 and version('nobody') is None
+    db_utils.create_user_external_tool('alice', {'tool_id': 'notes', 'name': 'Notes', 'type': 'website'})
+    db_utils.toggle_user_external_tool('alice', 'notes')
+    db_utils.update_user_external_tool('alice', 'notes', {'name': 'Notes 2', 'type': 'website'})
+    assert version('alice') == 3
+    assert db_utils.delete_user_external_tool('alice', 'missing')[0] is False
+    assert version('alice') == 3
+    db_utils.delete_user_external_tool('alice', 'notes')
+    tools, loaded_version = db_utils.load_user_external_tools('alice')
+    assert tools == [] and loaded_version == 4
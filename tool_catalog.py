@@ -0,0 +1,82 @@
+"""
+Per-user external tool catalog.
+Server tools (external_tools_config.json) and the user's own tools
+(user_external_tools) are merged once into a read-only catalog indexed by tool
+id, together with the /api/external-tools listing and its ETag. Catalogs are
+rebuilt when the server config snapshot or the user's tools version changes
+(so edits made through other worker processes are seen on the next request),
+and are dropped by invalidate() after admin saves and user tool edits.
+"""
+
+import hashlib
+import json
+import os
+
+from json_store import freeze
+from result_cache import LRUTTLCache, MISSING
+
+# (config snapshot, user tools version, ToolCatalog) by (username,)
+CATALOG_CACHE = LRUTTLCache(
+    maxsize=int(os.environ.get('TECHGUIDES_TOOL_CATALOG_SIZE', '1024')),
+    ttl=float(os.environ.get('TECHGUIDES_TOOL_CATALOG_TTL', '300'))
+)
+
+
+class ToolCatalog:
+    """The tools one user can list and run.
+
+    by_id maps a tool id to (source, tool) with source 'server' or 'user';
+    enabled server tools (hidden ones included) win over user tools with the
+    same id. tools is the visible listing and etag a hash of it.
+    """
+
+    def __init__(self, config, user_tools):
+        all_server_tools = [tool for tool in config.get('server_tools', []) if tool.get('enabled', False)]
+        enabled_user_tools = [tool for tool in user_tools if tool.get('is_enabled', 1) == 1]
+
+        by_id = {tool.get('tool_id'): ('user', tool) for tool in enabled_user_tools}
+        by_id.update((tool.get('id'), ('server', tool)) for tool in all_server_tools)
+        self.by_id = by_id
+
+        self.server_tools = tuple(tool for tool in all_server_tools if not tool.get('hidden', False))
+        if config.get('settings', {}).get('allow_user_tools', True):
+            self.user_tools = tuple(enabled_user_tools)
+        else:
+            self.user_tools = ()
+        self.tools = self.server_tools + self.user_tools
+
+        listing = json.dumps(self.tools, sort_keys=True, separators=(',', ':'), default=str)
+        self.etag = hashlib.sha1(listing.encode('utf-8')).hexdigest()
+
+    def get(self, tool_id):
+        """Return (source, tool) for a runnable tool id, or (None, None)."""
+        return self.by_id.get(tool_id, (None, None))
+
+
+def get_tool_catalog(username, config, tools_version, load_user_tools):
+    """Return username's ToolCatalog for the given server config snapshot.
+
+    tools_version(username) is a cheap change marker for the user's tools
+    (None if it could not be read) and is checked on every call.
+    load_user_tools(username) returns (tools, version), or (None, None) on
+    error, and is only called when the catalog is rebuilt. A catalog built
+    from a failed read has no user tools and is not cached.
+    """
+    key = (username,)
+    entry = CATALOG_CACHE.get(key)
+    # A different snapshot object means the config file was saved or edited
+    if entry is not MISSING and entry[0] is config and entry[1] is not None:
+        if entry[1] == tools_version(username):
+            return entry[2]
+
+    generation = CATALOG_CACHE.generation()
+    user_tools, version = load_user_tools(username)
+    catalog = ToolCatalog(config, freeze(user_tools or []))
+    if user_tools is not None:
+        CATALOG_CACHE.put(key, (config, version, catalog), generation)
+    return catalog
+
+
+def invalidate(username=None):
+    """Drop one user's catalog (after user tool edits) or all of them (after config saves)."""
+    CATALOG_CACHE.invalidate(username)